@@ -0,0 +1,90 @@
+"""
+Compare threaded SnowKillEngine and AsyncSnowKillEngine against local fake REST server at the same concurrency
+
+Both engines keep the same number of query plan requests in flight, so cycle times are expected to be similar
+The difference is the number of threads: threaded engine needs one thread per request, async engine only a few for driver calls
+
+Usage: python benchmarks/async_engine.py --num-queries 1000 --latency 0.2 --concurrency 64
+"""
+
+from argparse import ArgumentParser
+from asyncio import run
+from threading import Event, Thread, enumerate as enumerate_threads
+from time import perf_counter
+
+from snowkill import SnowKillEngine, JoinExplosionCondition
+from snowkill.async_engine import AsyncSnowKillEngine
+from snowkill.testing.fake_server import FakeMonitoringServer, FakeServerConnection
+
+
+def get_conditions():
+    return [
+        JoinExplosionCondition(
+            min_output_rows=10_000_000,
+            min_explosion_rate=10,
+            warning_duration=60,
+        ),
+    ]
+
+
+class ThreadSampler:
+    # Threads of fake server are excluded, only threads of engine executors are counted
+    def __init__(self):
+        self.max_threads = 0
+
+        self._stop = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(0.005):
+            num_threads = sum(1 for t in enumerate_threads() if t.name.startswith("SnowKillEngine"))
+            self.max_threads = max(self.max_threads, num_threads)
+
+
+def run_threaded(base_url, concurrency):
+    with SnowKillEngine(FakeServerConnection(base_url), max_workers=concurrency) as engine, ThreadSampler() as sampler:
+        start = perf_counter()
+        engine.check_and_kill_pending_queries(get_conditions())
+
+        return perf_counter() - start, sampler
+
+
+async def run_async(base_url, concurrency, max_workers):
+    async with AsyncSnowKillEngine(
+        FakeServerConnection(base_url), max_concurrency=concurrency, max_workers=max_workers
+    ) as engine:
+        with ThreadSampler() as sampler:
+            start = perf_counter()
+            await engine.check_and_kill_pending_queries(get_conditions())
+
+            return perf_counter() - start, sampler
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--num-nodes", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-workers", type=int, default=8, help="Threads of async engine for blocking driver calls")
+    args = parser.parse_args()
+
+    with FakeMonitoringServer(num_queries=args.num_queries, num_nodes=args.num_nodes, latency=args.latency) as server:
+        threaded_duration, threaded_sampler = run_threaded(server.base_url, args.concurrency)
+        async_duration, async_sampler = run(run_async(server.base_url, args.concurrency, args.max_workers))
+
+    print(f"Queries: {args.num_queries}, plan nodes: {args.num_nodes}, latency: {args.latency}s, concurrency: {args.concurrency}")
+    print(f"SnowKillEngine: {threaded_duration:.3f}s, max threads: {threaded_sampler.max_threads}")
+    print(f"AsyncSnowKillEngine: {async_duration:.3f}s, max threads: {async_sampler.max_threads}")
+
+
+if __name__ == "__main__":
+    main()
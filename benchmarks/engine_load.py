@@ -0,0 +1,69 @@
+"""
+Measure how max_workers, timeout of query plan requests and size of query plans affect cycle time of SnowKillEngine
+
+Each combination of parameters runs against a separate local fake REST server with lognormal latency, errors and timeouts
+
+Usage: python benchmarks/engine_load.py --num-queries 500 --max-workers 4 8 16 --plan-timeout 1 5 --num-nodes 50 500
+"""
+
+from argparse import ArgumentParser
+from itertools import product
+from time import perf_counter
+
+from snowkill import SnowKillEngine, JoinExplosionCondition
+from snowkill.testing.fake_server import FakeMonitoringServer, lognormal_latency
+
+
+def get_conditions():
+    return [
+        JoinExplosionCondition(
+            min_output_rows=10_000_000,
+            min_explosion_rate=10,
+            warning_duration=60,
+        ),
+    ]
+
+
+def run_cycle(args, max_workers, plan_timeout, num_nodes):
+    with FakeMonitoringServer(
+        num_queries=args.num_queries,
+        num_nodes=num_nodes,
+        latency=lognormal_latency(args.latency, args.latency_sigma, seed=args.seed),
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_duration=plan_timeout + 1,
+        seed=args.seed,
+    ) as server:
+        with SnowKillEngine(server.get_connection(), max_workers=max_workers) as engine:
+            engine.REST_ENDPOINT_QUERY_PLAN_TIMEOUT = plan_timeout
+
+            start = perf_counter()
+            check_results = engine.check_and_kill_pending_queries(get_conditions())
+
+            return perf_counter() - start, len(check_results)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--num-nodes", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--max-workers", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--plan-timeout", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Queries: {args.num_queries}, median latency: {args.latency}s")
+    print(f"Error rate: {args.error_rate}, timeout rate: {args.timeout_rate}")
+    print(f"{'max_workers':>12} {'plan_timeout':>13} {'num_nodes':>10} {'cycle_time':>11} {'results':>8}")
+
+    for max_workers, plan_timeout, num_nodes in product(args.max_workers, args.plan_timeout, args.num_nodes):
+        duration, num_results = run_cycle(args, max_workers, plan_timeout, num_nodes)
+        print(f"{max_workers:>12} {plan_timeout:>13} {num_nodes:>10} {duration:>10.3f}s {num_results:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmarks of hot paths using synthetic workload, requires pytest-benchmark
+
+Structures are built from raw responses in setup of each round, so lazy parsing and analysis are measured every time
+Results are comparable across commits when saved and compared with pytest-benchmark
+
+Usage:
+  pytest benchmarks/hot_paths.py --benchmark-autosave
+  pytest benchmarks/hot_paths.py --benchmark-compare
+"""
+
+from pytest import fixture, importorskip, mark
+
+from snowkill import (
+    BlockedDurationCondition,
+    CartesianJoinExplosionCondition,
+    ConditionSet,
+    EstimatedScanDurationCondition,
+    ExecuteDurationCondition,
+    JoinExplosionCondition,
+    MarkdownFormatter,
+    QueryFilter,
+    QueuedDurationCondition,
+    SlackFormatter,
+    StorageSpillingCondition,
+    UnionWithoutAllCondition,
+    dataclass_to_json_str,
+)
+from snowkill.testing.workload import SyntheticWorkload
+
+
+RUNNING_CONDITIONS = {
+    "CartesianJoinExplosionCondition": lambda: CartesianJoinExplosionCondition(
+        min_output_rows=1_000_000, min_explosion_rate=5, warning_duration=60
+    ),
+    "EstimatedScanDurationCondition": lambda: EstimatedScanDurationCondition(
+        min_estimated_scan_duration=60 * 60, warning_duration=60
+    ),
+    "ExecuteDurationCondition": lambda: ExecuteDurationCondition(warning_duration=60),
+    "JoinExplosionCondition": lambda: JoinExplosionCondition(
+        min_output_rows=1_000_000, min_explosion_rate=5, warning_duration=60
+    ),
+    "StorageSpillingCondition": lambda: StorageSpillingCondition(
+        min_local_spilling_gb=50, min_remote_spilling_gb=1, warning_duration=60
+    ),
+    "UnionWithoutAllCondition": lambda: UnionWithoutAllCondition(min_input_rows=1_000_000, warning_duration=60),
+}
+
+NUM_NODES = [100, 1000]
+NUM_QUERY_PLANS = 20
+
+
+@fixture(scope="module", params=NUM_NODES, ids=lambda n: f"nodes={n}")
+def workload(request):
+    return SyntheticWorkload(num_queries=1000, num_steps=3, num_nodes=request.param)
+
+
+@fixture(scope="module")
+def query_plan_responses(workload):
+    return [workload.get_query_plan_response(seed) for seed in range(NUM_QUERY_PLANS)]
+
+
+@fixture(scope="module")
+def queries(workload):
+    return workload.build_queries()
+
+
+def test_build_query_plan_step(benchmark, workload, query_plan_responses):
+    def build():
+        for response in query_plan_responses:
+            for s in response["data"]["steps"]:
+                # Access nodes and edges, otherwise only lazy wrapper is built
+                step = workload.engine._build_query_plan_step(s)
+                step.nodes, step.edges
+
+    benchmark(build)
+
+
+@mark.parametrize("condition_name", list(RUNNING_CONDITIONS))
+def test_running_condition(benchmark, workload, query_plan_responses, queries, condition_name):
+    condition = RUNNING_CONDITIONS[condition_name]()
+    query = max((q for q in queries if q.status == "RUNNING"), key=lambda q: q.execute_duration)
+
+    def setup():
+        return ([workload.build_query_plan(r) for r in query_plan_responses],), {}
+
+    def check(query_plans):
+        for query_plan in query_plans:
+            condition.check_custom_logic(query, query_plan)
+
+    benchmark.pedantic(check, setup=setup, rounds=20)
+
+
+def test_queued_condition(benchmark, queries):
+    condition = QueuedDurationCondition(warning_duration=60)
+    queued_queries = [q for q in queries if q.status == "QUEUED"]
+
+    def check():
+        for q in queued_queries:
+            condition.check_custom_logic(q)
+
+    benchmark(check)
+
+
+def test_blocked_condition(benchmark, workload, queries):
+    condition = BlockedDurationCondition(warning_duration=60)
+    check_results = [r for r in workload.build_check_results(queries, None) if r.holding_lock]
+
+    def check():
+        for r in check_results:
+            condition.check_custom_logic(r.query, r.holding_lock, r.holding_query)
+
+    benchmark(check)
+
+
+@mark.parametrize("with_query_text", [False, True], ids=["fields", "query_text"])
+def test_query_filter_check_query(benchmark, queries, with_query_text):
+    def setup():
+        query_filter = QueryFilter(
+            include_user_name=["BENCHMARK*"],
+            exclude_user_name=["BENCHMARK_1", "BENCHMARK_2"],
+            include_warehouse_name=["BENCHMARK_WH", "BENCHMARK_WH_?"],
+            exclude_query_tag=["dbt:*"],
+            include_sql_text=["*table_1*", "*table_2*"] if with_query_text else None,
+        )
+
+        return (query_filter,), {}
+
+    def check(query_filter):
+        for q in queries:
+            query_filter.check_query(q)
+
+    benchmark.pedantic(check, setup=setup, rounds=20)
+
+
+@mark.parametrize("columnar", [False, True], ids=["ConditionSet", "ColumnarConditionSet"])
+def test_condition_set_page(benchmark, queries, columnar):
+    condition_set_class = importorskip("snowkill.columnar").ColumnarConditionSet if columnar else ConditionSet
+
+    def setup():
+        # Conditions are created for each round, so memoized verdicts of query filters are not reused
+        conditions = [
+            ExecuteDurationCondition(notice_duration=600, kill_duration=3600, enable_kill=True),
+            ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(include_warehouse_name=["BENCHMARK_WH_1"])),
+            ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(exclude_user_name=["BENCHMARK_1*"])),
+            EstimatedScanDurationCondition(min_estimated_scan_duration=60, warning_duration=1800),
+            QueuedDurationCondition(notice_duration=30),
+            BlockedDurationCondition(warning_duration=300),
+        ]
+
+        return (condition_set_class(conditions),), {}
+
+    def match(condition_set):
+        condition_set.get_matching_conditions_for_page(queries)
+
+    benchmark.pedantic(match, setup=setup, rounds=20)
+
+
+def test_dataclass_to_json_str(benchmark, workload, query_plan_responses, queries):
+    def setup():
+        # Check results of running queries contain the whole query plan, which is expensive to serialize
+        return (workload.build_check_results(queries[:10], workload.build_query_plan(query_plan_responses[0])),), {}
+
+    def serialize(check_results):
+        for r in check_results:
+            dataclass_to_json_str(r)
+
+    benchmark.pedantic(serialize, setup=setup, rounds=5)
+
+
+@mark.parametrize("formatter_class", [MarkdownFormatter, SlackFormatter], ids=lambda c: c.__name__)
+def test_formatter(benchmark, workload, query_plan_responses, queries, formatter_class):
+    formatter = formatter_class("https://app.snowflake.com/benchmark/account")
+
+    def setup():
+        return (workload.build_check_results(queries, workload.build_query_plan(query_plan_responses[0])),), {}
+
+    def format_all(check_results):
+        for r in check_results:
+            formatter.format(r)
+
+    benchmark.pedantic(format_all, setup=setup, rounds=20)
@@ -0,0 +1,89 @@
+"""
+Record snapshot of Snowflake responses from live account and measure checks replayed from this snapshot
+
+Recording runs a normal check, conditions have warning_duration only, so no queries are aborted
+Replay runs without network, cycle time, CPU time and peak RSS are measured
+
+Usage:
+  SNOWFLAKE_ACCOUNT=... SNOWFLAKE_USER=... SNOWFLAKE_PASSWORD=... python benchmarks/replay.py record --path snapshot.jsonl.gz
+  python benchmarks/replay.py replay --path snapshot.jsonl.gz --num-cycles 10
+"""
+
+from argparse import ArgumentParser
+from os import getenv
+from resource import getrusage, RUSAGE_SELF
+from snowflake.connector import SnowflakeConnection
+from time import perf_counter, process_time
+
+from snowkill import (
+    SnowKillEngine,
+    BlockedDurationCondition,
+    ExecuteDurationCondition,
+    JoinExplosionCondition,
+    QueuedDurationCondition,
+    StorageSpillingCondition,
+)
+from snowkill.replay import RecordingConnection, ReplayConnection
+
+
+def get_conditions():
+    return [
+        ExecuteDurationCondition(warning_duration=60 * 30),
+        JoinExplosionCondition(min_output_rows=10_000_000, min_explosion_rate=10, warning_duration=60),
+        StorageSpillingCondition(min_local_spilling_gb=50, min_remote_spilling_gb=1, warning_duration=60),
+        QueuedDurationCondition(warning_duration=60 * 30),
+        BlockedDurationCondition(warning_duration=60 * 5),
+    ]
+
+
+def record(path):
+    connection = SnowflakeConnection(
+        account=getenv("SNOWFLAKE_ACCOUNT"),
+        user=getenv("SNOWFLAKE_USER"),
+        password=getenv("SNOWFLAKE_PASSWORD"),
+    )
+
+    with RecordingConnection(connection, path) as recording_connection:
+        with SnowKillEngine(recording_connection) as engine:
+            check_results = engine.check_and_kill_pending_queries(get_conditions())
+
+    print(f"Recorded snapshot [{path}], check results: {len(check_results)}")
+
+
+def replay(path, num_cycles, max_workers, simulate_latency):
+    replay_connection = ReplayConnection(path, simulate_latency=simulate_latency)
+    durations = []
+
+    start_cpu_time = process_time()
+
+    with SnowKillEngine(replay_connection, max_workers=max_workers) as engine:
+        for _ in range(num_cycles):
+            start = perf_counter()
+            check_results = engine.check_and_kill_pending_queries(get_conditions())
+            durations.append(perf_counter() - start)
+
+    cpu_time = process_time() - start_cpu_time
+
+    print(f"Snapshot: {path}, cycles: {num_cycles}, check results per cycle: {len(check_results)}")
+    print(f"Cycle time: min {min(durations):.3f}s, max {max(durations):.3f}s, avg {sum(durations) / num_cycles:.3f}s")
+    print(f"CPU time per cycle: {cpu_time / num_cycles:.3f}s")
+    print(f"Peak RSS: {getrusage(RUSAGE_SELF).ru_maxrss // 1024} MB")
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--path", required=True)
+    parser.add_argument("--num-cycles", type=int, default=10)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--simulate-latency", action="store_true")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record(args.path)
+    else:
+        replay(args.path, args.num_cycles, args.max_workers, args.simulate_latency)
+
+
+if __name__ == "__main__":
+    main()
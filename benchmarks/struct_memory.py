@@ -0,0 +1,167 @@
+"""
+Compare peak RSS of SnowKill structures with slots and interned strings against plain dataclasses
+
+Each variant runs in a separate process, so peak RSS of one variant does not affect another
+Queries and fully materialized query plans are built from JSON responses, the same way as SnowKillEngine does it
+
+Usage: python benchmarks/struct_memory.py --num-queries 1000 --num-nodes 500
+"""
+
+from argparse import ArgumentParser
+from dataclasses import is_dataclass
+from json import dumps, loads
+from resource import getrusage, RUSAGE_SELF
+from subprocess import run
+from sys import executable
+
+import snowkill.engine
+import snowkill.struct
+from snowkill import SnowKillEngine
+from snowkill.testing.fake_server import FakeServerConnection, generate_query_list_response
+
+
+def generate_query_plan_response(num_nodes: int):
+    return {
+        "success": True,
+        "data": {
+            "steps": [
+                {
+                    "step": 1,
+                    "description": "",
+                    "timeInMs": 3600000,
+                    "state": "running",
+                    "graphData": {
+                        "nodes": [
+                            {
+                                "id": i,
+                                "logicalId": i,
+                                "name": ["TableScan", "Filter", "Join", "Aggregate", "Result"][i % 5],
+                                "title": None,
+                                "labels": [
+                                    {"name": "Full table name", "value": f"DB.SCHEMA.TABLE_{i % 20}"},
+                                    {"name": "Columns", "value": ["ID", "NAME", "CREATED_AT"]},
+                                ],
+                                "waits": [
+                                    {"name": "Processing", "value": 0.5, "percentage": 0.5},
+                                ],
+                                "statistics": {
+                                    "IO": [
+                                        {"name": "Scan progress", "value": 0.5, "unit": "%"},
+                                        {"name": "Bytes scanned", "value": 1024, "unit": "bytes"},
+                                    ],
+                                    "Pruning": [
+                                        {"name": "Partitions scanned", "value": 10, "unit": ""},
+                                    ],
+                                },
+                            }
+                            for i in range(num_nodes)
+                        ],
+                        "edges": [
+                            {"id": f"{i + 1}-{i}", "src": i + 1, "dst": i, "rows": 1000, "expressions": []}
+                            for i in range(num_nodes - 1)
+                        ],
+                        "global": {},
+                    },
+                }
+            ]
+        },
+    }
+
+
+def disable_slots_and_interning():
+    # Replace slotted structures with equivalent classes backed by regular __dict__
+    for name in dir(snowkill.struct):
+        cls = getattr(snowkill.struct, name)
+
+        if isinstance(cls, type) and is_dataclass(cls) and hasattr(cls, "__slots__"):
+            namespace = {k: v for k, v in cls.__dict__.items() if k not in cls.__slots__ and k != "__slots__"}
+            plain_cls = type(cls.__name__, cls.__bases__, namespace)
+
+            setattr(snowkill.struct, name, plain_cls)
+
+            if hasattr(snowkill.engine, name):
+                setattr(snowkill.engine, name, plain_cls)
+
+    snowkill.struct.intern_str = lambda val: val
+    snowkill.engine.intern_str = lambda val: val
+
+
+def run_variant(variant, num_queries, num_nodes):
+    if variant == "plain":
+        disable_slots_and_interning()
+
+    engine = SnowKillEngine(FakeServerConnection(""))
+
+    # JSON is decoded separately for each query plan to get distinct string objects, like real REST API calls
+    query_list_json = dumps(generate_query_list_response(num_queries))
+    query_plan_json = dumps(generate_query_plan_response(num_nodes))
+
+    rss_before = getrusage(RUSAGE_SELF).ru_maxrss
+
+    queries = []
+    query_plans = []
+
+    query_list_response = loads(query_list_json)
+    session = engine._build_session(query_list_response["data"]["sessionsShort"][0])
+
+    for q in query_list_response["data"]["queries"]:
+        queries.append(engine._build_query(q, session))
+
+        query_plan = snowkill.engine.QueryPlan(
+            steps=[engine._build_query_plan_step(s) for s in loads(query_plan_json)["data"]["steps"]]
+        )
+
+        # Materialize everything to measure the worst case
+        for step in query_plan.steps:
+            step.get_input_rows(step.nodes[0])
+
+            for node in step.nodes:
+                node.labels, node.waits, node.statistics_io, node.statistics_pruning
+
+        query_plans.append(query_plan)
+
+    rss_after = getrusage(RUSAGE_SELF).ru_maxrss
+
+    print((rss_after - rss_before) // 1024)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num-queries", type=int, default=1000)
+    parser.add_argument("--num-nodes", type=int, default=500)
+    parser.add_argument("--variant", choices=["plain", "slots"])
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.num_queries, args.num_nodes)
+        return
+
+    results = {}
+
+    for variant in ["plain", "slots"]:
+        output = run(
+            [
+                executable,
+                __file__,
+                "--variant",
+                variant,
+                "--num-queries",
+                str(args.num_queries),
+                "--num-nodes",
+                str(args.num_nodes),
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+
+        results[variant] = int(output.stdout.strip())
+
+    print(f"Queries: {args.num_queries}, plan nodes: {args.num_nodes}")
+    print(f"Plain dataclasses: {results['plain']} MB peak RSS increase")
+    print(f"Slots and interned strings: {results['slots']} MB peak RSS increase")
+    print(f"Reduction: {(1 - results['slots'] / results['plain']) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from os import getenv
+from snowflake.connector import SnowflakeConnection
+from snowkill import *
+
+from _utils import init_logger, send_slack_message
+
+"""
+Example of long-running daemon:
+
+1) Run checks every 30 seconds in a single process
+2) Keep connection, users and query plans warm between checks
+3) Store and deduplicate in Snowflake table
+4) Format and send new check results to Slack
+5) Stop gracefully on SIGTERM
+"""
+logger = init_logger()
+
+connection = SnowflakeConnection(
+    account=getenv("SNOWFLAKE_ACCOUNT"),
+    user=getenv("SNOWFLAKE_USER"),
+    password=getenv("SNOWFLAKE_PASSWORD"),
+)
+
+
+def notify(result: CheckResult, message_blocks):
+    response = send_slack_message(
+        slack_token=getenv("SLACK_TOKEN"),
+        slack_channel=getenv("SLACK_CHANNEL"),
+        message_blocks=message_blocks,
+    )
+
+    if response["ok"]:
+        logger.info(f"Sent Slack notification for query [{result.query.query_id}]")
+    else:
+        logger.warning(f"Failed to send Slack notification for query [{result.query.query_id}], error: [{response['error']}]")
+
+
+checks = [
+    ExecuteDurationCondition(
+        warning_duration=60 * 30,  # 30 minutes for warning
+        kill_duration=60 * 60,  # 60 minutes for kill
+    ),
+    JoinExplosionCondition(
+        min_output_rows=10_000_000,  # join emits at least 10M output rows
+        min_explosion_rate=10,  # ratio of output rows to input rows is at least 10x
+        warning_duration=60 * 10,  # 10 minutes for warning
+        kill_duration=60 * 20,  # 20 minutes for kill
+        query_plan_max_age=60 * 5,  # reuse query plan for up to 5 minutes
+    ),
+    BlockedDurationCondition(
+        notice_duration=60 * 5,  # query was locked by another transaction for 5 minutes
+    ),
+]
+
+snowkill_daemon = SnowKillDaemon(
+    engine=SnowKillEngine(connection, query_plan_cache=QueryPlanCache()),  # keep query plans between checks
+    conditions=checks,
+    interval=30,  # run checks every 30 seconds
+    time_budget=20,  # stop requesting query plans after 20 seconds
+    storage=SnowflakeTableStorage(connection, getenv("SNOWFLAKE_TARGET_TABLE")),
+    formatter=SlackFormatter(getenv("SNOWSIGHT_BASE_URL")),
+    notify=notify,
+)
+
+# Runs until SIGTERM or SIGINT
+snowkill_daemon.run()
@@ -6,6 +6,8 @@ from snowkill.condition.abc_condition import (
     QueryFilter,
 )
 
+from snowkill.condition.condition_set import ConditionSet
+
 from snowkill.condition.blocked_duration import BlockedDurationCondition
 from snowkill.condition.cartesian_join_explosion import CartesianJoinExplosionCondition
 from snowkill.condition.estimated_scan_duration import EstimatedScanDurationCondition
@@ -15,21 +17,35 @@ from snowkill.condition.storage_spilling import StorageSpillingCondition
 from snowkill.condition.queued_duration import QueuedDurationCondition
 from snowkill.condition.union_without_all import UnionWithoutAllCondition
 
+from snowkill.cycle_report import CycleReport, ListTruncation, QueryKill, QueryPlanFetch
+from snowkill.daemon import SnowKillDaemon
 from snowkill.engine import SnowKillEngine
+from snowkill.lock_graph import LockGraph
+from snowkill.metrics import MetricsRegistry, MetricsServer, SnowKillMetrics
+from snowkill.multi_account import AccountConfig, MultiAccountCoordinator
+from snowkill.query_plan_cache import QueryPlanCache
+from snowkill.user_directory import UserDirectory
 
 from snowkill.formatter.abc_formatter import AbstractFormatter
+from snowkill.formatter.instrumented import InstrumentedFormatter
 from snowkill.formatter.markdown import MarkdownFormatter
 from snowkill.formatter.slack import SlackFormatter
 
+from snowkill.priority.abc_priority import AbstractQueryPriority
+from snowkill.priority.estimated_cost import EstimatedCostPriority
+
 from snowkill.storage.abc_storage import AbstractStorage
+from snowkill.storage.instrumented import InstrumentedStorage
 from snowkill.storage.snowflake_table import SnowflakeTableStorage
 
 from snowkill.struct import (
     CheckResult,
     CheckResultLevel,
+    HoldingLock,
     Query,
     QueryPlan,
     Session,
+    SkippedQuery,
     User,
     dataclass_to_json_str,
     dataclass_to_dict_recursive,
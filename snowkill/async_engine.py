@@ -0,0 +1,413 @@
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from asyncio import TimeoutError as AsyncTimeoutError, ensure_future, gather, get_running_loop, Queue, Semaphore
+from functools import partial
+from heapq import heappop, heappush
+from itertools import count
+from logging import getLogger, NullHandler
+from time import perf_counter
+from snowflake.connector import SnowflakeConnection, Error as SnowflakeError
+from snowflake.connector.errors import OperationalError, RequestTimeoutError
+from snowflake.connector.network import HEADER_AUTHORIZATION_KEY, HEADER_SNOWFLAKE_TOKEN, SESSION_EXPIRED_GS_CODE
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from snowkill.condition.abc_condition import AbstractQueryCondition, AbstractRunningQueryCondition
+from snowkill.cycle_report import CycleReport
+from snowkill.engine import SnowKillEngine
+from snowkill.lock_graph import LockGraph
+from snowkill.struct import CheckResult, CheckResultLevel, HoldingLock, Query, QueryPlan, SkippedQuery
+
+
+logger = getLogger(__name__)
+logger.addHandler(NullHandler())
+
+
+class AsyncRestClient:
+    """
+    Client of Snowflake REST API built on aiohttp, requests are sent from event loop without threads
+
+    Server URL and session token are taken from connection on each request, so token renewed by driver is picked up
+    Errors are raised as the same exceptions as in Snowflake connector
+    """
+
+    def __init__(self, connection: SnowflakeConnection, max_connections: int):
+        self.connection = connection
+        self.max_connections = max_connections
+
+        self._session: Optional[ClientSession] = None
+
+    async def request(self, url: str, timeout: int) -> dict:
+        # Session must be created inside running event loop
+        if self._session is None:
+            self._session = ClientSession(connector=TCPConnector(limit=self.max_connections))
+
+        headers = {"Accept": "application/json"}
+
+        if self.connection.rest.token:
+            headers[HEADER_AUTHORIZATION_KEY] = HEADER_SNOWFLAKE_TOKEN.format(token=self.connection.rest.token)
+
+        try:
+            async with self._session.get(
+                f"{self.connection.rest.server_url}{url}", headers=headers, timeout=ClientTimeout(total=timeout)
+            ) as response:
+                if response.status != 200:
+                    raise OperationalError(msg=f"HTTP error [{response.status}]")
+
+                return await response.json(content_type=None)
+        except AsyncTimeoutError:
+            raise RequestTimeoutError(msg=f"Request timed out after [{timeout}] seconds")
+        except ClientError as e:
+            raise OperationalError(msg=f"Connection error [{e.__class__.__name__}]")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncSnowKillEngine:
+    """
+    Asyncio version of SnowKillEngine with the same conditions and check results
+
+    Query plans are requested by aiohttp directly from event loop, number of requests in flight is bounded by max_concurrency
+    It makes it possible to keep hundreds of query plan requests active without threads
+    Other calls use blocking Snowflake driver, e.g. query list, SHOW LOCKS and abort_query, they run in small thread pool
+    """
+
+    def __init__(self, connection: SnowflakeConnection, max_concurrency=64, max_workers=8, **kwargs):
+        self.engine = SnowKillEngine(connection, max_workers=max_workers, **kwargs)
+        self.max_concurrency = max_concurrency
+
+        self.connection = self.engine.connection
+        self.logger = self.engine.logger
+
+        self.rest_client = AsyncRestClient(self.connection, max_concurrency)
+
+        # Query plans and holding queries are preloaded by coroutines, checks must never load them in event loop
+        self.engine._load_on_cache_miss = False
+
+    @property
+    def last_skipped_queries(self) -> List[SkippedQuery]:
+        return self.engine.last_skipped_queries
+
+    @property
+    def last_cycle_report(self) -> Optional[CycleReport]:
+        return self.engine.last_cycle_report
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        await self.rest_client.close()
+        self.engine.executor.shutdown()
+
+    async def check_and_kill_pending_queries(
+        self, conditions: List[AbstractQueryCondition], *, time_budget: Optional[float] = None
+    ) -> List[CheckResult]:
+        self.engine._start_check(time_budget)
+
+        results = []
+        is_failed = True
+
+        try:
+            results = await self._check_and_kill_pending_queries(conditions)
+            is_failed = False
+        finally:
+            self.engine._finish_check(results, is_failed)
+
+        return results
+
+    async def _check_and_kill_pending_queries(self, conditions: List[AbstractQueryCondition]) -> List[CheckResult]:
+        condition_set = self.engine.condition_set_class(conditions)
+
+        pending_queries = {}
+        blocked_queries = []
+        deferred_queries = []
+        running_query_ids = []
+        query_tasks = []
+
+        # Queries are waiting here for semaphore, ordered by priority
+        pending_heap = []
+        pending_counter = count()
+
+        # Semaphore must be created inside running event loop for Python < 3.10
+        semaphore = Semaphore(self.max_concurrency)
+
+        # Same as SnowKillEngine, kills wait until query list and locks are fully loaded, and are discarded if loading fails
+        is_prepared = get_running_loop().create_future()
+
+        async def _task_inner_fn():
+            async with semaphore:
+                # Query with the highest priority is picked among all queries waiting at this moment
+                _, _, query, matching_conditions, holding_locks = heappop(pending_heap)
+
+                # Load everything which requires network calls first
+                # Checks below read query plans and holding queries from cache only
+                if query.status == SnowKillEngine.STATUS_RUNNING:
+                    await self._preload_query_plan(query, matching_conditions)
+
+                result = self.engine._check_query(query, matching_conditions, holding_locks)
+
+            return await _task_kill_fn(result)
+
+        async def _task_kill_fn(result: Optional[CheckResult]):
+            # Semaphore is released while kill is waiting, so other queries are checked in the meantime
+            if result and result.level == CheckResultLevel.KILL and await is_prepared:
+                async with semaphore:
+                    await self._run_blocking(self.engine._kill, result)
+
+            return result
+
+        def _submit(query: Query, matching_conditions: List[AbstractQueryCondition], holding_locks: Dict[str, HoldingLock]):
+            priority = self.engine._get_query_priority(query, matching_conditions)
+
+            heappush(pending_heap, (-priority, next(pending_counter), query, matching_conditions, holding_locks))
+            query_tasks.append(ensure_future(_task_inner_fn()))
+
+        try:
+            # Queries are matched as soon as each page arrives, while next pages of query list are still loading
+            # Time spent on matching and checking pages is excluded from list duration
+            list_start_time = perf_counter()
+            page_duration = 0.0
+
+            async for page in self._iter_pending_query_pages(
+                blocked=len(condition_set.blocked_conditions) > 0,
+                queued=len(condition_set.queued_conditions) > 0,
+                running=True,
+            ):
+                page_start_time = perf_counter()
+
+                pending_queries.update((q.query_id, q) for q in page)
+                running_query_ids.extend(q.query_id for q in page if q.status == SnowKillEngine.STATUS_RUNNING)
+
+                self.engine._cycle_report.add_queries(page)
+
+                page_matching_conditions = condition_set.get_matching_conditions_for_page(page)
+                self.engine._cycle_report.add_duration("match", perf_counter() - page_start_time)
+
+                for query, matching_conditions in zip(page, page_matching_conditions):
+                    # Queries which cannot match any condition are discarded before any task or query plan work
+                    if not matching_conditions:
+                        continue
+
+                    self.engine._cycle_report.add_queries([query], matched=True)
+
+                    # Blocked queries are checked after all pending queries are known, holding queries are resolved in bulk
+                    if query.status == SnowKillEngine.STATUS_BLOCKED:
+                        blocked_queries.append((query, matching_conditions))
+                        continue
+
+                    # Duration only conditions never send requests, such queries are checked in place without semaphore
+                    if self.engine._is_duration_only(query, matching_conditions):
+                        result = self.engine._check_query(query, matching_conditions, {})
+                        query_tasks.append(ensure_future(_task_kill_fn(result)))
+                        continue
+
+                    # Same as SnowKillEngine, queries are prioritized after all pages are loaded
+                    deferred_queries.append((query, matching_conditions))
+
+                page_duration += perf_counter() - page_start_time
+
+            self.engine._cycle_report.add_duration("list", perf_counter() - list_start_time - page_duration)
+
+            if blocked_queries:
+                lock_scan_start_time = perf_counter()
+                holding_locks = await self.get_holding_locks()
+                self.engine._cycle_report.add_duration("lock_scan", perf_counter() - lock_scan_start_time)
+
+                holding_query_start_time = perf_counter()
+                await self._preload_holding_queries(
+                    self.engine._get_holding_query_ids(blocked_queries, holding_locks), pending_queries
+                )
+                self.engine._cycle_report.add_duration("holding_query", perf_counter() - holding_query_start_time)
+        except Exception:
+            is_prepared.set_result(False)
+
+            for task in query_tasks:
+                task.cancel()
+
+            await gather(*query_tasks, return_exceptions=True)
+            raise
+
+        is_prepared.set_result(True)
+
+        for query, matching_conditions in deferred_queries:
+            _submit(query, matching_conditions, {})
+
+        for query, matching_conditions in blocked_queries:
+            _submit(query, matching_conditions, holding_locks)
+
+        results = [r for r in await gather(*query_tasks) if r is not None]
+        self.engine._previous_levels = {r.query.query_id: r.level for r in results}
+
+        if self.engine.query_plan_cache is not None:
+            self.engine.query_plan_cache.retain(running_query_ids)
+
+        return results
+
+    async def get_pending_queries(self, *, blocked=True, queued=True, running=True) -> Dict[str, Query]:
+        return {q.query_id: q async for q in self._iter_pending_queries(blocked=blocked, queued=queued, running=running)}
+
+    async def _iter_pending_queries(self, *, blocked=True, queued=True, running=True) -> AsyncIterator[Query]:
+        async for page in self._iter_pending_query_pages(blocked=blocked, queued=queued, running=running):
+            for query in page:
+                yield query
+
+    async def _iter_pending_query_pages(self, *, blocked=True, queued=True, running=True) -> AsyncIterator[List[Query]]:
+        subsets = []
+
+        if blocked:
+            subsets.append(SnowKillEngine.STATUS_BLOCKED)
+
+        if queued:
+            subsets.append(SnowKillEngine.STATUS_QUEUED)
+
+        if running:
+            subsets.append(SnowKillEngine.STATUS_RUNNING)
+
+        # All subsets are loaded concurrently and share the same session table
+        sessions = {}
+        page_queue = Queue()
+
+        async def _task_list_fn(subset: str):
+            try:
+                # Pages are loaded by the same generator as in SnowKillEngine, one page per executor call
+                pages = self.engine._iter_query_pages(subset=subset, sessions=sessions)
+
+                while True:
+                    page = await self._run_blocking(next, pages, None)
+
+                    if page is None:
+                        break
+
+                    await page_queue.put(page)
+            except Exception as e:
+                # Error is passed to consumer right away, without waiting for other subsets
+                await page_queue.put(e)
+            else:
+                # Signal the end of subset
+                await page_queue.put(None)
+
+        list_tasks = [ensure_future(_task_list_fn(subset)) for subset in subsets]
+        num_running_subsets = len(subsets)
+
+        # Query may change status between requests and appear in more than one subset
+        seen_query_ids = set()
+
+        try:
+            while num_running_subsets > 0:
+                page = await page_queue.get()
+
+                if isinstance(page, Exception):
+                    raise page
+
+                if page is None:
+                    num_running_subsets -= 1
+                    continue
+
+                new_queries = [q for q in page if q.query_id not in seen_query_ids]
+                seen_query_ids.update(q.query_id for q in new_queries)
+
+                if new_queries:
+                    yield new_queries
+        finally:
+            # Loading of other subsets stops once consumer is gone, e.g. due to error in one subset
+            for task in list_tasks:
+                task.cancel()
+
+    async def get_query_by_id(self, query_id: str) -> Optional[Query]:
+        return await self._run_blocking(self.engine.get_query_by_id, query_id)
+
+    async def get_query_plan(self, query_id: str, timeout: Optional[int] = None) -> Optional[QueryPlan]:
+        response, _ = await self._request_query_plan(query_id, timeout)
+
+        # Request was terminated due to error or timeout
+        # Query plan is not available
+        if not response:
+            return None
+
+        return self.engine._build_query_plan(response)
+
+    async def get_holding_locks(self) -> Dict[str, HoldingLock]:
+        return await self._run_blocking(self.engine.get_holding_locks)
+
+    async def get_lock_graph(self) -> LockGraph:
+        return await self._run_blocking(self.engine.get_lock_graph)
+
+    async def abort_transaction(self, transaction_id: str):
+        return await self._run_blocking(self.engine.abort_transaction, transaction_id)
+
+    async def abort_query(self, query_id: str):
+        return await self._run_blocking(self.connection.cursor().abort_query, query_id)
+
+    async def _preload_query_plan(self, query: Query, matching_conditions: List[AbstractRunningQueryCondition]):
+        if query.query_id in self.engine._query_plan_cache:
+            return
+
+        plan_conditions = [c for c in matching_conditions if c.REQUIRES_QUERY_PLAN]
+
+        if not plan_conditions:
+            return
+
+        if self.engine.query_plan_cache is not None:
+            # Cached query plan must satisfy the strictest max age of all matching conditions
+            max_ages = [c.query_plan_max_age for c in plan_conditions if c.query_plan_max_age is not None]
+            query_plan = self.engine.query_plan_cache.get(query, min(max_ages) if max_ages else None)
+
+            if query_plan:
+                self.engine._cycle_report.add_query_plan_cache_hit()
+                self.engine._query_plan_cache[query.query_id] = query_plan
+                return
+
+        timeout = self.engine._get_query_plan_timeout(query)
+
+        if timeout is None:
+            self.engine._query_plan_cache[query.query_id] = None
+            return
+
+        # Same as SnowKillEngine._load_query_plan(), but request is sent by event loop
+        fetch_start_time = perf_counter()
+        response, outcome = await self._request_query_plan(query.query_id, timeout)
+
+        query_plan = self.engine._parse_query_plan_response(query, timeout, response, outcome, perf_counter() - fetch_start_time)
+        self.engine._set_query_plan_cache(query, query_plan)
+
+    async def _request_query_plan(self, query_id: str, timeout: Optional[int] = None) -> Tuple[Optional[dict], str]:
+        timeout = timeout or SnowKillEngine.REST_ENDPOINT_QUERY_PLAN_TIMEOUT
+
+        try:
+            response = await self.rest_client.request(f"{SnowKillEngine.REST_ENDPOINT_QUERY_PLAN}/{quote(query_id)}", timeout)
+        except RequestTimeoutError as e:
+            logger.warning(f"Could not load query plan for query_id [{query_id}] due to [{e.__class__.__name__}]")
+            return None, CycleReport.QUERY_PLAN_TIMEOUT
+        except SnowflakeError as e:
+            logger.warning(f"Could not load query plan for query_id [{query_id}] due to [{e.__class__.__name__}]")
+            return None, CycleReport.QUERY_PLAN_FAILED
+
+        # Session token expired, it is renewed by driver, which is blocking
+        if response.get("code") == SESSION_EXPIRED_GS_CODE:
+            return await self._run_blocking(self.engine._request_query_plan, query_id, timeout)
+
+        return response, CycleReport.QUERY_PLAN_LOADED
+
+    async def _preload_holding_queries(self, holding_query_ids: List[str], pending_queries: Dict[str, Query]):
+        # Same as SnowKillEngine, each distinct holding query is resolved once, missing holding queries are loaded concurrently
+        missing_query_ids = []
+
+        for query_id in dict.fromkeys(holding_query_ids):
+            if query_id in self.engine._holding_query_cache:
+                continue
+
+            if query_id in pending_queries:
+                self.engine._holding_query_cache[query_id] = pending_queries[query_id]
+            else:
+                missing_query_ids.append(query_id)
+
+        holding_queries = await gather(*[self.get_query_by_id(query_id) for query_id in missing_query_ids])
+        self.engine._holding_query_cache.update(zip(missing_query_ids, holding_queries))
+
+    async def _run_blocking(self, fn, *args, **kwargs):
+        return await get_running_loop().run_in_executor(self.engine.executor, partial(fn, *args, **kwargs))
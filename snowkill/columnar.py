@@ -0,0 +1,148 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from snowkill.condition.abc_condition import AbstractQueryCondition, QueryFilter
+from snowkill.condition.condition_set import ConditionSet, has_custom_min_duration
+from snowkill.struct import Query, get_current_state_duration_field
+
+
+class QueryColumnarSnapshot:
+    """
+    Columnar snapshot of pending queries
+
+    Durations are stored as NumPy arrays, statuses, warehouse names and user names are stored as categorical codes
+    """
+
+    def __init__(self, queries: List[Query]):
+        self.queries = queries
+
+        self.execute_duration = np.fromiter((q.execute_duration for q in queries), dtype=np.float64, count=len(queries))
+        self.queued_duration = np.fromiter((q.queued_duration for q in queries), dtype=np.float64, count=len(queries))
+        self.total_duration = np.fromiter((q.total_duration for q in queries), dtype=np.float64, count=len(queries))
+
+        self.status_codes, self.statuses = self._encode([q.status for q in queries])
+        self.warehouse_name_codes, self.warehouse_names = self._encode([q.warehouse_name for q in queries])
+        self.user_name_codes, self.user_names = self._encode([q.session.user_name for q in queries])
+
+        self._lazy_codes: Dict[str, np.ndarray] = {}
+
+    def get_status_mask(self, status: str) -> np.ndarray:
+        if status not in self.statuses:
+            return np.zeros(len(self.queries), dtype=bool)
+
+        return self.status_codes == self.statuses[status]
+
+    def get_duration(self, status: str) -> np.ndarray:
+        return getattr(self, get_current_state_duration_field(status))
+
+    def get_query_filter_mask(self, query_filter: QueryFilter, mask: np.ndarray) -> np.ndarray:
+        # Query filter is evaluated once per distinct combination of values it depends on, only for rows selected by mask
+        rows = np.flatnonzero(mask)
+        result = np.zeros(len(self.queries), dtype=bool)
+
+        if len(rows) == 0:
+            return result
+
+        columns = [self.warehouse_name_codes, self.user_name_codes]
+
+        if query_filter.depends_on_query_text():
+            columns.extend([self._get_codes("sql_text"), self._get_codes("query_tag")])
+
+        # Codes of all columns are combined into a single dense key, one column at a time to avoid overflow
+        keys = np.zeros(len(rows), dtype=np.int64)
+
+        for codes in columns:
+            codes = codes[rows]
+            keys = keys * (int(codes.max()) + 1) + codes
+            _, keys = np.unique(keys, return_inverse=True)
+
+        _, first_rows, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+        verdicts = np.fromiter(
+            (query_filter.check_query(self.queries[rows[i]]) for i in first_rows), dtype=bool, count=len(first_rows)
+        )
+        result[rows] = verdicts[inverse.reshape(-1)]
+
+        return result
+
+    def get_predicate_mask(self, predicate: Callable[[Query], bool], mask: np.ndarray) -> np.ndarray:
+        # Arbitrary predicate is evaluated one query at a time, only for rows selected by mask
+        rows = np.flatnonzero(mask)
+        result = np.zeros(len(self.queries), dtype=bool)
+
+        result[rows] = np.fromiter((predicate(self.queries[i]) for i in rows), dtype=bool, count=len(rows))
+
+        return result
+
+    def _get_codes(self, field: str) -> np.ndarray:
+        # Columns used only by some query filters are encoded on first access
+        if field not in self._lazy_codes:
+            self._lazy_codes[field], _ = self._encode([getattr(q, field) for q in self.queries])
+
+        return self._lazy_codes[field]
+
+    def _encode(self, values: List[Optional[str]]) -> Tuple[np.ndarray, Dict[Optional[str], int]]:
+        categories = {}
+        codes = np.fromiter((categories.setdefault(v, len(categories)) for v in values), dtype=np.int64, count=len(values))
+
+        return codes, categories
+
+
+class ColumnarConditionSet(ConditionSet):
+    """
+    Condition set which selects matching conditions for the whole page of queries at once using NumPy
+
+    Status and minimum duration are checked with array comparisons per condition for all queries of the page
+    Query filter is evaluated once per distinct combination of values it depends on, verdicts are broadcast to all queries
+    Conditions which override check_min_duration() are checked one query at a time, only for queries passing other checks
+    Matching conditions of each query are returned in original order, same as ConditionSet
+    """
+
+    def __init__(self, conditions: List[AbstractQueryCondition]):
+        super().__init__(conditions)
+
+        self._by_status: Dict[str, List[Tuple[AbstractQueryCondition, Optional[float]]]] = {
+            "BLOCKED": self._get_min_durations(self.blocked_conditions),
+            "QUEUED": self._get_min_durations(self.queued_conditions),
+            "RUNNING": self._get_min_durations(self.running_conditions),
+        }
+
+    def get_matching_conditions_for_page(self, queries: List[Query]) -> List[List[AbstractQueryCondition]]:
+        snapshot = QueryColumnarSnapshot(queries)
+        matching = [[] for _ in queries]
+
+        for status, conditions in self._by_status.items():
+            if not conditions:
+                continue
+
+            status_mask = snapshot.get_status_mask(status)
+
+            if not status_mask.any():
+                continue
+
+            duration = snapshot.get_duration(status)
+
+            # Rows are queries, columns are conditions in original order
+            matrix = np.zeros((len(queries), len(conditions)), dtype=bool)
+
+            for pos, (condition, min_duration) in enumerate(conditions):
+                mask = status_mask if min_duration is None else status_mask & (duration >= min_duration)
+
+                if condition.query_filter and mask.any():
+                    mask = mask & snapshot.get_query_filter_mask(condition.query_filter, mask)
+
+                if min_duration is None and mask.any():
+                    mask = mask & snapshot.get_predicate_mask(condition.check_min_duration, mask)
+
+                matrix[:, pos] = mask
+
+            rows, cols = np.nonzero(matrix)
+
+            for i, pos in zip(rows.tolist(), cols.tolist()):
+                matching[i].append(conditions[pos][0])
+
+        return matching
+
+    def _get_min_durations(self, conditions: List[AbstractQueryCondition]):
+        # Conditions with custom check_min_duration() have no minimum duration which can be compared as array
+        return [(c, None if has_custom_min_duration(c) else c._calculate_min_duration()) for c in conditions]
@@ -1,11 +1,63 @@
 from abc import ABC, abstractmethod
-from fnmatch import fnmatchcase
-from typing import List, Optional, Pattern, Tuple, Union
+from fnmatch import translate
+from re import compile as re_compile
+from typing import Dict, List, Optional, Pattern, Tuple, Union
 
 from snowkill.struct import Query, QueryPlan, CheckResultLevel, HoldingLock
 
 
+class CompiledPatterns:
+    """
+    List of glob patterns and regular expressions compiled once into a single matcher
+
+    Literal patterns are checked with set lookup, "*literal*" patterns are checked with substring search
+    Other glob patterns are combined into a single anchored regular expression, Pattern objects are checked as is
+    """
+
+    GLOB_SPECIAL_CHARS = ("*", "?", "[")
+
+    def __init__(self, patterns: List[Union[str, Pattern]]):
+        self.literals = set()
+        self.substrings = []
+        self.regexes = []
+
+        globs = []
+
+        for pattern in patterns:
+            if isinstance(pattern, Pattern):
+                self.regexes.append(pattern)
+            elif not self._has_special_chars(pattern):
+                self.literals.add(pattern)
+            elif len(pattern) >= 2 and pattern[0] == "*" and pattern[-1] == "*" and not self._has_special_chars(pattern[1:-1]):
+                self.substrings.append(pattern[1:-1])
+            else:
+                globs.append(pattern)
+
+        # Each translated glob is anchored at the end, re.match() anchors it at the beginning
+        self.combined_glob = re_compile("|".join(translate(g) for g in globs)) if globs else None
+
+    def match(self, val: Optional[str]):
+        if val is None:
+            return False
+
+        if val in self.literals:
+            return True
+
+        if any(substring in val for substring in self.substrings):
+            return True
+
+        if self.combined_glob and self.combined_glob.match(val):
+            return True
+
+        return any(regex.fullmatch(val) for regex in self.regexes)
+
+    def _has_special_chars(self, pattern: str):
+        return any(char in pattern for char in self.GLOB_SPECIAL_CHARS)
+
+
 class QueryFilter:
+    FIELD_VERDICTS_MAX_SIZE = 10000
+
     def __init__(
         self,
         *,
@@ -35,82 +87,104 @@ class QueryFilter:
         self.include_query_tag = include_query_tag
         self.exclude_query_tag = exclude_query_tag
 
-    def check_query(self, query: Query):
-        if self.include_user_name and not any(
-            self._match_pattern(query.session.user_name, pattern) for pattern in self.include_user_name
-        ):
-            return False
+        # Patterns are compiled once, changes of attributes above after init are not applied
+        self._include_user_name = self._compile_patterns(include_user_name)
+        self._exclude_user_name = self._compile_patterns(exclude_user_name)
+        self._include_user_login_name = self._compile_patterns(include_user_login_name)
+        self._exclude_user_login_name = self._compile_patterns(exclude_user_login_name)
+        self._include_user_email = self._compile_patterns(include_user_email)
+        self._exclude_user_email = self._compile_patterns(exclude_user_email)
+        self._include_warehouse_name = self._compile_patterns(include_warehouse_name)
+        self._exclude_warehouse_name = self._compile_patterns(exclude_warehouse_name)
+        self._include_sql_text = self._compile_patterns(include_sql_text)
+        self._exclude_sql_text = self._compile_patterns(exclude_sql_text)
+        self._include_query_tag = self._compile_patterns(include_query_tag)
+        self._exclude_query_tag = self._compile_patterns(exclude_query_tag)
+
+        self._has_field_patterns = any(
+            [
+                self._include_user_name,
+                self._exclude_user_name,
+                self._include_user_login_name,
+                self._exclude_user_login_name,
+                self._include_user_email,
+                self._exclude_user_email,
+                self._include_warehouse_name,
+                self._exclude_warehouse_name,
+                self._include_query_tag,
+                self._exclude_query_tag,
+            ]
+        )
+
+        self._field_verdicts: Dict[Tuple, bool] = {}
+
+    def __getstate__(self):
+        # Memoized verdicts are not passed to worker processes
+        state = self.__dict__.copy()
+        state["_field_verdicts"] = {}
+
+        return state
+
+    def depends_on_query_text(self):
+        # Otherwise verdict depends only on warehouse name and user name
+        return any([self._include_sql_text, self._exclude_sql_text, self._include_query_tag, self._exclude_query_tag])
+
+    def _compile_patterns(self, patterns: Optional[List[Union[str, Pattern]]]):
+        return CompiledPatterns(patterns) if patterns else None
 
-        if self.exclude_user_name and any(
-            self._match_pattern(query.session.user_name, pattern) for pattern in self.exclude_user_name
-        ):
-            return False
+    def check_query(self, query: Query):
+        # Verdict for all fields except sql_text depends on a small number of distinct combinations of values
+        if self._has_field_patterns:
+            key = (query.session.user_name, query.user.login_name, query.user.email, query.warehouse_name, query.query_tag)
+            verdict = self._field_verdicts.get(key)
 
-        ######
+            if verdict is None:
+                verdict = self._check_fields(query)
 
-        if self.include_user_login_name and not any(
-            self._match_pattern(query.user.login_name, pattern) for pattern in self.include_user_login_name
-        ):
-            return False
+                if len(self._field_verdicts) >= self.FIELD_VERDICTS_MAX_SIZE:
+                    self._field_verdicts.clear()
 
-        if self.exclude_user_login_name and any(
-            self._match_pattern(query.user.login_name, pattern) for pattern in self.exclude_user_login_name
-        ):
-            return False
+                self._field_verdicts[key] = verdict
 
-        ######
+            if not verdict:
+                return False
 
-        if self.include_user_email and not any(
-            self._match_pattern(query.user.email, pattern) for pattern in self.include_user_email
-        ):
-            return False
+        return self._check_patterns(query.sql_text, self._include_sql_text, self._exclude_sql_text)
 
-        if self.exclude_user_email and any(self._match_pattern(query.user.email, pattern) for pattern in self.exclude_user_email):
+    def _check_fields(self, query: Query):
+        if not self._check_patterns(query.session.user_name, self._include_user_name, self._exclude_user_name):
             return False
 
-        ######
-
-        if self.include_warehouse_name and not any(
-            self._match_pattern(query.warehouse_name, pattern) for pattern in self.include_warehouse_name
-        ):
+        if not self._check_patterns(query.user.login_name, self._include_user_login_name, self._exclude_user_login_name):
             return False
 
-        if self.exclude_warehouse_name and any(
-            self._match_pattern(query.warehouse_name, pattern) for pattern in self.exclude_warehouse_name
-        ):
+        if not self._check_patterns(query.user.email, self._include_user_email, self._exclude_user_email):
             return False
 
-        ######
-
-        if self.include_sql_text and not any(self._match_pattern(query.sql_text, pattern) for pattern in self.include_sql_text):
+        if not self._check_patterns(query.warehouse_name, self._include_warehouse_name, self._exclude_warehouse_name):
             return False
 
-        if self.exclude_sql_text and any(self._match_pattern(query.sql_text, pattern) for pattern in self.exclude_sql_text):
+        if not self._check_patterns(query.query_tag, self._include_query_tag, self._exclude_query_tag):
             return False
 
-        ######
+        return True
 
-        if self.include_query_tag and not any(
-            self._match_pattern(query.query_tag, pattern) for pattern in self.include_query_tag
-        ):
+    def _check_patterns(self, val: Optional[str], include: Optional[CompiledPatterns], exclude: Optional[CompiledPatterns]):
+        if include and not include.match(val):
             return False
 
-        if self.exclude_query_tag and any(self._match_pattern(query.query_tag, pattern) for pattern in self.exclude_query_tag):
+        if exclude and exclude.match(val):
             return False
 
         return True
 
-    def _match_pattern(self, val: Optional[str], pattern: Union[str, Pattern]):
-        if val is None:
-            return False
-
-        if isinstance(pattern, Pattern):
-            return True if pattern.fullmatch(val) else False
-
-        return fnmatchcase(val, pattern)
-
 
 class AbstractQueryCondition(ABC):
+    # Set to True for conditions which only compare duration of query in current state with notice, warning and kill durations
+    # Such conditions can be matched for many queries at once by ColumnarConditionSet
+    # Running and queued queries matching only such conditions are checked in place, without thread pool
+    DURATION_ONLY = False
+
     def __init__(
         self,
         *,
@@ -166,8 +240,18 @@ class AbstractQueryCondition(ABC):
 
 
 class AbstractRunningQueryCondition(AbstractQueryCondition, ABC):
+    # Set to False for conditions which do not read query plan
+    # Query plan is loaded only if at least one matching condition requires it
+    REQUIRES_QUERY_PLAN = True
+
+    def __init__(self, *, query_plan_max_age: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+
+        # Max age of query plan in seconds, which can be reused from QueryPlanCache for this condition
+        self.query_plan_max_age = query_plan_max_age
+
     @abstractmethod
-    def check_custom_logic(self, query: Query, query_plan: QueryPlan) -> Optional[Tuple[CheckResultLevel, str]]:
+    def check_custom_logic(self, query: Query, query_plan: Optional[QueryPlan]) -> Optional[Tuple[CheckResultLevel, str]]:
         pass
 
     def check_min_duration(self, query: Query):
@@ -184,6 +268,12 @@ class AbstractQueuedQueryCondition(AbstractQueryCondition, ABC):
 
 
 class AbstractBlockedQueryCondition(AbstractQueryCondition, ABC):
+    def __init__(self, *, kill_root_blocker: bool = False, **kwargs):
+        super().__init__(**kwargs)
+
+        # Abort root blocker transaction instead of blocked query, it unblocks all queries waiting for it
+        self.kill_root_blocker = kill_root_blocker
+
     @abstractmethod
     def check_custom_logic(
         self, query: Query, holding_lock: Optional[HoldingLock], holding_query: Optional[Query]
@@ -5,6 +5,8 @@ from snowkill.struct import Query, CheckResultLevel, HoldingLock
 
 
 class BlockedDurationCondition(AbstractBlockedQueryCondition):
+    DURATION_ONLY = True
+
     def check_custom_logic(
         self,
         waiting_query: Query,
@@ -0,0 +1,132 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Pattern, Tuple, Union
+
+from snowkill.condition.abc_condition import (
+    AbstractQueryCondition,
+    AbstractQueuedQueryCondition,
+    AbstractBlockedQueryCondition,
+    AbstractRunningQueryCondition,
+    CompiledPatterns,
+)
+from snowkill.struct import Query
+
+
+class ConditionSet:
+    """
+    Conditions compiled once per check
+
+    Minimum durations are calculated once, conditions are grouped by query status and sorted by minimum duration
+    Queries below the lowest minimum duration for their status are discarded without evaluating query filters
+
+    Conditions with literal include_warehouse_name or include_user_name in query filter are routed by dict lookup
+    Such conditions are never evaluated for queries running on other warehouses or by other users
+
+    Conditions which override check_min_duration() are not sorted by minimum duration, check_min_duration() is called instead
+    """
+
+    def __init__(self, conditions: List[AbstractQueryCondition]):
+        self.conditions = conditions
+
+        self.blocked_conditions = [c for c in conditions if isinstance(c, AbstractBlockedQueryCondition)]
+        self.queued_conditions = [c for c in conditions if isinstance(c, AbstractQueuedQueryCondition)]
+        self.running_conditions = [c for c in conditions if isinstance(c, AbstractRunningQueryCondition)]
+
+        self._routes: Dict[str, ConditionRoutes] = {
+            "BLOCKED": ConditionRoutes(self._get_routed_conditions(self.blocked_conditions)),
+            "QUEUED": ConditionRoutes(self._get_routed_conditions(self.queued_conditions)),
+            "RUNNING": ConditionRoutes(self._get_routed_conditions(self.running_conditions)),
+        }
+
+    def get_matching_conditions(self, query: Query) -> List[AbstractQueryCondition]:
+        # Restore original order of conditions
+        return [c for _, c in sorted(self._get_matching_candidates(query), key=lambda m: m[0])]
+
+    def get_matching_conditions_for_page(self, queries: List[Query]) -> List[List[AbstractQueryCondition]]:
+        return [self.get_matching_conditions(q) for q in queries]
+
+    def _get_routed_conditions(self, conditions: List[AbstractQueryCondition]) -> List[Tuple[int, AbstractQueryCondition]]:
+        # Position of condition in list of conditions for the same status is used to restore original order
+        return list(enumerate(conditions))
+
+    def _get_matching_candidates(self, query: Query) -> List[Tuple[int, AbstractQueryCondition]]:
+        if query.status not in self._routes:
+            return []
+
+        routes = self._routes[query.status]
+        duration = query.get_current_state_duration()
+
+        candidates = routes.generic.get_candidates(duration)
+
+        if query.warehouse_name in routes.by_warehouse_name:
+            candidates.extend(routes.by_warehouse_name[query.warehouse_name].get_candidates(duration))
+
+        if query.session.user_name in routes.by_user_name:
+            candidates.extend(routes.by_user_name[query.session.user_name].get_candidates(duration))
+
+        if not candidates:
+            return []
+
+        return [
+            (pos, c)
+            for pos, c in candidates
+            if (not has_custom_min_duration(c) or c.check_min_duration(query)) and c.check_query_filter(query)
+        ]
+
+
+def has_custom_min_duration(condition: AbstractQueryCondition):
+    # Standard check_min_duration() of abstract conditions compares duration of query in current state with min duration
+    return type(condition).check_min_duration not in (
+        AbstractBlockedQueryCondition.check_min_duration,
+        AbstractQueuedQueryCondition.check_min_duration,
+        AbstractRunningQueryCondition.check_min_duration,
+    )
+
+
+class ConditionBucket:
+    def __init__(self):
+        self.min_durations: List[int] = []
+        self.conditions: List[Tuple[int, AbstractQueryCondition]] = []
+
+    def add(self, pos: int, condition: AbstractQueryCondition, min_duration: float):
+        idx = bisect_right(self.min_durations, min_duration)
+
+        self.min_durations.insert(idx, min_duration)
+        self.conditions.insert(idx, (pos, condition))
+
+    def get_candidates(self, duration: float):
+        # Only conditions with minimum duration reached by query are evaluated further
+        return self.conditions[: bisect_right(self.min_durations, duration)]
+
+
+class ConditionRoutes:
+    def __init__(self, conditions: List[Tuple[int, AbstractQueryCondition]]):
+        self.generic = ConditionBucket()
+        self.by_warehouse_name: Dict[str, ConditionBucket] = {}
+        self.by_user_name: Dict[str, ConditionBucket] = {}
+
+        for pos, condition in conditions:
+            # Conditions with custom check_min_duration() are always candidates
+            min_duration = float("-inf") if has_custom_min_duration(condition) else condition._calculate_min_duration()
+            query_filter = condition.query_filter
+
+            warehouse_names = self._get_literal_patterns(query_filter.include_warehouse_name) if query_filter else None
+            user_names = self._get_literal_patterns(query_filter.include_user_name) if query_filter else None
+
+            if warehouse_names:
+                for name in warehouse_names:
+                    self.by_warehouse_name.setdefault(name, ConditionBucket()).add(pos, condition, min_duration)
+            elif user_names:
+                for name in user_names:
+                    self.by_user_name.setdefault(name, ConditionBucket()).add(pos, condition, min_duration)
+            else:
+                self.generic.add(pos, condition, min_duration)
+
+    def _get_literal_patterns(self, patterns: Optional[List[Union[str, Pattern]]]):
+        # Only plain strings without glob special chars can be used for routing
+        if not patterns:
+            return None
+
+        if not all(isinstance(p, str) and not any(char in p for char in CompiledPatterns.GLOB_SPECIAL_CHARS) for p in patterns):
+            return None
+
+        return set(patterns)
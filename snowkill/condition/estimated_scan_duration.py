@@ -10,16 +10,12 @@ class EstimatedScanDurationCondition(AbstractRunningQueryCondition):
 
     def check_custom_logic(self, query: Query, query_plan: QueryPlan):
         running_step = query_plan.get_running_step()
+        scan_progress = running_step.get_analysis().scan_progress
 
-        if "Scan progress" not in running_step.statistics_io:
+        if not scan_progress or scan_progress == 1:
             return None
 
-        scan_progress = running_step.statistics_io["Scan progress"].value
-
-        if scan_progress == 0 or scan_progress == 1:
-            return None
-
-        estimated_scan_duration = int(running_step.duration / running_step.statistics_io["Scan progress"].value)
+        estimated_scan_duration = int(running_step.duration / scan_progress)
 
         if estimated_scan_duration < self.min_estimated_scan_duration:
             return None
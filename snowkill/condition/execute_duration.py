@@ -1,9 +1,14 @@
+from typing import Optional
+
 from snowkill.condition.abc_condition import AbstractRunningQueryCondition
 from snowkill.struct import Query, QueryPlan, CheckResultLevel
 
 
 class ExecuteDurationCondition(AbstractRunningQueryCondition):
-    def check_custom_logic(self, query: Query, query_plan: QueryPlan):
+    REQUIRES_QUERY_PLAN = False
+    DURATION_ONLY = True
+
+    def check_custom_logic(self, query: Query, query_plan: Optional[QueryPlan]):
         if self.kill_duration and query.execute_duration >= self.kill_duration:
             return CheckResultLevel.KILL, f"Query was running longer than [{self.kill_duration}] seconds"
 
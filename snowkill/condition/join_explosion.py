@@ -10,17 +10,11 @@ class JoinExplosionCondition(AbstractRunningQueryCondition):
         self.min_explosion_rate = min_explosion_rate
 
     def check_custom_logic(self, query: Query, query_plan: QueryPlan):
-        running_step = query_plan.get_running_step()
+        analysis = query_plan.get_running_step().get_analysis()
 
-        for node in running_step.nodes:
-            # Base node is CartesianJoin
-            if node.name != "Join":
-                continue
-
-            input_rows = sum(running_step.get_rows_between_nodes(un, node) for un in running_step.get_upstream_nodes(node))
-            output_rows = sum(running_step.get_rows_between_nodes(node, dn) for dn in running_step.get_downstream_nodes(node))
-
-            explosion_rate = output_rows / input_rows if input_rows > 0 else 0
+        for node in analysis.nodes_by_name.get("Join", []):
+            output_rows = analysis.output_rows.get(node.id, 0)
+            explosion_rate = analysis.explosion_rates[node.id]
 
             if output_rows > self.min_output_rows and explosion_rate > self.min_explosion_rate:
                 description = f"Join with explosion rate [{explosion_rate:.3f}]"
@@ -3,6 +3,8 @@ from snowkill.struct import Query, CheckResultLevel
 
 
 class QueuedDurationCondition(AbstractQueuedQueryCondition):
+    DURATION_ONLY = True
+
     def check_custom_logic(self, query: Query):
         if self.kill_duration and query.queued_duration >= self.kill_duration:
             return CheckResultLevel.KILL, f"Query was queued longer than [{self.kill_duration}] seconds"
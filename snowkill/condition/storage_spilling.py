@@ -10,19 +10,10 @@ class StorageSpillingCondition(AbstractRunningQueryCondition):
         self.min_remote_spilling_gb = min_remote_spilling_gb
 
     def check_custom_logic(self, query: Query, query_plan: QueryPlan):
-        running_step = query_plan.get_running_step()
+        analysis = query_plan.get_running_step().get_analysis()
 
-        if not running_step.statistics_spilling:
-            return None
-
-        local_spilling_gb = 0
-        remote_spilling_gb = 0
-
-        if "Bytes spilled to local storage" in running_step.statistics_spilling:
-            local_spilling_gb = running_step.statistics_spilling["Bytes spilled to local storage"].value / 1024 / 1024 / 1024
-
-        if "Bytes spilled to remote storage" in running_step.statistics_spilling:
-            remote_spilling_gb = running_step.statistics_spilling["Bytes spilled to remote storage"].value / 1024 / 1024 / 1024
+        local_spilling_gb = analysis.local_spilling_bytes / 1024 / 1024 / 1024
+        remote_spilling_gb = analysis.remote_spilling_bytes / 1024 / 1024 / 1024
 
         if remote_spilling_gb > self.min_remote_spilling_gb:
             description = f"Query spilled at least [{remote_spilling_gb:.1f}] Gb to remote storage"
@@ -10,12 +10,9 @@ class UnionWithoutAllCondition(AbstractRunningQueryCondition):
 
     def check_custom_logic(self, query: Query, query_plan: QueryPlan):
         running_step = query_plan.get_running_step()
+        analysis = running_step.get_analysis()
 
-        for node in running_step.nodes:
-            # Base node is UnionAll
-            if node.name != "UnionAll":
-                continue
-
+        for node in analysis.nodes_by_name.get("UnionAll", []):
             aggregate_nodes = [dn for dn in running_step.get_downstream_nodes(node) if dn.name == "Aggregate"]
 
             # Exactly one downstream aggregate node
@@ -34,7 +31,7 @@ class UnionWithoutAllCondition(AbstractRunningQueryCondition):
             if len(aggregate_nodes[0].labels["Aggregate Functions"].value) > 0:
                 continue
 
-            input_rows = sum(running_step.get_rows_between_nodes(un, node) for un in running_step.get_upstream_nodes(node))
+            input_rows = analysis.input_rows.get(node.id, 0)
 
             # Total number of input rows is above limit
             if input_rows < self.min_input_rows:
@@ -0,0 +1,171 @@
+from datetime import datetime
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple
+
+from snowkill.struct import CheckResult, Query, SkippedQuery, slotted_dataclass
+
+
+@slotted_dataclass
+class QueryPlanFetch:
+    query_id: str
+    warehouse_name: Optional[str]
+
+    # "loaded", "failed" or "timeout"
+    outcome: str
+
+    fetch_duration: float
+    parse_duration: float
+
+
+@slotted_dataclass
+class QueryKill:
+    query_id: str
+    transaction_id: Optional[str]
+    duration: float
+
+
+@slotted_dataclass
+class ListTruncation:
+    subset: Optional[str]
+    reason: str
+
+
+class CycleReport:
+    """
+    Where the time went during one call of check_and_kill_pending_queries
+
+    All durations are wall time in seconds
+    Durations of phases running in parallel are summed, so they may be larger than duration of the whole check
+    Graph data of query plans is parsed lazily, most of parsing time is included in durations of conditions which use it
+    List duration is time spent waiting for pages of query list, matching of conditions is reported separately
+
+    Reports are also produced for failed checks, with is_failed set and phases complete before failure
+    """
+
+    QUERY_PLAN_LOADED = "loaded"
+    QUERY_PLAN_FAILED = "failed"
+    QUERY_PLAN_TIMEOUT = "timeout"
+
+    def __init__(self):
+        self.start_time = datetime.utcnow()
+        self.duration: Optional[float] = None
+
+        self.list_duration = 0.0
+        self.match_duration = 0.0
+        self.user_lookup_duration = 0.0
+        self.lock_scan_duration = 0.0
+        self.holding_query_duration = 0.0
+
+        # Status -> number of pending queries, and number of pending queries with at least one matching condition
+        self.query_counts: Dict[str, int] = {}
+        self.matched_query_counts: Dict[str, int] = {}
+
+        self.query_plan_fetches: List[QueryPlanFetch] = []
+        self.query_plan_cache_hits = 0
+
+        # Condition name -> total duration and number of calls of check_custom_logic()
+        self.condition_durations: Dict[str, float] = {}
+        self.condition_calls: Dict[str, int] = {}
+
+        self.kills: List[QueryKill] = []
+        self.skipped_queries: List[SkippedQuery] = []
+
+        # Query list was not loaded completely, some pending queries were not checked
+        self.list_truncations: List[ListTruncation] = []
+
+        self.num_check_results = 0
+        self.is_failed = False
+
+        # (Condition name, level name) -> number of check results
+        self.check_result_counts: Dict[Tuple[str, str], int] = {}
+
+        self._start_monotonic = monotonic()
+        self._lock = Lock()
+
+    @property
+    def num_query_plan_failures(self):
+        return sum(1 for f in self.query_plan_fetches if f.outcome == self.QUERY_PLAN_FAILED)
+
+    @property
+    def num_query_plan_timeouts(self):
+        return sum(1 for f in self.query_plan_fetches if f.outcome == self.QUERY_PLAN_TIMEOUT)
+
+    @property
+    def query_plan_fetch_duration(self):
+        return sum(f.fetch_duration for f in self.query_plan_fetches)
+
+    @property
+    def query_plan_parse_duration(self):
+        return sum(f.parse_duration for f in self.query_plan_fetches)
+
+    def add_duration(self, phase: str, duration: float):
+        with self._lock:
+            setattr(self, f"{phase}_duration", getattr(self, f"{phase}_duration") + duration)
+
+    def add_queries(self, queries: List[Query], matched: bool = False):
+        counts = self.matched_query_counts if matched else self.query_counts
+
+        with self._lock:
+            for q in queries:
+                counts[q.status] = counts.get(q.status, 0) + 1
+
+    def add_query_plan_fetch(self, query_plan_fetch: QueryPlanFetch):
+        with self._lock:
+            self.query_plan_fetches.append(query_plan_fetch)
+
+    def add_query_plan_cache_hit(self):
+        with self._lock:
+            self.query_plan_cache_hits += 1
+
+    def add_condition_duration(self, condition_name: str, duration: float):
+        with self._lock:
+            self.condition_durations[condition_name] = self.condition_durations.get(condition_name, 0.0) + duration
+            self.condition_calls[condition_name] = self.condition_calls.get(condition_name, 0) + 1
+
+    def add_kill(self, query_kill: QueryKill):
+        with self._lock:
+            self.kills.append(query_kill)
+
+    def add_skipped_query(self, skipped_query: SkippedQuery):
+        with self._lock:
+            self.skipped_queries.append(skipped_query)
+
+    def add_list_truncation(self, list_truncation: ListTruncation):
+        with self._lock:
+            self.list_truncations.append(list_truncation)
+
+    def finish(self, check_results: List[CheckResult], is_failed: bool = False):
+        self.duration = monotonic() - self._start_monotonic
+        self.num_check_results = len(check_results)
+        self.is_failed = is_failed
+
+        for r in check_results:
+            key = (r.name, r.level.name)
+            self.check_result_counts[key] = self.check_result_counts.get(key, 0) + 1
+
+    def get_summary(self) -> Dict[str, Any]:
+        # Flat summary suitable for logging
+        return {
+            "duration": self.duration,
+            "list_duration": self.list_duration,
+            "match_duration": self.match_duration,
+            "user_lookup_duration": self.user_lookup_duration,
+            "lock_scan_duration": self.lock_scan_duration,
+            "holding_query_duration": self.holding_query_duration,
+            "query_plan_fetch_duration": self.query_plan_fetch_duration,
+            "query_plan_parse_duration": self.query_plan_parse_duration,
+            "condition_duration": sum(self.condition_durations.values()),
+            "kill_duration": sum(k.duration for k in self.kills),
+            "query_counts": self.query_counts,
+            "matched_query_counts": self.matched_query_counts,
+            "num_query_plan_fetches": len(self.query_plan_fetches),
+            "num_query_plan_failures": self.num_query_plan_failures,
+            "num_query_plan_timeouts": self.num_query_plan_timeouts,
+            "num_query_plan_cache_hits": self.query_plan_cache_hits,
+            "num_kills": len(self.kills),
+            "num_skipped_queries": len(self.skipped_queries),
+            "num_list_truncations": len(self.list_truncations),
+            "num_check_results": self.num_check_results,
+            "is_failed": self.is_failed,
+        }
@@ -0,0 +1,249 @@
+from logging import getLogger, NullHandler
+from signal import getsignal, signal, SIGINT, SIGTERM
+from threading import current_thread, Event, main_thread
+from snowflake.connector import SnowflakeConnection, Error as SnowflakeError
+from time import monotonic
+from typing import Any, Callable, List, Optional
+
+from snowkill.condition.abc_condition import AbstractQueryCondition
+from snowkill.engine import SnowKillEngine
+from snowkill.formatter.abc_formatter import AbstractFormatter
+from snowkill.formatter.instrumented import InstrumentedFormatter
+from snowkill.metrics import MetricsServer, SnowKillMetrics
+from snowkill.storage.abc_storage import AbstractStorage
+from snowkill.storage.instrumented import InstrumentedStorage
+from snowkill.struct import CheckResult
+
+
+logger = getLogger(__name__)
+logger.addHandler(NullHandler())
+
+
+class SnowKillDaemon:
+    """
+    Long-running process which checks pending queries on a fixed interval
+
+    Engine, connection, user directory and query plan cache of engine, if any, are kept warm between checks
+    Start time of each check is aligned to the original schedule, so it does not drift over time
+    If check takes longer than interval, overrun is reported and missed checks are skipped
+    SIGTERM and SIGINT stop the daemon gracefully after current check is complete
+
+    Optional time_budget is passed to each check, it limits only query plan requests
+    Query list, SHOW LOCKS and kills are not limited, so check may still take longer than interval
+
+    Connection should be created with client_session_keep_alive=True, so session does not expire between checks
+    If connection_factory is set, connection of engine is replaced after reconnect_after_failures consecutive Snowflake errors
+    Connection passed by caller is never closed, since it may be shared, e.g. with storage
+    Only connections created by connection_factory are closed when they are replaced
+
+    Metrics of engine, storage, formatter and notifications are collected if metrics are provided
+    Engine metrics are collected by on_cycle_report hook of engine, which is set by daemon unless engine already has a hook
+    If metrics_port is set, metrics are served in OpenMetrics format on /metrics of metrics_host while daemon is running
+    """
+
+    def __init__(
+        self,
+        engine: SnowKillEngine,
+        conditions: List[AbstractQueryCondition],
+        *,
+        interval: float = 60,
+        time_budget: Optional[float] = None,
+        storage: Optional[AbstractStorage] = None,
+        formatter: Optional[AbstractFormatter] = None,
+        notify: Optional[Callable[[CheckResult, Any], None]] = None,
+        metrics: Optional[SnowKillMetrics] = None,
+        metrics_port: Optional[int] = None,
+        metrics_host: str = "127.0.0.1",
+        connection_factory: Optional[Callable[[], SnowflakeConnection]] = None,
+        reconnect_after_failures: int = 3,
+    ):
+        self.engine = engine
+        self.conditions = conditions
+
+        self.interval = interval
+        self.time_budget = time_budget
+
+        self.storage = storage
+        self.formatter = formatter
+        self.notify = notify
+
+        # Metrics endpoint requires metrics, default metrics are created if not provided
+        if metrics is None and metrics_port is not None:
+            metrics = SnowKillMetrics()
+
+        self.metrics = metrics
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+
+        self.connection_factory = connection_factory
+        self.reconnect_after_failures = reconnect_after_failures
+
+        # Connection created by connection_factory, it is owned by daemon and can be closed
+        self._owned_connection: Optional[SnowflakeConnection] = None
+
+        if self.metrics:
+            if self.storage:
+                self.storage = InstrumentedStorage(self.storage, self.metrics)
+
+            if self.formatter:
+                self.formatter = InstrumentedFormatter(self.formatter, self.metrics)
+
+            # Reports of failed checks are observed by hook as well
+            if self.engine.on_cycle_report is None:
+                self.engine.on_cycle_report = self.metrics.observe_cycle_report
+
+        self.num_checks = 0
+        self.num_failed_checks = 0
+        self.num_overruns = 0
+        self.num_consecutive_failures = 0
+        self.num_reconnects = 0
+        self.last_check_duration: Optional[float] = None
+
+        self._stop_event = Event()
+
+    def run(self, max_checks: Optional[int] = None):
+        previous_handlers = self._install_signal_handlers()
+        next_start_time = monotonic()
+
+        metrics_server = None
+
+        if self.metrics_port is not None:
+            metrics_server = MetricsServer(self.metrics.registry, self.metrics_port, self.metrics_host)
+            metrics_server.start()
+
+            logger.info(f"Serving metrics on port [{metrics_server.port}]")
+
+        try:
+            while not self._stop_event.is_set():
+                start_time = monotonic()
+                self.run_check()
+                self.last_check_duration = monotonic() - start_time
+
+                if max_checks is not None and self.num_checks >= max_checks:
+                    break
+
+                next_start_time += self.interval
+                now = monotonic()
+
+                if now > next_start_time:
+                    num_missed = int((now - next_start_time) // self.interval) + 1
+                    next_start_time += num_missed * self.interval
+
+                    self.num_overruns += 1
+
+                    if self.metrics:
+                        self.metrics.overruns.inc()
+
+                    logger.warning(
+                        f"Check took [{self.last_check_duration:.3f}] seconds, "
+                        f"which is longer than interval [{self.interval}] seconds, skipped [{num_missed}] checks"
+                    )
+
+                self._stop_event.wait(next_start_time - monotonic())
+        finally:
+            self._restore_signal_handlers(previous_handlers)
+
+            if metrics_server:
+                metrics_server.stop()
+
+        logger.info(f"Daemon stopped after [{self.num_checks}] checks")
+
+    def run_check(self) -> List[CheckResult]:
+        self.num_checks += 1
+
+        # Daemon keeps running if one check fails, e.g. due to temporary network issues
+        try:
+            try:
+                check_results = self.engine.check_and_kill_pending_queries(self.conditions, time_budget=self.time_budget)
+                logger.debug(f"Check finished: {self.engine.last_cycle_report.get_summary()}")
+            finally:
+                # Engine has another hook, so report of complete or failed check is observed here
+                if self.metrics and self.engine.on_cycle_report != self.metrics.observe_cycle_report:
+                    self.metrics.observe_cycle_report(self.engine.last_cycle_report)
+
+            if self.storage:
+                check_results = self.storage.store_and_remove_duplicate(check_results)
+        except Exception as e:
+            self.num_failed_checks += 1
+            self.num_consecutive_failures += 1
+
+            if isinstance(e, SnowflakeError):
+                logger.warning(f"Check failed due to [{e.__class__.__name__}]: {e}")
+                self._reconnect_if_required()
+            else:
+                # Other errors are most likely bugs, so traceback is logged as well
+                logger.exception(f"Check failed due to [{e.__class__.__name__}]: {e}")
+
+            return []
+
+        self.num_consecutive_failures = 0
+
+        if self.notify:
+            for r in check_results:
+                try:
+                    self.notify(r, self.formatter.format(r) if self.formatter else None)
+                    status = "sent"
+                except Exception as e:
+                    logger.warning(f"Could not send notification for query [{r.query.query_id}] due to [{e.__class__.__name__}]")
+                    status = "failed"
+
+                if self.metrics:
+                    self.metrics.notifications.inc(status=status)
+
+        return check_results
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _reconnect_if_required(self):
+        # Session might have expired or connection might have been broken, so new connection is created
+        if self.connection_factory is None or self.num_consecutive_failures < self.reconnect_after_failures:
+            return
+
+        try:
+            connection = self.connection_factory()
+        except Exception as e:
+            logger.warning(f"Could not reconnect due to [{e.__class__.__name__}]: {e}")
+            return
+
+        previous_connection = self._owned_connection
+
+        self.engine.set_connection(connection)
+        self._owned_connection = connection
+
+        logger.info(f"Reconnected after [{self.num_consecutive_failures}] failed checks")
+
+        self.num_consecutive_failures = 0
+        self.num_reconnects += 1
+
+        if self.metrics:
+            self.metrics.reconnects.inc()
+
+        # Connection passed by caller might still be used by storage, so it is not closed
+        if previous_connection is None:
+            return
+
+        try:
+            previous_connection.close()
+        except Exception as e:
+            logger.warning(f"Could not close previous connection due to [{e.__class__.__name__}]")
+
+    def _install_signal_handlers(self):
+        # Signal handlers can only be installed in main thread
+        if current_thread() is not main_thread():
+            return {}
+
+        previous_handlers = {s: getsignal(s) for s in (SIGTERM, SIGINT)}
+
+        for s in previous_handlers:
+            signal(s, self._handle_signal)
+
+        return previous_handlers
+
+    def _restore_signal_handlers(self, previous_handlers):
+        for s, handler in previous_handlers.items():
+            signal(s, handler)
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f"Received signal [{signum}], stopping after current check")
+        self.stop()
@@ -1,10 +1,15 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from ipaddress import IPv4Address
+from itertools import count
 from json import loads as json_loads, JSONDecodeError
 from logging import getLogger, NullHandler
+from queue import PriorityQueue, Queue
 from snowflake.connector import DictCursor, SnowflakeConnection, Error as SnowflakeError
-from typing import Dict, List, Optional
+from snowflake.connector.errors import RequestTimeoutError
+from threading import Event, Lock
+from time import monotonic, perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
 from urllib.parse import quote, urlencode
 
 from snowkill.condition.abc_condition import (
@@ -13,21 +18,24 @@ from snowkill.condition.abc_condition import (
     AbstractBlockedQueryCondition,
     AbstractRunningQueryCondition,
 )
+from snowkill.condition.condition_set import ConditionSet
+from snowkill.cycle_report import CycleReport, ListTruncation, QueryKill, QueryPlanFetch
 from snowkill.error import SnowKillRestApiError
+from snowkill.lock_graph import LockGraph
+from snowkill.priority.abc_priority import AbstractQueryPriority
+from snowkill.priority.estimated_cost import EstimatedCostPriority
+from snowkill.query_plan_cache import QueryPlanCache
+from snowkill.user_directory import UserDirectory
 from snowkill.struct import (
     CheckResult,
     CheckResultLevel,
     QueryPlan,
     QueryPlanStep,
-    QueryPlanEdge,
-    QueryPlanWait,
-    QueryPlanStatistics,
-    QueryPlanLabel,
-    QueryPlanNode,
     Query,
     Session,
     HoldingLock,
-    User,
+    SkippedQuery,
+    intern_str,
 )
 
 
@@ -45,15 +53,71 @@ class SnowKillEngine:
     STATUS_BLOCKED = "BLOCKED"
     STATUS_RUNNING = "RUNNING"
 
-    def __init__(self, connection: SnowflakeConnection, max_workers=8):
+    def __init__(
+        self,
+        connection: SnowflakeConnection,
+        max_workers=8,
+        *,
+        list_page_size=1000,
+        list_max_pages=10,
+        list_max_queries=10000,
+        query_plan_cache: Optional[QueryPlanCache] = None,
+        query_priority: Optional[AbstractQueryPriority] = None,
+        condition_set_class: Type[ConditionSet] = ConditionSet,
+        user_directory: Optional[UserDirectory] = None,
+        on_cycle_report: Optional[Callable[[CycleReport], None]] = None,
+    ):
         self.connection = connection
         self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.__class__.__name__)
         self.logger = logger
 
-        self._user_cache: Dict[str, User] = {}
+        # Pagination of query list, max pages and max queries put a ceiling on memory usage for very busy accounts
+        self.list_page_size = list_page_size
+        self.list_max_pages = list_max_pages
+        self.list_max_queries = list_max_queries
+
+        # Optional cache which keeps query plans between checks, plans are loaded on every check otherwise
+        self.query_plan_cache = query_plan_cache
+
+        # Queries with higher priority are checked and have their query plans loaded first
+        self.query_priority = query_priority if query_priority else EstimatedCostPriority()
+
+        # Conditions are compiled into condition set on every check, e.g. ColumnarConditionSet for vectorized evaluation
+        self.condition_set_class = condition_set_class
+
+        # Users are loaded lazily, only for sessions of pending queries
+        self.user_directory = user_directory if user_directory else UserDirectory(connection)
+
         self._query_plan_cache: Dict[str, QueryPlan] = {}
+        self._holding_query_cache: Dict[str, Optional[Query]] = {}
+
+        # Root blocker transactions aborted during current check, each transaction is aborted only once
+        self._killed_transaction_ids: Set[str] = set()
+        self._killed_transaction_ids_lock = Lock()
+
+        # Result levels of previous check, used for query priority
+        self._previous_levels: Dict[str, CheckResultLevel] = {}
 
-        self._reload_user_cache()
+        # Deadline of current check based on time_budget, monotonic clock
+        self._deadline: Optional[float] = None
+
+        # Timings and counters of current check, and of the last complete check
+        self._cycle_report = CycleReport()
+        self.last_cycle_report: Optional[CycleReport] = None
+
+        # Optional hook, which is called with report of each check, including failed checks
+        self.on_cycle_report = on_cycle_report
+
+        self._check_lock = Lock()
+
+        # Query plans and holding queries are loaded on cache miss during checks
+        # AsyncSnowKillEngine preloads them and disables it, so checks never block event loop
+        self._load_on_cache_miss = True
+
+    @property
+    def last_skipped_queries(self) -> List[SkippedQuery]:
+        # Queries which were not fully checked during last check due to time budget
+        return self.last_cycle_report.skipped_queries if self.last_cycle_report else []
 
     def __enter__(self):
         return self
@@ -61,69 +125,220 @@ class SnowKillEngine:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.executor.shutdown()
 
-    def check_and_kill_pending_queries(self, conditions: List[AbstractQueryCondition]) -> List[CheckResult]:
-        self._reset_query_plan_cache()
+    def set_connection(self, connection: SnowflakeConnection):
+        # Replaces connection which is no longer usable, e.g. after session has expired
+        if self.user_directory.connection is self.connection:
+            self.user_directory.connection = connection
+
+        self.connection = connection
+
+    def check_and_kill_pending_queries(
+        self, conditions: List[AbstractQueryCondition], *, time_budget: Optional[float] = None
+    ) -> List[CheckResult]:
+        # If time_budget (in seconds) is exhausted, remaining query plans are not loaded
+        # Conditions which do not require query plan are still evaluated, skipped queries are stored in last_skipped_queries
+        # Only query plan requests are budgeted, query list, SHOW LOCKS, holding queries and kills always run to completion
+        self._start_check(time_budget)
 
         check_results = []
+        is_failed = True
 
-        blocked_conditions = [c for c in conditions if isinstance(c, AbstractBlockedQueryCondition)]
-        queued_conditions = [c for c in conditions if isinstance(c, AbstractQueuedQueryCondition)]
-        running_conditions = [c for c in conditions if isinstance(c, AbstractRunningQueryCondition)]
+        try:
+            check_results = self._check_and_kill_pending_queries(conditions)
+            is_failed = False
+        finally:
+            # Cycle report of failed check is finished as well, so time spent before failure is visible
+            self._finish_check(check_results, is_failed)
 
-        pending_queries = self.get_pending_queries(
-            blocked=len(blocked_conditions) > 0,
-            queued=len(queued_conditions) > 0,
-            running=True,
-        )
+        return check_results
 
-        if any(query.status == self.STATUS_BLOCKED for query in pending_queries.values()):
-            holding_locks = self.get_holding_locks()
+    def _check_and_kill_pending_queries(self, conditions: List[AbstractQueryCondition]) -> List[CheckResult]:
+        check_results = []
+        condition_set = self.condition_set_class(conditions)
+
+        pending_queries = {}
+        blocked_queries = []
+        deferred_queries = []
+        running_query_ids = []
+        futures = []
+
+        # Queries are waiting here for free worker, ordered by priority
+        pending_queue = PriorityQueue()
+        pending_counter = count()
+
+        # Kills are postponed until query list and locks are fully loaded, same as it was before streaming of pages
+        # If loading fails, postponed kills are discarded, so no query is aborted without check result being returned
+        kill_lock = Lock()
+        postponed_kills = []
+        is_prepared = False
+        is_failed = False
 
         # This sub-function runs in parallel by ThreadPoolExecutor below
         # It helps to mitigate query_plan performance issues
-        def _thread_inner_fn(query: Query):
-            results = []
+        def _thread_inner_fn():
+            # Each call is matched by exactly one query put into pending queue before submit
+            # Query with the highest priority is picked among all queries waiting at this moment
+            _, _, query, matching_conditions, holding_locks = pending_queue.get_nowait()
+
+            return _check_and_kill(query, matching_conditions, holding_locks)
+
+        def _check_and_kill(
+            query: Query, matching_conditions: List[AbstractQueryCondition], holding_locks: Dict[str, HoldingLock]
+        ):
+            result = self._check_query(query, matching_conditions, holding_locks)
 
-            if query.status == self.STATUS_BLOCKED:
-                results = [self._check_blocked_query(c, query, holding_locks.get(query.query_id)) for c in blocked_conditions]
+            if result and result.level == CheckResultLevel.KILL:
+                with kill_lock:
+                    if not is_prepared:
+                        postponed_kills.append(result)
+                        return result
 
-            if query.status == self.STATUS_QUEUED:
-                results = [self._check_queued_query(c, query) for c in queued_conditions]
+                if not is_failed:
+                    self._kill(result)
 
-            if query.status == self.STATUS_RUNNING:
-                results = [self._check_running_query(c, query) for c in running_conditions]
+            return result
 
-            # Remove empty results
-            results = [r for r in results if r is not None]
+        def _submit(query: Query, matching_conditions: List[AbstractQueryCondition], holding_locks: Dict[str, HoldingLock]):
+            priority = self._get_query_priority(query, matching_conditions)
+
+            pending_queue.put((-priority, next(pending_counter), query, matching_conditions, holding_locks))
+            futures.append(self.executor.submit(_thread_inner_fn))
+
+        try:
+            # Queries are matched as soon as each page arrives, while next pages of query list are still loading
+            # Time spent on matching and checking pages is excluded from list duration
+            list_start_time = perf_counter()
+            page_duration = 0.0
 
-            if results:
-                result_with_highest_level = max(results, key=lambda r: r.level)
+            for page in self._iter_pending_query_pages(
+                blocked=len(condition_set.blocked_conditions) > 0,
+                queued=len(condition_set.queued_conditions) > 0,
+                running=True,
+            ):
+                page_start_time = perf_counter()
 
-                if result_with_highest_level.level == CheckResultLevel.KILL:
-                    self.connection.cursor().abort_query(query.query_id)
+                pending_queries.update((q.query_id, q) for q in page)
+                running_query_ids.extend(q.query_id for q in page if q.status == self.STATUS_RUNNING)
 
-                yield result_with_highest_level
+                self._cycle_report.add_queries(page)
 
-        for gen in self.executor.map(_thread_inner_fn, pending_queries.values()):
-            check_results.extend(gen)
+                page_matching_conditions = condition_set.get_matching_conditions_for_page(page)
+                self._cycle_report.add_duration("match", perf_counter() - page_start_time)
+
+                for query, matching_conditions in zip(page, page_matching_conditions):
+                    # Queries which cannot match any condition are discarded before any thread or query plan work
+                    if not matching_conditions:
+                        continue
+
+                    self._cycle_report.add_queries([query], matched=True)
+
+                    # Blocked queries are checked after all pending queries are known, holding queries are resolved in bulk
+                    if query.status == self.STATUS_BLOCKED:
+                        blocked_queries.append((query, matching_conditions))
+                        continue
+
+                    # Duration only conditions never send requests, such queries are checked in place without thread pool
+                    if self._is_duration_only(query, matching_conditions):
+                        future = Future()
+                        future.set_result(_check_and_kill(query, matching_conditions, {}))
+                        futures.append(future)
+                        continue
+
+                    # Pages arrive from the newest queries to the oldest, so queries are prioritized after all pages are loaded
+                    # Otherwise the longest running queries from the last pages would wait behind queries from the first pages
+                    deferred_queries.append((query, matching_conditions))
+
+                page_duration += perf_counter() - page_start_time
+
+            self._cycle_report.add_duration("list", perf_counter() - list_start_time - page_duration)
+
+            if blocked_queries:
+                lock_scan_start_time = perf_counter()
+                holding_locks = self.get_holding_locks()
+                self._cycle_report.add_duration("lock_scan", perf_counter() - lock_scan_start_time)
+
+                holding_query_start_time = perf_counter()
+                self._preload_holding_queries(self._get_holding_query_ids(blocked_queries, holding_locks), pending_queries)
+                self._cycle_report.add_duration("holding_query", perf_counter() - holding_query_start_time)
+        except Exception:
+            with kill_lock:
+                is_prepared = True
+                is_failed = True
+
+            # Checks which are already in progress are allowed to finish, but their kills are discarded
+            self._drain_futures(futures)
+            raise
+
+        with kill_lock:
+            is_prepared = True
+
+        kill_futures = [self.executor.submit(self._kill, r) for r in postponed_kills]
+
+        for query, matching_conditions in deferred_queries:
+            _submit(query, matching_conditions, {})
+
+        for query, matching_conditions in blocked_queries:
+            _submit(query, matching_conditions, holding_locks)
+
+        for future in kill_futures:
+            future.result()
+
+        for future in futures:
+            result = future.result()
+
+            if result:
+                check_results.append(result)
+
+        self._previous_levels = {r.query.query_id: r.level for r in check_results}
+
+        if self.query_plan_cache is not None:
+            self.query_plan_cache.retain(running_query_ids)
 
         return check_results
 
-    def _check_blocked_query(self, condition: AbstractBlockedQueryCondition, query: Query, holding_lock: Optional[HoldingLock]):
-        if not condition.check_min_duration(query):
-            return None
+    def _is_duration_only(self, query: Query, matching_conditions: List[AbstractQueryCondition]):
+        # Blocked queries are excluded, since their check results include holding lock and holding query
+        return query.status != self.STATUS_BLOCKED and all(c.DURATION_ONLY for c in matching_conditions)
+
+    def _get_query_priority(self, query: Query, matching_conditions: List[AbstractQueryCondition]) -> float:
+        return self.query_priority.get_priority(query, matching_conditions, self._previous_levels.get(query.query_id))
+
+    def _check_query(
+        self,
+        query: Query,
+        matching_conditions: List[AbstractQueryCondition],
+        holding_locks: Dict[str, HoldingLock],
+    ) -> Optional[CheckResult]:
+        # Min duration and query filter of matching conditions were already checked by ConditionSet
+        results = []
+
+        if query.status == self.STATUS_BLOCKED:
+            results = [self._check_blocked_query(c, query, holding_locks.get(query.query_id)) for c in matching_conditions]
+
+        if query.status == self.STATUS_QUEUED:
+            results = [self._check_queued_query(c, query) for c in matching_conditions]
+
+        if query.status == self.STATUS_RUNNING:
+            results = [self._check_running_query(c, query) for c in matching_conditions]
 
-        if not condition.check_query_filter(query):
+        # Remove empty results
+        results = [r for r in results if r is not None]
+
+        if not results:
             return None
 
-        holding_query = self.get_query_by_id(holding_lock.holding_query_id) if holding_lock else None
-        result = condition.check_custom_logic(query, holding_lock, holding_query)
+        return max(results, key=lambda r: r.level)
+
+    def _check_blocked_query(self, condition: AbstractBlockedQueryCondition, query: Query, holding_lock: Optional[HoldingLock]):
+        holding_query = self._get_holding_query_from_cache(holding_lock.holding_query_id) if holding_lock else None
+        result = self._check_custom_logic(condition, query, holding_lock, holding_query)
 
         if not result:
             return None
 
         level, description = result
         level = condition.adjust_level(query, level)
+        root_blocker_query = self._get_root_blocker_query(condition, level, holding_lock)
 
         return CheckResult(
             level=level,
@@ -132,16 +347,36 @@ class SnowKillEngine:
             query=query,
             holding_lock=holding_lock,
             holding_query=holding_query,
+            kill_root_blocker=root_blocker_query is not None,
+            root_blocker_query=root_blocker_query,
         )
 
-    def _check_queued_query(self, condition: AbstractQueuedQueryCondition, query: Query):
-        if not condition.check_min_duration(query):
+    def _get_root_blocker_query(
+        self, condition: AbstractBlockedQueryCondition, level: CheckResultLevel, holding_lock: Optional[HoldingLock]
+    ) -> Optional[Query]:
+        if level != CheckResultLevel.KILL or not condition.kill_root_blocker:
             return None
 
-        if not condition.check_query_filter(query):
+        if holding_lock is None or holding_lock.root_transaction_id is None or holding_lock.root_query_id is None:
+            return None
+
+        root_blocker_query = self._get_holding_query_from_cache(holding_lock.root_query_id)
+
+        if root_blocker_query is None:
             return None
 
-        result = condition.check_custom_logic(query)
+        # Root blocker transaction is aborted instead of waiting query, so query filters are checked for root blocker query
+        # Otherwise waiting query is killed as usual
+        if not condition.check_query_filter(root_blocker_query):
+            return None
+
+        if condition.adjust_level(root_blocker_query, level) != CheckResultLevel.KILL:
+            return None
+
+        return root_blocker_query
+
+    def _check_queued_query(self, condition: AbstractQueuedQueryCondition, query: Query):
+        result = self._check_custom_logic(condition, query)
 
         if not result:
             return None
@@ -157,18 +392,15 @@ class SnowKillEngine:
         )
 
     def _check_running_query(self, condition: AbstractRunningQueryCondition, query: Query):
-        if not condition.check_min_duration(query):
-            return None
-
-        if not condition.check_query_filter(query):
-            return None
+        query_plan = None
 
-        query_plan = self._get_query_plan_from_cache(query.query_id)
+        if condition.REQUIRES_QUERY_PLAN:
+            query_plan = self._get_query_plan_from_cache(query, condition.query_plan_max_age)
 
-        if not query_plan or not query_plan.get_running_step():
-            return None
+            if not query_plan or not query_plan.get_running_step():
+                return None
 
-        result = condition.check_custom_logic(query, self._query_plan_cache[query.query_id])
+        result = self._check_custom_logic(condition, query, query_plan)
 
         if not result:
             return None
@@ -184,19 +416,80 @@ class SnowKillEngine:
             query_plan=query_plan,
         )
 
+    def _check_custom_logic(self, condition: AbstractQueryCondition, *args):
+        start_time = perf_counter()
+
+        try:
+            return condition.check_custom_logic(*args)
+        finally:
+            self._cycle_report.add_condition_duration(condition.name, perf_counter() - start_time)
+
     def get_pending_queries(self, *, blocked=True, queued=True, running=True) -> Dict[str, Query]:
-        pending_queries = {}
+        return {query.query_id: query for query in self._iter_pending_queries(blocked=blocked, queued=queued, running=running)}
+
+    def _iter_pending_queries(self, *, blocked=True, queued=True, running=True) -> Iterator[Query]:
+        for page in self._iter_pending_query_pages(blocked=blocked, queued=queued, running=running):
+            yield from page
+
+    def _iter_pending_query_pages(self, *, blocked=True, queued=True, running=True) -> Iterator[List[Query]]:
+        subsets = []
 
         if blocked:
-            pending_queries.update(self._list_queries(subset=self.STATUS_BLOCKED))
+            subsets.append(self.STATUS_BLOCKED)
 
         if queued:
-            pending_queries.update(self._list_queries(subset=self.STATUS_QUEUED))
+            subsets.append(self.STATUS_QUEUED)
 
         if running:
-            pending_queries.update(self._list_queries(subset=self.STATUS_RUNNING))
+            subsets.append(self.STATUS_RUNNING)
+
+        # All subsets are loaded concurrently and share the same session table
+        sessions = {}
+        page_queue = Queue()
+
+        # Loading of other subsets stops after current page once consumer is gone, e.g. due to error in one subset
+        is_stopped = Event()
 
-        return pending_queries
+        def _thread_list_fn(subset: str):
+            try:
+                for page in self._iter_query_pages(subset=subset, sessions=sessions):
+                    if is_stopped.is_set():
+                        break
+
+                    page_queue.put(page)
+            except Exception as e:
+                # Error is passed to consumer right away, without waiting for other subsets
+                page_queue.put(e)
+            else:
+                # Signal the end of subset
+                page_queue.put(None)
+
+        for subset in subsets:
+            self.executor.submit(_thread_list_fn, subset)
+
+        num_running_subsets = len(subsets)
+
+        # Query may change status between requests and appear in more than one subset
+        seen_query_ids = set()
+
+        try:
+            while num_running_subsets > 0:
+                page = page_queue.get()
+
+                if isinstance(page, Exception):
+                    raise page
+
+                if page is None:
+                    num_running_subsets -= 1
+                    continue
+
+                new_queries = [q for q in page if q.query_id not in seen_query_ids]
+                seen_query_ids.update(q.query_id for q in new_queries)
+
+                if new_queries:
+                    yield new_queries
+        finally:
+            is_stopped.set()
 
     def get_query_by_id(self, query_id: str) -> Optional[Query]:
         queries = self._list_queries(query_id=query_id)
@@ -206,144 +499,390 @@ class SnowKillEngine:
 
         return queries[query_id]
 
-    def _reload_user_cache(self):
-        self._user_cache = {}
+    def _drain_futures(self, futures: List[Future]):
+        for future in futures:
+            future.cancel()
 
-        cursor = self.connection.cursor(DictCursor)
-        cursor.execute("SHOW USERS")
-
-        for r in cursor:
-            self._user_cache[r["name"]] = User(
-                name=r["name"],
-                login_name=r["login_name"],
-                display_name=r["display_name"],
-                first_name=r["first_name"] if r["first_name"] else None,
-                last_name=r["last_name"] if r["last_name"] else None,
-                email=r["email"] if r["email"] else None,
-                comment=r["comment"] if r["comment"] else None,
-                default_warehouse=r["default_warehouse"] if r["default_warehouse"] else None,
-                default_role=r["default_role"] if r["default_role"] else None,
-                owner=r["owner"] if r["owner"] else None,
-            )
+        wait(futures)
 
     def _reset_query_plan_cache(self):
         self._query_plan_cache = {}
 
-    def _get_user_from_cache(self, user_name: str):
-        # User with this name was not returned from SHOW USERS
-        # It may happen due to race condition
-        if user_name not in self._user_cache:
-            self._user_cache[user_name] = User(
-                name=user_name,
-                login_name=None,
-                display_name=None,
-                first_name=None,
-                last_name=None,
-                email=None,
-                comment=None,
-                default_warehouse=None,
-                default_role=None,
-                owner=None,
+    def _reset_holding_query_cache(self):
+        self._holding_query_cache = {}
+
+    def _reset_killed_transaction_ids(self):
+        self._killed_transaction_ids = set()
+
+    def _kill(self, result: CheckResult):
+        start_time = perf_counter()
+
+        if not result.kill_root_blocker:
+            self.connection.cursor().abort_query(result.query.query_id)
+            self._cycle_report.add_kill(QueryKill(result.query.query_id, None, perf_counter() - start_time))
+            return
+
+        transaction_id = result.holding_lock.root_transaction_id
+
+        with self._killed_transaction_ids_lock:
+            if transaction_id in self._killed_transaction_ids:
+                return
+
+            self._killed_transaction_ids.add(transaction_id)
+
+        self.abort_transaction(transaction_id)
+        self._cycle_report.add_kill(QueryKill(result.query.query_id, transaction_id, perf_counter() - start_time))
+
+    def _start_check(self, time_budget: Optional[float]):
+        # State of current check, e.g. caches and cycle report, is stored in engine, so checks cannot run concurrently
+        if not self._check_lock.acquire(blocking=False):
+            raise ValueError("Another check is already running, use separate engines for concurrent checks")
+
+        self._reset_query_plan_cache()
+        self._reset_holding_query_cache()
+        self._reset_deadline(time_budget)
+        self._reset_killed_transaction_ids()
+        self._reset_cycle_report()
+
+    def _finish_check(self, check_results: List[CheckResult], is_failed: bool = False):
+        try:
+            self._finish_cycle_report(check_results, is_failed)
+        finally:
+            self._check_lock.release()
+
+    def _reset_cycle_report(self):
+        self._cycle_report = CycleReport()
+
+    def _finish_cycle_report(self, check_results: List[CheckResult], is_failed: bool = False):
+        self._cycle_report.finish(check_results, is_failed)
+        self.last_cycle_report = self._cycle_report
+
+        # Calls outside of checks, e.g. get_query_by_id(), do not affect the last report
+        self._cycle_report = CycleReport()
+
+        if self.on_cycle_report:
+            try:
+                self.on_cycle_report(self.last_cycle_report)
+            except Exception as e:
+                logger.warning(f"Cycle report hook failed due to [{e.__class__.__name__}]")
+
+    def _reset_deadline(self, time_budget: Optional[float]):
+        self._deadline = None if time_budget is None else monotonic() + time_budget
+
+    def _get_query_plan_timeout(self, query: Query) -> Optional[int]:
+        # Timeout of query plan request is capped by remaining time budget
+        # None means time budget is exhausted, query plan should not be loaded
+        if self._deadline is None:
+            return self.REST_ENDPOINT_QUERY_PLAN_TIMEOUT
+
+        remaining = self._deadline - monotonic()
+
+        if remaining <= 0:
+            self._cycle_report.add_skipped_query(
+                SkippedQuery(query=query, reason="Time budget exhausted before query plan was loaded")
             )
+            return None
 
-        return self._user_cache[user_name]
+        return max(1, min(self.REST_ENDPOINT_QUERY_PLAN_TIMEOUT, int(remaining)))
 
-    def _get_query_plan_from_cache(self, query_id: str):
-        if query_id not in self._query_plan_cache:
-            self._query_plan_cache[query_id] = self.get_query_plan(query_id)
+    def _get_query_plan_from_cache(self, query: Query, max_age: Optional[int] = None):
+        # Query plan was already loaded during current check
+        if query.query_id in self._query_plan_cache:
+            return self._query_plan_cache[query.query_id]
 
-        return self._query_plan_cache[query_id]
+        if self.query_plan_cache is not None:
+            query_plan = self.query_plan_cache.get(query, max_age)
 
-    def _list_queries(self, subset: Optional[str] = None, query_id: Optional[str] = None):
-        url_params = {
-            "max": 1000,
-            "internal": "false",
-            "scheduled_replication_task_jobs": "false",
-            "start": self._datetime_to_int(datetime.utcnow() - timedelta(hours=24)),
-        }
+            if query_plan:
+                self._cycle_report.add_query_plan_cache_hit()
+                return query_plan
 
-        if subset:
-            url_params["subset"] = subset
+        if not self._load_on_cache_miss:
+            return None
 
-        if query_id:
-            url_params["uuid"] = query_id
+        timeout = self._get_query_plan_timeout(query)
 
-        response = self.connection.rest.request(
-            url=f"{self.REST_ENDPOINT_QUERY_LIST}?{urlencode(url_params)}",
-            method="get",
-            client="rest",
-        )
+        if timeout is None:
+            # Do not try again for other conditions during current check
+            self._query_plan_cache[query.query_id] = None
+            return None
 
-        if not response.get("success"):
-            raise SnowKillRestApiError(response.get("code"), response.get("message"))
+        query_plan = self._load_query_plan(query, timeout)
+        self._set_query_plan_cache(query, query_plan)
 
-        sessions = {}
-        queries = {}
-
-        for s in response["data"]["sessionsShort"]:
-            sessions[s["idAsString"]] = Session(
-                session_id=s["idAsString"],
-                client_application=s["clientApplication"],
-                client_environment=self._try_parse_json(s["clientEnvironment"]),
-                client_net_address=IPv4Address(s["clientNetAddress"]) if s["clientNetAddress"] is not None else None,
-                client_support_info=s["clientSupportInfo"],
-                user_name=s["userName"],
+        return query_plan
+
+    def _load_query_plan(self, query: Query, timeout: int) -> Optional[QueryPlan]:
+        # Same as get_query_plan(), but fetch and parse are measured separately for cycle report
+        fetch_start_time = perf_counter()
+        response, outcome = self._request_query_plan(query.query_id, timeout)
+
+        return self._parse_query_plan_response(query, timeout, response, outcome, perf_counter() - fetch_start_time)
+
+    def _parse_query_plan_response(
+        self, query: Query, timeout: int, response: Optional[dict], outcome: str, fetch_duration: float
+    ) -> Optional[QueryPlan]:
+        parse_start_time = perf_counter()
+        query_plan = self._build_query_plan(response) if response else None
+        parse_duration = perf_counter() - parse_start_time
+
+        self._cycle_report.add_query_plan_fetch(
+            QueryPlanFetch(
+                query_id=query.query_id,
+                warehouse_name=query.warehouse_name,
+                outcome=outcome,
+                fetch_duration=fetch_duration,
+                parse_duration=parse_duration,
             )
+        )
+
+        # Request might have succeeded with full timeout, so query is reported as skipped due to time budget
+        if outcome == CycleReport.QUERY_PLAN_TIMEOUT and timeout < self.REST_ENDPOINT_QUERY_PLAN_TIMEOUT:
+            self._cycle_report.add_skipped_query(
+                SkippedQuery(query=query, reason="Query plan request timed out after timeout was capped by time budget")
+            )
+
+        return query_plan
 
-        for q in response["data"]["queries"]:
-            # Skip queries in compiling state
-            if q["state"] == "GS_COMPILING":
+    def _set_query_plan_cache(self, query: Query, query_plan: Optional[QueryPlan]):
+        self._query_plan_cache[query.query_id] = query_plan
+
+        if self.query_plan_cache is not None and query_plan:
+            self.query_plan_cache.put(query, query_plan)
+
+    def _preload_holding_queries(self, holding_query_ids: List[str], pending_queries: Dict[str, Query]):
+        # Many blocked queries usually wait for the same holding query, so each holding query is resolved only once
+        # Holding query is taken from pending queries if possible, other holding queries are loaded concurrently
+        futures = {}
+
+        for query_id in dict.fromkeys(holding_query_ids):
+            if query_id in self._holding_query_cache:
                 continue
 
-            queries[q["id"]] = Query(
-                query_id=q["id"],
-                query_tag=q["queryTag"],
-                sql_text=q["sqlText"],
-                status=q["status"],
-                state=q["state"],
-                session=sessions[q["sessionIdAsString"]],
-                user=self._get_user_from_cache(sessions[q["sessionIdAsString"]].user_name),
-                client_send_time=self._int_to_datetime(q["clientSendTime"]),
-                start_time=self._int_to_datetime(q["startTime"]),
-                end_time=self._int_to_datetime(q["endTime"]),
-                compile_duration=q["gsCompileDuration"] / 1000,
-                execute_duration=(q["gsExecDuration"] + q["xpExecDuration"]) / 1000,
-                queued_duration=q.get("stats", {}).get("queuedLoadTime", 0) / 1000,
-                listing_external_file_duration=q["listingExternalFiles"] / 1000,
-                total_duration=q["totalDuration"] / 1000,
-                warehouse_id=q["warehouseId"],
-                warehouse_name=q["warehouseName"],
-                warehouse_external_size=q["warehouseExternalSize"],
-                warehouse_server_type=q["warehouseServerType"],
-                stats=q.get("stats", {}),
-                meta_version=q["metaVersion"],
-                snowflake_version=(
-                    q["majorVersionNumber"],
-                    q["minorVersionNumber"],
-                    q["patchVersionNumber"],
-                ),
+            if query_id in pending_queries:
+                self._holding_query_cache[query_id] = pending_queries[query_id]
+            else:
+                futures[query_id] = self.executor.submit(self.get_query_by_id, query_id)
+
+        for query_id, future in futures.items():
+            self._holding_query_cache[query_id] = future.result()
+
+    def _get_holding_query_ids(
+        self, blocked_queries: List[Tuple[Query, List[AbstractQueryCondition]]], holding_locks: Dict[str, HoldingLock]
+    ):
+        holding_query_ids = []
+
+        for query, matching_conditions in blocked_queries:
+            if query.query_id not in holding_locks:
+                continue
+
+            holding_lock = holding_locks[query.query_id]
+            holding_query_ids.append(holding_lock.holding_query_id)
+
+            # Root blocker query is required to check query filters before root blocker transaction is aborted
+            if holding_lock.root_query_id and any(c.kill_root_blocker for c in matching_conditions):
+                holding_query_ids.append(holding_lock.root_query_id)
+
+        return holding_query_ids
+
+    def _get_holding_query_from_cache(self, query_id: str):
+        if query_id not in self._holding_query_cache:
+            if not self._load_on_cache_miss:
+                return None
+
+            self._holding_query_cache[query_id] = self.get_query_by_id(query_id)
+
+        return self._holding_query_cache[query_id]
+
+    def _list_queries(self, subset: Optional[str] = None, query_id: Optional[str] = None) -> Dict[str, Query]:
+        return {query.query_id: query for query in self._iter_queries(subset=subset, query_id=query_id)}
+
+    def _iter_queries(self, subset: Optional[str] = None, query_id: Optional[str] = None) -> Iterator[Query]:
+        for page in self._iter_query_pages(subset=subset, query_id=query_id):
+            yield from page
+
+    def _iter_query_pages(
+        self, subset: Optional[str] = None, query_id: Optional[str] = None, sessions: Optional[Dict[str, Session]] = None
+    ) -> Iterator[List[Query]]:
+        if sessions is None:
+            sessions = {}
+
+        seen_query_ids = set()
+        end_time = None
+        num_queries = 0
+
+        for _ in range(self.list_max_pages):
+            url_params = {
+                "max": self.list_page_size,
+                "internal": "false",
+                "scheduled_replication_task_jobs": "false",
+                "start": self._datetime_to_int(datetime.utcnow() - timedelta(hours=24)),
+            }
+
+            if end_time:
+                url_params["end"] = end_time
+
+            if subset:
+                url_params["subset"] = subset
+
+            if query_id:
+                url_params["uuid"] = query_id
+
+            response = self.connection.rest.request(
+                url=f"{self.REST_ENDPOINT_QUERY_LIST}?{urlencode(url_params)}",
+                method="get",
+                client="rest",
             )
 
-        return queries
+            if not response.get("success"):
+                raise SnowKillRestApiError(response.get("code"), response.get("message"))
+
+            page_user_names = set()
+
+            for s in response["data"]["sessionsShort"]:
+                page_user_names.add(s["userName"])
+
+                # Session was already parsed from another page or another subset
+                if s["idAsString"] in sessions:
+                    continue
+
+                sessions[s["idAsString"]] = self._build_session(s)
+
+            # Users of all sessions of this page are loaded before queries are built, including sessions added by another subset
+            # Another subset may still be loading the same users, prefetch waits for it, so placeholder user is never used
+            user_lookup_start_time = perf_counter()
+            self.user_directory.prefetch(page_user_names)
+            self._cycle_report.add_duration("user_lookup", perf_counter() - user_lookup_start_time)
+
+            # Time windows of pages overlap by 1 millisecond, queries from previous pages are skipped
+            new_query_defs = [q for q in response["data"]["queries"] if q["id"] not in seen_query_ids]
+            seen_query_ids.update(q["id"] for q in new_query_defs)
+
+            page = []
+
+            for q in new_query_defs:
+                # Skip queries in compiling state
+                if q["state"] == "GS_COMPILING":
+                    continue
+
+                if num_queries >= self.list_max_queries:
+                    self._truncate_query_list(subset, f"Query list was truncated after [{self.list_max_queries}] queries")
+                    yield page
+                    return
+
+                page.append(self._build_query(q, sessions[q["sessionIdAsString"]]))
+                num_queries += 1
+
+            yield page
+
+            # Last page is not full
+            if len(response["data"]["queries"]) < self.list_page_size:
+                return
+
+            # Page does not bring any new queries, it should not happen, since time windows of pages move back every time
+            if not new_query_defs:
+                self._truncate_query_list(subset, "Query list was truncated, page did not contain any new queries")
+                return
+
+            min_start_time = min(q["startTime"] for q in response["data"]["queries"])
+            max_start_time = max(q["startTime"] for q in response["data"]["queries"])
+
+            if min_start_time == max_start_time:
+                # Full page of queries started in the same millisecond, remaining queries of this millisecond cannot be paginated
+                # They are skipped, so queries started earlier are still loaded
+                self._truncate_query_list(
+                    subset, f"Query list was truncated, more than [{self.list_page_size}] queries started at [{min_start_time}]"
+                )
+                end_time = min_start_time
+            else:
+                # Next page covers queries started before the oldest query of current page
+                end_time = min_start_time + 1
+
+        self._truncate_query_list(subset, f"Query list was truncated after [{self.list_max_pages}] pages")
+
+    def _truncate_query_list(self, subset: Optional[str], reason: str):
+        logger.warning(f"{reason}, subset [{subset}]")
+        self._cycle_report.add_list_truncation(ListTruncation(subset=subset, reason=reason))
+
+    def _build_session(self, s: dict) -> Session:
+        return Session(
+            session_id=s["idAsString"],
+            client_application=intern_str(s["clientApplication"]),
+            client_environment=self._try_parse_json(s["clientEnvironment"]),
+            client_net_address=IPv4Address(s["clientNetAddress"]) if s["clientNetAddress"] is not None else None,
+            client_support_info=intern_str(s["clientSupportInfo"]),
+            user_name=intern_str(s["userName"]),
+        )
+
+    def _build_query(self, q: dict, session: Session) -> Query:
+        return Query(
+            query_id=q["id"],
+            query_tag=intern_str(q["queryTag"]),
+            sql_text=q["sqlText"],
+            status=intern_str(q["status"]),
+            state=intern_str(q["state"]),
+            session=session,
+            user=self.user_directory.get_user(session.user_name),
+            client_send_time=self._int_to_datetime(q["clientSendTime"]),
+            start_time=self._int_to_datetime(q["startTime"]),
+            end_time=self._int_to_datetime(q["endTime"]),
+            compile_duration=q["gsCompileDuration"] / 1000,
+            execute_duration=(q["gsExecDuration"] + q["xpExecDuration"]) / 1000,
+            queued_duration=q.get("stats", {}).get("queuedLoadTime", 0) / 1000,
+            listing_external_file_duration=q["listingExternalFiles"] / 1000,
+            total_duration=q["totalDuration"] / 1000,
+            warehouse_id=q["warehouseId"],
+            warehouse_name=intern_str(q["warehouseName"]),
+            warehouse_external_size=intern_str(q["warehouseExternalSize"]),
+            warehouse_server_type=intern_str(q["warehouseServerType"]),
+            stats=q.get("stats", {}),
+            meta_version=q["metaVersion"],
+            snowflake_version=(
+                q["majorVersionNumber"],
+                q["minorVersionNumber"],
+                q["patchVersionNumber"],
+            ),
+        )
+
+    def get_query_plan(self, query_id: str, timeout: Optional[int] = None):
+        response, _ = self._request_query_plan(query_id, timeout)
+
+        # Request was terminated due to error or timeout
+        # Query plan is not available
+        if not response:
+            return None
+
+        return self._build_query_plan(response)
+
+    def _request_query_plan(self, query_id: str, timeout: Optional[int] = None) -> Tuple[Optional[dict], str]:
+        timeout = timeout or self.REST_ENDPOINT_QUERY_PLAN_TIMEOUT
+        start_time = monotonic()
 
-    def get_query_plan(self, query_id: str):
         try:
             response = self.connection.rest.request(
                 url=f"{self.REST_ENDPOINT_QUERY_PLAN}/{quote(query_id)}",
                 method="get",
                 client="rest",
-                timeout=self.REST_ENDPOINT_QUERY_PLAN_TIMEOUT,
+                timeout=timeout,
                 _no_retry=True,
             )
+        except RequestTimeoutError as e:
+            logger.warning(f"Could not load query plan for query_id [{query_id}] due to [{e.__class__.__name__}]")
+            return None, CycleReport.QUERY_PLAN_TIMEOUT
         except SnowflakeError as e:
             logger.warning(f"Could not load query plan for query_id [{query_id}] due to [{e.__class__.__name__}]")
-            response = None
+            return None, CycleReport.QUERY_PLAN_FAILED
 
-        # Request was terminated due to error or timeout
-        # Query plan is not available
+        # Connector returns empty response without exception if request was terminated due to timeout or error
         if not response:
-            return None
+            if monotonic() - start_time >= timeout:
+                return None, CycleReport.QUERY_PLAN_TIMEOUT
+
+            return None, CycleReport.QUERY_PLAN_FAILED
+
+        return response, CycleReport.QUERY_PLAN_LOADED
 
+    def _build_query_plan(self, response: dict) -> QueryPlan:
         # Something is wrong with response, attention is required
         if not response.get("success"):
             raise SnowKillRestApiError(response.get("code"), response.get("message"))
@@ -355,145 +894,27 @@ class SnowKillEngine:
 
         return QueryPlan(steps=steps)
 
-    def get_holding_locks(self):
+    def get_holding_locks(self) -> Dict[str, HoldingLock]:
+        return self.get_lock_graph().holding_locks
+
+    def get_lock_graph(self) -> LockGraph:
         cursor = self.connection.cursor(DictCursor)
         cursor.execute("SHOW LOCKS IN ACCOUNT")
 
-        holding_row_cache = {}
-        holding_locks = {}
-
-        for r in cursor:
-            key = (r["resource"], r["type"])
-
-            if r["status"] == "HOLDING":
-                holding_row_cache[key] = r
-            elif r["status"] == "WAITING" and key in holding_row_cache:
-                holding_locks[r["query_id"]] = HoldingLock(
-                    waiting_query_id=r["query_id"],
-                    waiting_session_id=r["session"],
-                    waiting_transaction_id=r["transaction"],
-                    holding_query_id=holding_row_cache[key]["query_id"],
-                    holding_session_id=holding_row_cache[key]["session"],
-                    holding_transaction_id=holding_row_cache[key]["transaction"],
-                    resource=r["resource"],
-                    type=r["type"],
-                )
+        return LockGraph(cursor)
 
-        return holding_locks
+    def abort_transaction(self, transaction_id: str):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT SYSTEM$ABORT_TRANSACTION(%(transaction_id)s)", {"transaction_id": int(transaction_id)})
 
     def _build_query_plan_step(self, step_def: dict):
-        nodes = []
-        edges = []
-        labels = {}
-        waits = {}
-        statistics_io = {}
-        statistics_pruning = {}
-        statistics_spilling = {}
-
-        for item in step_def["graphData"]["nodes"]:
-            nodes.append(self._build_query_plan_node(item))
-
-        for item in step_def["graphData"]["edges"]:
-            edges.append(
-                QueryPlanEdge(
-                    id=item["id"],
-                    src=item["src"],
-                    dst=item["dst"],
-                    rows=item["rows"],
-                    expressions=item["expressions"],
-                )
-            )
-
-        for item in step_def["graphData"].get("labels", []):
-            labels[item["name"]] = QueryPlanLabel(
-                name=item["name"],
-                value=item["value"],
-            )
-
-        for item in step_def["graphData"]["global"].get("waits", []):
-            waits[item["name"]] = QueryPlanWait(
-                name=item["name"],
-                value=item["value"],
-                percentage=item["percentage"],
-            )
-
-        for item in step_def["graphData"]["global"].get("statistics", {}).get("IO", []):
-            statistics_io[item["name"]] = QueryPlanStatistics(
-                name=item["name"],
-                value=item["value"],
-                unit=item["unit"],
-            )
-
-        for item in step_def["graphData"]["global"].get("statistics", {}).get("Pruning", []):
-            statistics_pruning[item["name"]] = QueryPlanStatistics(
-                name=item["name"],
-                value=item["value"],
-                unit=item["unit"],
-            )
-
-        for item in step_def["graphData"]["global"].get("statistics", {}).get("Spilling", []):
-            statistics_spilling[item["name"]] = QueryPlanStatistics(
-                name=item["name"],
-                value=item["value"],
-                unit=item["unit"],
-            )
-
+        # Graph data is parsed on first access, only for steps which are actually used by conditions
         return QueryPlanStep(
             step=step_def["step"],
             description=step_def["description"],
             duration=step_def["timeInMs"] / 1000,
             state=step_def["state"],
-            nodes=nodes,
-            edges=edges,
-            labels=labels,
-            waits=waits,
-            statistics_io=statistics_io,
-            statistics_pruning=statistics_pruning,
-            statistics_spilling=statistics_spilling,
-        )
-
-    def _build_query_plan_node(self, node_def: dict):
-        labels = {}
-        waits = {}
-        statistics_io = {}
-        statistics_pruning = {}
-
-        for item in node_def.get("labels", []):
-            labels[item["name"]] = QueryPlanLabel(
-                name=item["name"],
-                value=item["value"],
-            )
-
-        for item in node_def.get("waits", []):
-            waits[item["name"]] = QueryPlanWait(
-                name=item["name"],
-                value=item["value"],
-                percentage=item["percentage"],
-            )
-
-        for item in node_def.get("statistics", {}).get("IO", []):
-            statistics_io[item["name"]] = QueryPlanStatistics(
-                name=item["name"],
-                value=item["value"],
-                unit=item["unit"],
-            )
-
-        for item in node_def.get("statistics", {}).get("Pruning", []):
-            statistics_pruning[item["name"]] = QueryPlanStatistics(
-                name=item["name"],
-                value=item["value"],
-                unit=item["unit"],
-            )
-
-        return QueryPlanNode(
-            id=node_def["id"],
-            logical_id=node_def["logicalId"],
-            name=node_def["name"],
-            title=node_def.get("title"),
-            labels=labels,
-            waits=waits,
-            statistics_io=statistics_io,
-            statistics_pruning=statistics_pruning,
+            graph_data=step_def["graphData"],
         )
 
     def _try_parse_json(self, val: str):
@@ -9,3 +9,11 @@ class SnowKillRestApiError(SnowKillError):
 
     def __str__(self):
         return f"[{self.code}]: {self.message}"
+
+
+class SnowKillReplayError(SnowKillError):
+    def __init__(self, key):
+        self.key = key
+
+    def __str__(self):
+        return f"Request [{self.key}] was not found in snapshot"
@@ -13,14 +13,7 @@ class AbstractFormatter(ABC):
         pass
 
     def _get_query_current_state_duration(self, query: Query):
-        if query.status == "RUNNING":
-            duration = query.execute_duration
-        elif query.status == "QUEUED":
-            duration = query.queued_duration
-        else:
-            duration = query.total_duration
-
-        return duration
+        return query.get_current_state_duration()
 
     def _get_snowsight_profile_url(self, snowsight_base_url: str, query_id: str):
         return f"{snowsight_base_url}compute/history/queries/{query_id}/profile"
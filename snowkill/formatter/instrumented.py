@@ -0,0 +1,29 @@
+from time import perf_counter
+from typing import Any
+
+from snowkill.formatter.abc_formatter import AbstractFormatter
+from snowkill.metrics import SnowKillMetrics
+from snowkill.struct import CheckResult
+
+
+class InstrumentedFormatter(AbstractFormatter):
+    """
+    Wrapper for any formatter, which collects wall time and number of errors of wrapped formatter
+    """
+
+    def __init__(self, formatter: AbstractFormatter, metrics: SnowKillMetrics):
+        self.formatter = formatter
+        self.metrics = metrics
+
+        self.formatter_name = formatter.__class__.__name__
+
+    def format(self, result: CheckResult) -> Any:
+        start_time = perf_counter()
+
+        try:
+            return self.formatter.format(result)
+        except Exception:
+            self.metrics.formatter_errors.inc(formatter=self.formatter_name)
+            raise
+        finally:
+            self.metrics.formatter_duration.observe(perf_counter() - start_time, formatter=self.formatter_name)
@@ -71,11 +71,25 @@ class MarkdownFormatter(AbstractFormatter):
         ]
 
     def _get_holding_lock_blocks(self, result: CheckResult):
-        return [
+        blocks = [
             f"**Blocked by:** [{result.holding_lock.holding_query_id}]({self._get_snowsight_profile_url(self.snowsight_base_url, result.holding_lock.holding_query_id)})",
             f"**Blocked on:** `{self._replace_backticks(result.holding_lock.resource)} ({result.holding_lock.type})`",
         ]
 
+        # Direct holder is waiting for another transaction, or root blocker transaction is aborted
+        if (result.holding_lock.chain_depth > 1 or result.kill_root_blocker) and result.holding_lock.root_query_id:
+            blocks.extend(
+                [
+                    f"**Root blocker:** [{result.holding_lock.root_query_id}]({self._get_snowsight_profile_url(self.snowsight_base_url, result.holding_lock.root_query_id)})",
+                    f"**Chain depth:** `{result.holding_lock.chain_depth}`, **Blocked transactions:** `{result.holding_lock.root_blocked_count}`{', **Deadlock**' if result.holding_lock.is_deadlock else ''}",
+                ]
+            )
+
+        if result.kill_root_blocker:
+            blocks.append(f"**Aborted transaction:** `{result.holding_lock.root_transaction_id}`")
+
+        return blocks
+
     def _get_holding_query_text_blocks(self, result: CheckResult):
         return [
             f"```\n{self._replace_triple_backticks(self._normalize_query_text(result.holding_query.sql_text))}\n```",
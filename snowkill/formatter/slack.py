@@ -119,7 +119,7 @@ class SlackFormatter(AbstractFormatter):
         ]
 
     def _get_holding_lock_blocks(self, result: CheckResult):
-        return [
+        blocks = [
             {
                 "type": "section",
                 "text": {
@@ -136,6 +136,40 @@ class SlackFormatter(AbstractFormatter):
             },
         ]
 
+        # Direct holder is waiting for another transaction, or root blocker transaction is aborted
+        if (result.holding_lock.chain_depth > 1 or result.kill_root_blocker) and result.holding_lock.root_query_id:
+            blocks.extend(
+                [
+                    {
+                        "type": "section",
+                        "text": {
+                            "type": "mrkdwn",
+                            "text": f"*Root blocker:* <{self._get_snowsight_profile_url(self.snowsight_base_url, result.holding_lock.root_query_id)}|{result.holding_lock.root_query_id}>",
+                        },
+                    },
+                    {
+                        "type": "section",
+                        "text": {
+                            "type": "mrkdwn",
+                            "text": f"*Chain depth:* `{result.holding_lock.chain_depth}`, *Blocked transactions:* `{result.holding_lock.root_blocked_count}`{', *Deadlock*' if result.holding_lock.is_deadlock else ''}",
+                        },
+                    },
+                ]
+            )
+
+        if result.kill_root_blocker:
+            blocks.append(
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": f"*Aborted transaction:* `{result.holding_lock.root_transaction_id}`",
+                    },
+                }
+            )
+
+        return blocks
+
     def _get_holding_query_text_blocks(self, result: CheckResult):
         return [
             {
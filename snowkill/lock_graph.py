@@ -0,0 +1,196 @@
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+from snowkill.struct import HoldingLock
+
+
+class LockGraph:
+    """
+    Transaction level wait-for graph built from a single SHOW LOCKS IN ACCOUNT
+
+    Waiting transaction waits for all transactions holding a lock on the same resource
+    Root blockers are transactions reachable from waiting transaction, which are not waiting for anything themselves
+    If waiting transaction has many roots, root which blocks the largest number of transactions is reported
+
+    Transactions waiting for each other in a cycle are reported as deadlocks
+    Such cycle is treated as a single root, the latest transaction of the cycle is chosen as the only victim
+    """
+
+    def __init__(self, rows: Iterable[dict]):
+        # Waiting query_id -> lock held by direct holder, same as in previous versions of get_holding_locks()
+        self.holding_locks: Dict[str, HoldingLock] = {}
+
+        # Transaction -> all transactions holding locks it waits for, and reverse
+        self.waits_for: Dict[str, Set[str]] = {}
+        self.blocks: Dict[str, Set[str]] = {}
+
+        # Holding transaction -> query_id and session of the latest HOLDING row of this transaction
+        self.transaction_query_ids: Dict[str, str] = {}
+        self.transaction_session_ids: Dict[str, str] = {}
+
+        holding_rows = {}
+        waiting_rows = []
+
+        for r in rows:
+            key = (r["resource"], r["type"])
+
+            if r["status"] == "HOLDING":
+                holding_rows.setdefault(key, []).append(r)
+
+                self.transaction_query_ids[r["transaction"]] = r["query_id"]
+                self.transaction_session_ids[r["transaction"]] = r["session"]
+            elif r["status"] == "WAITING" and key in holding_rows:
+                # Direct holder is the last HOLDING row before WAITING row
+                waiting_rows.append((r, holding_rows[key][-1]))
+
+        for r, holding_row in waiting_rows:
+            key = (r["resource"], r["type"])
+
+            for hr in holding_rows[key]:
+                if hr["transaction"] != r["transaction"]:
+                    self.waits_for.setdefault(r["transaction"], set()).add(hr["transaction"])
+                    self.blocks.setdefault(hr["transaction"], set()).add(r["transaction"])
+
+            self.holding_locks[r["query_id"]] = HoldingLock(
+                waiting_query_id=r["query_id"],
+                waiting_session_id=r["session"],
+                waiting_transaction_id=r["transaction"],
+                holding_query_id=holding_row["query_id"],
+                holding_session_id=holding_row["session"],
+                holding_transaction_id=holding_row["transaction"],
+                resource=r["resource"],
+                type=r["type"],
+            )
+
+        # Transaction -> transactions waiting for each other in the same cycle, or only this transaction
+        self._components = self._find_components()
+
+        # Root transaction -> number of transactions blocked by it directly or transitively
+        self._blocked_counts: Dict[str, int] = {}
+
+        for hl in self.holding_locks.values():
+            self._resolve_root_blocker(hl)
+
+    def get_root_transaction_ids(self) -> List[str]:
+        return sorted({hl.root_transaction_id for hl in self.holding_locks.values() if hl.root_transaction_id})
+
+    def get_blocked_transaction_ids(self, transaction_id: str) -> Set[str]:
+        # All transactions waiting for this transaction directly or transitively
+        blocked = set()
+        pending = [transaction_id]
+
+        while pending:
+            for waiting_transaction_id in self.blocks.get(pending.pop(), ()):
+                if waiting_transaction_id not in blocked:
+                    blocked.add(waiting_transaction_id)
+                    pending.append(waiting_transaction_id)
+
+        blocked.discard(transaction_id)
+
+        return blocked
+
+    def get_deadlock_transaction_ids(self) -> Set[str]:
+        return {t for t, component in self._components.items() if len(component) > 1}
+
+    def _find_components(self) -> Dict[str, FrozenSet[str]]:
+        # Strongly connected components of wait-for graph, iterative Tarjan's algorithm
+        components = {}
+        indexes: Dict[str, int] = {}
+        low_links: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+
+        for start_transaction_id in sorted(self.waits_for):
+            if start_transaction_id in indexes:
+                continue
+
+            work = [(start_transaction_id, iter(sorted(self.waits_for.get(start_transaction_id, ()))))]
+            indexes[start_transaction_id] = low_links[start_transaction_id] = len(indexes)
+            stack.append(start_transaction_id)
+            on_stack.add(start_transaction_id)
+
+            while work:
+                transaction_id, holders = work[-1]
+                holder = next(holders, None)
+
+                if holder is not None:
+                    if holder not in indexes:
+                        indexes[holder] = low_links[holder] = len(indexes)
+                        stack.append(holder)
+                        on_stack.add(holder)
+                        work.append((holder, iter(sorted(self.waits_for.get(holder, ())))))
+                    elif holder in on_stack:
+                        low_links[transaction_id] = min(low_links[transaction_id], indexes[holder])
+
+                    continue
+
+                work.pop()
+
+                if work:
+                    parent_transaction_id = work[-1][0]
+                    low_links[parent_transaction_id] = min(low_links[parent_transaction_id], low_links[transaction_id])
+
+                if low_links[transaction_id] == indexes[transaction_id]:
+                    component = set()
+
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+
+                        if member == transaction_id:
+                            break
+
+                    for member in component:
+                        components[member] = frozenset(component)
+
+        return components
+
+    def _get_component(self, transaction_id: str) -> FrozenSet[str]:
+        return self._components.get(transaction_id, frozenset([transaction_id]))
+
+    def _get_victim(self, component: FrozenSet[str]) -> str:
+        # Transaction ids grow over time, the latest transaction of deadlock loses the least amount of work
+        return max(component, key=lambda t: (len(t), t))
+
+    def _resolve_root_blocker(self, holding_lock: HoldingLock):
+        # Breadth-first search over all holders, so every path from waiting transaction is considered
+        start_transaction_id = holding_lock.waiting_transaction_id
+        depths = {start_transaction_id: 0}
+        pending = deque([start_transaction_id])
+
+        roots = set()
+        is_deadlock = False
+
+        while pending:
+            transaction_id = pending.popleft()
+            component = self._get_component(transaction_id)
+
+            if len(component) > 1:
+                is_deadlock = True
+
+            # Component is a root if none of its transactions waits for transaction outside of component
+            if all(h in component for t in component for h in self.waits_for.get(t, ())):
+                roots.add(self._get_victim(component))
+
+            for holder in self.waits_for.get(transaction_id, ()):
+                if holder not in depths:
+                    depths[holder] = depths[transaction_id] + 1
+                    pending.append(holder)
+
+        for root_transaction_id in roots:
+            if root_transaction_id not in self._blocked_counts:
+                self._blocked_counts[root_transaction_id] = len(self.get_blocked_transaction_ids(root_transaction_id))
+
+        if not roots:
+            return
+
+        root_transaction_id = max(roots, key=lambda t: (self._blocked_counts[t], len(t), t))
+
+        holding_lock.is_deadlock = is_deadlock
+        holding_lock.chain_depth = depths.get(root_transaction_id, 0)
+
+        holding_lock.root_transaction_id = root_transaction_id
+        holding_lock.root_query_id = self.transaction_query_ids.get(root_transaction_id)
+        holding_lock.root_session_id = self.transaction_session_ids.get(root_transaction_id)
+        holding_lock.root_blocked_count = self._blocked_counts[root_transaction_id]
@@ -0,0 +1,399 @@
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from snowkill.cycle_report import CycleReport
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float):
+    if value == float("inf"):
+        return "+Inf"
+
+    if isinstance(value, int):
+        return str(value)
+
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]):
+    if not labels:
+        return ""
+
+    escaped = {k: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for k, v in labels.items()}
+
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+
+class _Metric:
+    TYPE: str
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# TYPE {self.name} {self.TYPE}", f"# HELP {self.name} {self.documentation}"]
+
+        with self._lock:
+            # Metrics without labels are always present, even if nothing was observed yet
+            if not self.label_names and () not in self._values:
+                self._values[()] = self._get_initial_value()
+
+            for label_values, value in sorted(self._values.items()):
+                lines.extend(self._render_samples(dict(zip(self.label_names, label_values)), value))
+
+        return lines
+
+    def _get_label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names) or any(name not in labels for name in self.label_names):
+            raise ValueError(f"Metric [{self.name}] requires labels [{', '.join(self.label_names)}]")
+
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _get_initial_value(self):
+        return 0
+
+    def _render_samples(self, labels: Dict[str, str], value) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing value, sample is exposed with _total suffix
+    """
+
+    TYPE = "counter"
+
+    def inc(self, value: float = 1, **labels: str):
+        if value < 0:
+            raise ValueError(f"Counter [{self.name}] cannot be decreased")
+
+        label_values = self._get_label_values(labels)
+
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + value
+
+    def get(self, **labels: str):
+        with self._lock:
+            return self._values.get(self._get_label_values(labels), 0)
+
+    def _render_samples(self, labels, value):
+        return [f"{self.name}_total{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    """
+    Value which can go up and down, e.g. number of pending queries during the last check
+    """
+
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels: str):
+        label_values = self._get_label_values(labels)
+
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, value: float = 1, **labels: str):
+        label_values = self._get_label_values(labels)
+
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + value
+
+    def get(self, **labels: str):
+        with self._lock:
+            return self._values.get(self._get_label_values(labels), 0)
+
+    def _render_samples(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in cumulative buckets, along with their sum and count
+    """
+
+    TYPE = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+
+        if "le" in self.label_names:
+            raise ValueError(f"Histogram [{self.name}] cannot use reserved label [le]")
+
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: str):
+        label_values = self._get_label_values(labels)
+
+        with self._lock:
+            if label_values not in self._values:
+                self._values[label_values] = self._get_initial_value()
+
+            bucket_counts, total = self._values[label_values]
+            bucket_counts[bisect_left(self.buckets, value)] += 1
+            self._values[label_values] = (bucket_counts, total + value)
+
+    def get_count(self, **labels: str):
+        with self._lock:
+            value = self._values.get(self._get_label_values(labels))
+
+        return sum(value[0]) if value else 0
+
+    def get_sum(self, **labels: str):
+        with self._lock:
+            value = self._values.get(self._get_label_values(labels))
+
+        return value[1] if value else 0.0
+
+    def _get_initial_value(self):
+        return [0] * len(self.buckets), 0.0
+
+    def _render_samples(self, labels, value):
+        bucket_counts, total = value
+        samples = []
+        cumulative_count = 0
+
+        for bucket, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative_count += bucket_count
+            samples.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bucket)})} {cumulative_count}")
+
+        samples.append(f"{self.name}_count{_format_labels(labels)} {cumulative_count}")
+        samples.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics which can be rendered in OpenMetrics text format
+
+    Metrics are created on first request and reused afterwards, so the same metric can be shared by multiple components
+    Text format is understood by Prometheus and most of other scrapers, prometheus_client is not required
+    """
+
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = Lock()
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, label_names)
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, label_names)
+
+    def histogram(
+        self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, metric_class: Type[_Metric], name: str, documentation: str, label_names: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+
+            if metric is None:
+                metric = metric_class(name, documentation, label_names, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class) or metric.label_names != tuple(label_names):
+                raise ValueError(f"Metric [{name}] is already registered with different type or labels")
+
+            return metric
+
+
+class MetricsServer:
+    """
+    Tiny HTTP endpoint serving metrics of registry on /metrics, intended for daemon deployments
+
+    Port 0 binds a random free port, actual port is available in port property
+    Only local connections are accepted by default, set host to "0.0.0.0" to expose metrics on all interfaces
+    """
+
+    DEFAULT_PORT = 9876
+
+    def __init__(self, registry: MetricsRegistry, port: int = DEFAULT_PORT, host: str = "127.0.0.1"):
+        self.registry = registry
+
+        self.server = ThreadingHTTPServer((host, port), self._build_handler_class())
+        self.server.daemon_threads = True
+
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_port
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _build_handler_class(self):
+        registry = self.registry
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", MetricsRegistry.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return MetricsRequestHandler
+
+
+class SnowKillMetrics:
+    """
+    Metrics of engine, storage, formatters and notifications of SnowKill, all in one registry
+
+    Engine metrics are taken from cycle reports, e.g. SnowKillEngine(connection, on_cycle_report=metrics.observe_cycle_report)
+    Cycle reports include counts of check results per condition and level, so all engine metrics are collected by the hook
+    Storage and formatter metrics are collected by InstrumentedStorage and InstrumentedFormatter wrappers
+    SnowKillDaemon collects all of them automatically when metrics are passed to it
+    """
+
+    PHASES = [
+        "list",
+        "match",
+        "user_lookup",
+        "lock_scan",
+        "holding_query",
+        "query_plan_fetch",
+        "query_plan_parse",
+        "condition",
+        "kill",
+    ]
+
+    STATUSES = ["BLOCKED", "QUEUED", "RUNNING"]
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None, *, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+
+        self.checks = r.counter("snowkill_checks", "Number of complete checks")
+        self.failed_checks = r.counter("snowkill_failed_checks", "Number of checks failed with exception")
+        self.overruns = r.counter("snowkill_overruns", "Number of checks which took longer than daemon interval")
+        self.reconnects = r.counter("snowkill_reconnects", "Number of connections replaced by daemon after failed checks")
+        self.check_duration = r.histogram("snowkill_check_duration_seconds", "Wall time of checks", buckets=buckets)
+        self.phase_duration = r.counter("snowkill_phase_duration_seconds", "Wall time of check phases", ["phase"])
+
+        self.pending_queries = r.gauge("snowkill_pending_queries", "Number of pending queries during the last check", ["status"])
+        self.skipped_queries = r.counter("snowkill_skipped_queries", "Number of queries skipped due to time budget")
+
+        self.query_plan_fetch_duration = r.histogram(
+            "snowkill_query_plan_fetch_duration_seconds", "Latency of query plan requests", ["warehouse"], buckets=buckets
+        )
+        self.query_plan_fetches = r.counter("snowkill_query_plan_fetches", "Number of query plan requests", ["outcome"])
+        self.query_plan_timeouts = r.counter("snowkill_query_plan_timeouts", "Number of timed out query plan requests")
+        self.query_plan_cache_hits = r.counter("snowkill_query_plan_cache_hits", "Number of query plans reused from cache")
+
+        self.condition_duration = r.counter(
+            "snowkill_condition_duration_seconds", "Wall time of custom logic of conditions", ["condition"]
+        )
+        self.check_results = r.counter("snowkill_check_results", "Number of check results", ["condition", "level"])
+
+        self.kills = r.counter("snowkill_kills", "Number of aborted queries and transactions", ["target"])
+        self.kill_duration = r.histogram("snowkill_kill_duration_seconds", "Wall time of kills", buckets=buckets)
+
+        self.storage_duration = r.histogram(
+            "snowkill_storage_duration_seconds", "Wall time of storing check results", ["storage"], buckets=buckets
+        )
+        self.storage_results = r.counter("snowkill_storage_results", "Number of check results passed to storage", ["storage"])
+        self.storage_duplicates = r.counter(
+            "snowkill_storage_duplicates", "Number of check results removed by storage as duplicates", ["storage"]
+        )
+
+        self.formatter_duration = r.histogram(
+            "snowkill_formatter_duration_seconds", "Wall time of formatting check results", ["formatter"], buckets=buckets
+        )
+        self.formatter_errors = r.counter("snowkill_formatter_errors", "Number of failed formatting attempts", ["formatter"])
+
+        self.notifications = r.counter("snowkill_notifications", "Number of notifications", ["status"])
+
+    def observe_cycle_report(self, report: CycleReport):
+        # Time spent before failure is observed for failed checks as well
+        if report.is_failed:
+            self.failed_checks.inc()
+        else:
+            self.checks.inc()
+
+        self.check_duration.observe(report.duration)
+
+        summary = report.get_summary()
+
+        for phase in self.PHASES:
+            self.phase_duration.inc(summary[f"{phase}_duration"], phase=phase)
+
+        for status in sorted(set(self.STATUSES) | set(report.query_counts)):
+            self.pending_queries.set(report.query_counts.get(status, 0), status=status)
+
+        self.skipped_queries.inc(len(report.skipped_queries))
+
+        for f in report.query_plan_fetches:
+            self.query_plan_fetch_duration.observe(f.fetch_duration, warehouse=f.warehouse_name or "")
+            self.query_plan_fetches.inc(outcome=f.outcome)
+
+            if f.outcome == CycleReport.QUERY_PLAN_TIMEOUT:
+                self.query_plan_timeouts.inc()
+
+        self.query_plan_cache_hits.inc(report.query_plan_cache_hits)
+
+        for condition_name, duration in report.condition_durations.items():
+            self.condition_duration.inc(duration, condition=condition_name)
+
+        for (condition_name, level_name), count in report.check_result_counts.items():
+            self.check_results.inc(count, condition=condition_name, level=level_name)
+
+        for k in report.kills:
+            self.kills.inc(target="transaction" if k.transaction_id else "query")
+            self.kill_duration.observe(k.duration)
+
+    def get_storage_duplicate_rate(self, storage_name: str) -> Optional[float]:
+        num_results = self.storage_results.get(storage=storage_name)
+
+        if not num_results:
+            return None
+
+        return self.storage_duplicates.get(storage=storage_name) / num_results
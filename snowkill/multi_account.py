@@ -0,0 +1,205 @@
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import field
+from logging import getLogger, NullHandler
+from multiprocessing.util import Finalize
+from snowflake.connector import SnowflakeConnection
+from typing import Any, Callable, Dict, List, Optional
+
+from snowkill.condition.abc_condition import AbstractQueryCondition
+from snowkill.engine import SnowKillEngine
+from snowkill.query_plan_cache import QueryPlanCache
+from snowkill.struct import CheckResult, slotted_dataclass
+
+
+logger = getLogger(__name__)
+logger.addHandler(NullHandler())
+
+
+@slotted_dataclass
+class AccountConfig:
+    account_name: str
+
+    # Arguments of SnowflakeConnection, connection objects cannot be passed to worker processes
+    connection_params: Dict[str, Any]
+
+    max_workers: int = 8
+    time_budget: Optional[float] = None
+
+    # Additional keyword arguments of SnowKillEngine, e.g. list_max_queries, all values must be picklable
+    engine_params: Dict[str, Any] = field(default_factory=dict)
+
+    # Arguments of QueryPlanCache, which is created in worker process, since cache cannot be passed to worker processes
+    query_plan_cache_params: Optional[Dict[str, Any]] = None
+
+    # Called with connection_params in worker process, must be picklable, e.g. class or module-level function
+    connection_factory: Callable[..., SnowflakeConnection] = SnowflakeConnection
+
+
+# Each account is checked by its own worker process, which keeps engine between checks
+# Connection, caches and previous levels of queries stay warm, connection is closed when worker process exits
+_process_account: Optional[AccountConfig] = None
+_process_conditions: List[AbstractQueryCondition] = []
+_process_engine: Optional[SnowKillEngine] = None
+_process_finalizer: Optional[Finalize] = None
+
+
+class MultiAccountCoordinator:
+    """
+    Checks pending queries of multiple Snowflake accounts in parallel, each account in its own worker process
+
+    Each account is checked by its own SnowKillEngine with its own max_workers and time_budget
+    Engine lives in worker process of account between checks, conditions are passed to worker process only once
+    Check results of all accounts are merged into a single list, each result is tagged with account_name
+
+    Accounts which did not finish within timeout are reported in last_account_errors and do not delay other accounts
+    Such accounts are not checked again until previous check is complete, its check results are returned by the next call
+    """
+
+    def __init__(
+        self,
+        accounts: List[AccountConfig],
+        conditions: List[AbstractQueryCondition],
+        *,
+        timeout: float = 60,
+    ):
+        self.accounts = accounts
+        self.conditions = conditions
+        self.timeout = timeout
+
+        # Account name -> single process executor, account is never moved to another process
+        self.executors: Dict[str, ProcessPoolExecutor] = {a.account_name: self._create_executor(a) for a in accounts}
+
+        # Account name -> reason of failure during last check
+        self.last_account_errors: Dict[str, str] = {}
+
+        self._running_futures: Dict[str, Future] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
+
+        for executor in self.executors.values():
+            executor.shutdown()
+
+    def check_and_kill_pending_queries(self) -> List[CheckResult]:
+        self.last_account_errors = {}
+
+        check_results = []
+        futures = {}
+
+        for account in self.accounts:
+            previous_future = self._running_futures.get(account.account_name)
+
+            # Account is still busy with previous check, e.g. due to network issues
+            if previous_future is not None and not previous_future.done():
+                self.last_account_errors[account.account_name] = "Previous check is still running"
+                logger.warning(f"Skipped account [{account.account_name}], previous check is still running")
+                continue
+
+            # Previous check finished after timeout, its queries might have been killed already, so results are not lost
+            if previous_future is not None:
+                self._collect_results(previous_future, account.account_name, check_results)
+
+            future = self._submit(account)
+
+            self._running_futures[account.account_name] = future
+            futures[future] = account.account_name
+
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                self._collect_results(future, futures[future], check_results)
+        except FuturesTimeoutError:
+            for future, account_name in futures.items():
+                if not future.done():
+                    self.last_account_errors[account_name] = "Timeout"
+                    logger.warning(f"Check did not finish within [{self.timeout}] seconds for account [{account_name}]")
+
+        return check_results
+
+    def _create_executor(self, account: AccountConfig):
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_process, initargs=(account, self.conditions))
+
+    def _submit(self, account: AccountConfig) -> Future:
+        try:
+            return self.executors[account.account_name].submit(_check_account)
+        except BrokenProcessPool:
+            # Worker process of account died, e.g. killed by OOM, new process is started with cold engine
+            logger.warning(f"Worker process of account [{account.account_name}] was terminated, starting new process")
+
+            self.executors[account.account_name] = self._create_executor(account)
+            return self.executors[account.account_name].submit(_check_account)
+
+    def _collect_results(self, future: Future, account_name: str, check_results: List[CheckResult]):
+        del self._running_futures[account_name]
+
+        try:
+            check_results.extend(future.result())
+        except Exception as e:
+            self.last_account_errors[account_name] = e.__class__.__name__
+            logger.warning(f"Check failed for account [{account_name}] due to [{e.__class__.__name__}]")
+
+
+def _init_process(account: AccountConfig, conditions: List[AbstractQueryCondition]):
+    # Executed in worker process once, before the first check
+    global _process_account, _process_conditions, _process_finalizer
+
+    _process_account = account
+    _process_conditions = conditions
+    _process_finalizer = Finalize(None, _close_process_engine, exitpriority=10)
+
+
+def _check_account() -> List[CheckResult]:
+    # Executed in worker process of account
+    global _process_engine
+
+    if _process_engine is None:
+        _process_engine = _create_engine(_process_account)
+
+    try:
+        check_results = _process_engine.check_and_kill_pending_queries(
+            _process_conditions, time_budget=_process_account.time_budget
+        )
+    except Exception:
+        # Engine is created again with new connection during next check
+        _close_process_engine()
+        raise
+
+    for r in check_results:
+        r.account_name = _process_account.account_name
+
+    return check_results
+
+
+def _create_engine(account: AccountConfig) -> SnowKillEngine:
+    engine_params = dict(account.engine_params)
+
+    if account.query_plan_cache_params is not None:
+        engine_params["query_plan_cache"] = QueryPlanCache(**account.query_plan_cache_params)
+
+    connection = account.connection_factory(**account.connection_params)
+
+    return SnowKillEngine(connection, account.max_workers, **engine_params)
+
+
+def _close_engine(engine: SnowKillEngine):
+    engine.executor.shutdown(wait=False)
+
+    try:
+        engine.connection.close()
+    except Exception as e:
+        logger.warning(f"Could not close connection due to [{e.__class__.__name__}]")
+
+
+def _close_process_engine():
+    global _process_engine
+
+    if _process_engine is not None:
+        _close_engine(_process_engine)
+        _process_engine = None
@@ -0,0 +1,18 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from snowkill.condition.abc_condition import AbstractQueryCondition
+from snowkill.struct import CheckResultLevel, Query
+
+
+class AbstractQueryPriority(ABC):
+    """
+    Defines the order in which pending queries are checked, queries with higher priority are checked first
+    It matters when query plans are slow to load and number of workers or time budget is limited
+    """
+
+    @abstractmethod
+    def get_priority(
+        self, query: Query, conditions: List[AbstractQueryCondition], previous_level: Optional[CheckResultLevel]
+    ) -> float:
+        pass
@@ -0,0 +1,36 @@
+from typing import List, Optional
+
+from snowkill.condition.abc_condition import AbstractQueryCondition
+from snowkill.priority.abc_priority import AbstractQueryPriority
+from snowkill.struct import CheckResultLevel, Query
+
+
+class EstimatedCostPriority(AbstractQueryPriority):
+    """
+    Estimated cost is duration of query in current state multiplied by credits per hour of warehouse size
+
+    Cost is boosted up to 2x for queries which are close to kill_duration of any condition
+    Cost is boosted up to 2x for queries with high level result during previous check
+    """
+
+    WAREHOUSE_SIZE_CREDITS = {
+        "X-Small": 1,
+        "Small": 2,
+        "Medium": 4,
+        "Large": 8,
+        "X-Large": 16,
+        "2X-Large": 32,
+        "3X-Large": 64,
+        "4X-Large": 128,
+        "5X-Large": 256,
+        "6X-Large": 512,
+    }
+
+    def get_priority(self, query: Query, conditions: List[AbstractQueryCondition], previous_level: Optional[CheckResultLevel]):
+        duration = query.get_current_state_duration()
+        cost = duration * self.WAREHOUSE_SIZE_CREDITS.get(query.warehouse_external_size, 1)
+
+        kill_ratio = max((min(duration / c.kill_duration, 1) for c in conditions if c.kill_duration), default=0)
+        level_ratio = previous_level / CheckResultLevel.KILL if previous_level else 0
+
+        return cost * (1 + kill_ratio) * (1 + level_ratio)
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Iterable, Optional
+
+from snowkill.struct import Query, QueryPlan, slotted_dataclass
+
+
+@slotted_dataclass
+class QueryPlanCacheEntry:
+    query_plan: QueryPlan
+    load_time: float
+    execute_duration: float
+    stats: Dict[str, Any]
+    size: int
+
+
+class QueryPlanCache:
+    """
+    Query plan cache which persists between checks, useful for long-running processes
+
+    Cached query plan is reused until one of the following happens:
+    - it is older than ttl or older than query_plan_max_age of condition
+    - query stats changed and execute_duration increased by more than refresh_ratio since query plan was loaded
+
+    Least recently used query plans are evicted when max_size entries or max_memory bytes are reached
+    Memory is estimated from number of nodes in all steps, raw and parsed node with its edge take about 3 Kb
+    Query plan larger than max_memory is not cached at all
+    """
+
+    APPROXIMATE_NODE_SIZE = 3 * 1024
+
+    def __init__(self, *, ttl: int = 3600, max_size: int = 1000, max_memory: int = 256 * 1024 * 1024, refresh_ratio: float = 0.1):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self.refresh_ratio = refresh_ratio
+
+        self._entries: Dict[str, QueryPlanCacheEntry] = OrderedDict()
+        self._memory = 0
+        self._lock = Lock()
+
+    @property
+    def memory(self):
+        # Approximate memory used by cached query plans, in bytes
+        return self._memory
+
+    def get(self, query: Query, max_age: Optional[int] = None) -> Optional[QueryPlan]:
+        with self._lock:
+            entry = self._entries.get(query.query_id)
+
+            if entry is None:
+                return None
+
+            age = monotonic() - entry.load_time
+
+            if age > self.ttl:
+                self._remove(query.query_id)
+                return None
+
+            if max_age is not None and age > max_age:
+                return None
+
+            if self._is_query_changed(entry, query):
+                return None
+
+            self._entries.move_to_end(query.query_id)
+
+            return entry.query_plan
+
+    def put(self, query: Query, query_plan: QueryPlan):
+        size = self._estimate_size(query_plan)
+
+        with self._lock:
+            self._remove(query.query_id)
+
+            if size > self.max_memory:
+                return
+
+            self._entries[query.query_id] = QueryPlanCacheEntry(
+                query_plan=query_plan,
+                load_time=monotonic(),
+                execute_duration=query.execute_duration,
+                stats=query.stats,
+                size=size,
+            )
+
+            self._memory += size
+
+            while len(self._entries) > self.max_size or self._memory > self.max_memory:
+                self._remove(next(iter(self._entries)))
+
+    def retain(self, query_ids: Iterable[str]):
+        # Remove query plans of queries which are no longer running
+        query_ids = set(query_ids)
+
+        with self._lock:
+            for query_id in [query_id for query_id in self._entries if query_id not in query_ids]:
+                self._remove(query_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, query_id: str):
+        entry = self._entries.pop(query_id, None)
+
+        if entry is not None:
+            self._memory -= entry.size
+
+    def _estimate_size(self, query_plan: QueryPlan):
+        # Steps built directly from nodes instead of raw graph data are estimated by the same rule
+        num_nodes = sum(len(s.graph_data["nodes"]) if "nodes" in s.graph_data else len(s.nodes) for s in query_plan.steps)
+
+        return num_nodes * self.APPROXIMATE_NODE_SIZE
+
+    def _is_query_changed(self, entry: QueryPlanCacheEntry, query: Query):
+        # Query did not make any progress since query plan was loaded
+        if query.stats == entry.stats:
+            return False
+
+        return query.execute_duration - entry.execute_duration > entry.execute_duration * self.refresh_ratio
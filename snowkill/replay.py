@@ -0,0 +1,228 @@
+from gzip import open as gzip_open
+from json import dumps, loads
+from snowflake.connector import SnowflakeConnection, Error as SnowflakeError
+from threading import Lock
+from time import perf_counter, sleep
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from snowkill.engine import SnowKillEngine
+from snowkill.error import SnowKillReplayError
+
+
+# URL parameters which depend on current time, they are excluded from request keys
+VOLATILE_URL_PARAMS = ("start",)
+
+
+def get_rest_request_key(url: str):
+    parsed_url = urlparse(url)
+    url_params = sorted((k, v) for k, v in parse_qsl(parsed_url.query) if k not in VOLATILE_URL_PARAMS)
+
+    return f"REST {parsed_url.path}?{urlencode(url_params)}"
+
+
+def get_sql_request_key(command: str, params: Optional[Dict[str, Any]] = None):
+    if params is None:
+        return f"SQL {command}"
+
+    return f"SQL {command} {dumps(params, sort_keys=True, default=str)}"
+
+
+class RecordingConnection:
+    """
+    Wrapper of SnowflakeConnection, which writes REST API responses and SQL results to snapshot file
+    Snapshot file is gzip-compressed JSON lines, one line per request
+
+    Requests are passed to real connection as is, including abort_query and SYSTEM$ABORT_TRANSACTION
+    """
+
+    def __init__(self, connection: SnowflakeConnection, path: str):
+        self.connection = connection
+        self.rest = RecordingRestful(self)
+
+        self._file = gzip_open(path, "wt", encoding="utf-8")
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def cursor(self, cursor_class=None):
+        return RecordingCursor(self, self.connection.cursor(cursor_class) if cursor_class else self.connection.cursor())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _write(self, entry: dict):
+        line = dumps(entry, default=str)
+
+        with self._lock:
+            self._file.write(f"{line}\n")
+
+
+class RecordingRestful:
+    def __init__(self, recording_connection: RecordingConnection):
+        self.recording_connection = recording_connection
+
+    def request(self, url, method="get", client="rest", timeout=None, _no_retry=False, **kwargs):
+        start_time = perf_counter()
+
+        try:
+            response = self.recording_connection.connection.rest.request(
+                url=url, method=method, client=client, timeout=timeout, _no_retry=_no_retry, **kwargs
+            )
+        except SnowflakeError as e:
+            self.recording_connection._write(
+                {"key": get_rest_request_key(url), "duration": perf_counter() - start_time, "error": e.__class__.__name__}
+            )
+            raise
+
+        self.recording_connection._write(
+            {"key": get_rest_request_key(url), "duration": perf_counter() - start_time, "response": response}
+        )
+
+        return response
+
+
+class RecordingCursor:
+    def __init__(self, recording_connection: RecordingConnection, cursor):
+        self.recording_connection = recording_connection
+        self.cursor = cursor
+        self.rows = []
+
+    def execute(self, command, params=None, num_statements=None):
+        start_time = perf_counter()
+
+        if num_statements:
+            self.cursor.execute(command, params, num_statements=num_statements)
+        else:
+            self.cursor.execute(command, params)
+
+        # Results of multi-statement request are recorded as single result set
+        self.rows = list(self.cursor)
+
+        while self.cursor.nextset() is not None:
+            self.rows.extend(self.cursor)
+
+        self.recording_connection._write(
+            {"key": get_sql_request_key(command, params), "duration": perf_counter() - start_time, "rows": self.rows}
+        )
+
+        return self
+
+    def nextset(self):
+        return None
+
+    def abort_query(self, query_id):
+        return self.cursor.abort_query(query_id)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class ReplayConnection:
+    """
+    Stand-in for SnowflakeConnection, which serves responses from snapshot file
+
+    Responses for the same request are served in recorded order, the last response is repeated once all of them were served
+    Missing query plans are reported as not available, other missing requests raise SnowKillReplayError
+    If simulate_latency is enabled, each response is delayed by recorded duration of request
+
+    Queries and transactions are never aborted, requested aborts are collected in aborted_query_ids and executed_commands
+    """
+
+    def __init__(self, path: str, *, simulate_latency: bool = False):
+        self.rest = ReplayRestful(self)
+        self.simulate_latency = simulate_latency
+
+        self.aborted_query_ids: List[str] = []
+        self.executed_commands: List[str] = []
+
+        self._entries: Dict[str, List[dict]] = {}
+        self._positions: Dict[str, int] = {}
+        self._lock = Lock()
+
+        with gzip_open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = loads(line)
+                self._entries.setdefault(entry["key"], []).append(entry)
+
+    def cursor(self, cursor_class=None):
+        return ReplayCursor(self)
+
+    def close(self):
+        pass
+
+    def _get_entry(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entries = self._entries.get(key)
+
+            if not entries:
+                return None
+
+            pos = self._positions.get(key, 0)
+            self._positions[key] = pos + 1
+
+            entry = entries[min(pos, len(entries) - 1)]
+
+        if self.simulate_latency:
+            sleep(entry["duration"])
+
+        return entry
+
+
+class ReplayRestful:
+    def __init__(self, replay_connection: ReplayConnection):
+        self.replay_connection = replay_connection
+
+    def request(self, url, method="get", client="rest", timeout=None, _no_retry=False, **kwargs):
+        key = get_rest_request_key(url)
+        entry = self.replay_connection._get_entry(key)
+
+        if entry is None:
+            if urlparse(url).path.startswith(SnowKillEngine.REST_ENDPOINT_QUERY_PLAN):
+                return None
+
+            raise SnowKillReplayError(key)
+
+        if "error" in entry:
+            raise SnowflakeError(msg=f"Recorded error [{entry['error']}]")
+
+        return entry["response"]
+
+
+class ReplayCursor:
+    def __init__(self, replay_connection: ReplayConnection):
+        self.replay_connection = replay_connection
+        self.rows = []
+
+    def execute(self, command, params=None, num_statements=None):
+        self.replay_connection.executed_commands.append(command)
+
+        key = get_sql_request_key(command, params)
+        entry = self.replay_connection._get_entry(key)
+
+        if entry is None:
+            # Aborted transactions are not necessarily the same as during recording
+            if command.startswith("SELECT SYSTEM$ABORT_TRANSACTION"):
+                self.rows = []
+                return self
+
+            raise SnowKillReplayError(key)
+
+        self.rows = entry["rows"]
+
+        return self
+
+    def nextset(self):
+        return None
+
+    def abort_query(self, query_id):
+        self.replay_connection.aborted_query_ids.append(query_id)
+        return True
+
+    def __iter__(self):
+        return iter(self.rows)
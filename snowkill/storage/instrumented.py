@@ -0,0 +1,28 @@
+from time import perf_counter
+from typing import List
+
+from snowkill.metrics import SnowKillMetrics
+from snowkill.storage.abc_storage import AbstractStorage
+from snowkill.struct import CheckResult
+
+
+class InstrumentedStorage(AbstractStorage):
+    """
+    Wrapper for any storage, which collects wall time and number of duplicates removed by wrapped storage
+    """
+
+    def __init__(self, storage: AbstractStorage, metrics: SnowKillMetrics):
+        self.storage = storage
+        self.metrics = metrics
+
+        self.storage_name = storage.__class__.__name__
+
+    def store_and_remove_duplicate(self, check_results: List[CheckResult]) -> List[CheckResult]:
+        start_time = perf_counter()
+        filtered_results = self.storage.store_and_remove_duplicate(check_results)
+
+        self.metrics.storage_duration.observe(perf_counter() - start_time, storage=self.storage_name)
+        self.metrics.storage_results.inc(len(check_results), storage=self.storage_name)
+        self.metrics.storage_duplicates.inc(len(check_results) - len(filtered_results), storage=self.storage_name)
+
+        return filtered_results
@@ -1,12 +1,27 @@
-from dataclasses import dataclass, is_dataclass, fields
+from dataclasses import dataclass, field, is_dataclass, fields
 from datetime import datetime
 from enum import Enum, IntEnum
 from json import dumps
 from ipaddress import IPv4Address
+from sys import intern, version_info
 from typing import Any, Dict, List, Optional, Tuple
 
 
-@dataclass
+# Slots reduce memory footprint of structures created in large numbers, available since Python 3.10
+slotted_dataclass = dataclass(slots=True) if version_info >= (3, 10) else dataclass
+
+
+def intern_str(val: Optional[str]) -> Optional[str]:
+    # Repeated values share one string object instead of separate copies from each API response
+    return intern(val) if isinstance(val, str) else val
+
+
+def internal_field(**kwargs):
+    # Internal fields are excluded from repr, comparison and serialization
+    return field(repr=False, compare=False, metadata={"internal": True}, **kwargs)
+
+
+@slotted_dataclass
 class HoldingLock:
     waiting_query_id: str
     waiting_session_id: str
@@ -19,8 +34,17 @@ class HoldingLock:
     resource: str
     type: str
 
+    # Transaction at the end of chain of holders, killing it unblocks the whole chain
+    root_query_id: Optional[str] = None
+    root_session_id: Optional[str] = None
+    root_transaction_id: Optional[str] = None
+
+    chain_depth: int = 1
+    root_blocked_count: int = 0
+    is_deadlock: bool = False
+
 
-@dataclass
+@slotted_dataclass
 class Session:
     session_id: str
 
@@ -32,7 +56,7 @@ class Session:
     user_name: str
 
 
-@dataclass
+@slotted_dataclass
 class User:
     name: str
     login_name: Optional[str]
@@ -47,7 +71,7 @@ class User:
     owner: Optional[str]
 
 
-@dataclass
+@slotted_dataclass
 class Query:
     query_id: str
     query_tag: str
@@ -80,40 +104,114 @@ class Query:
     meta_version: int
     snowflake_version: Tuple[int, int, int]
 
+    def get_current_state_duration(self) -> float:
+        return getattr(self, get_current_state_duration_field(self.status))
+
+
+def get_current_state_duration_field(status: str) -> str:
+    # Duration of query in current state, same durations are used by check_min_duration() of abstract conditions
+    if status == "RUNNING":
+        return "execute_duration"
 
-@dataclass
+    if status == "QUEUED":
+        return "queued_duration"
+
+    return "total_duration"
+
+
+@slotted_dataclass
 class QueryPlanLabel:
     name: str
     value: Any
 
 
-@dataclass
+@slotted_dataclass
 class QueryPlanStatistics:
     name: str
     value: float
     unit: str
 
 
-@dataclass
+@slotted_dataclass
 class QueryPlanWait:
     name: str
     value: float
     percentage: float
 
 
-@dataclass
+@slotted_dataclass
 class QueryPlanNode:
     id: int
     logical_id: int
     name: str
     title: Optional[str]
-    labels: Dict[str, QueryPlanLabel]
-    waits: Dict[str, QueryPlanWait]
-    statistics_io: Dict[str, QueryPlanStatistics]
-    statistics_pruning: Dict[str, QueryPlanStatistics]
 
-
-@dataclass
+    # Raw node definition from query plan response
+    node_def: Dict[str, Any] = internal_field()
+
+    # Labels, waits and statistics are built from raw node definition on first access
+    LAZY_FIELDS = ("labels", "waits", "statistics_io", "statistics_pruning")
+
+    _labels: Optional[Dict[str, QueryPlanLabel]] = internal_field(default=None, init=False)
+    _waits: Optional[Dict[str, QueryPlanWait]] = internal_field(default=None, init=False)
+    _statistics_io: Optional[Dict[str, QueryPlanStatistics]] = internal_field(default=None, init=False)
+    _statistics_pruning: Optional[Dict[str, QueryPlanStatistics]] = internal_field(default=None, init=False)
+
+    def __init__(
+        self,
+        id: int,
+        logical_id: int,
+        name: str,
+        title: Optional[str],
+        labels: Optional[Dict[str, QueryPlanLabel]] = None,
+        waits: Optional[Dict[str, QueryPlanWait]] = None,
+        statistics_io: Optional[Dict[str, QueryPlanStatistics]] = None,
+        statistics_pruning: Optional[Dict[str, QueryPlanStatistics]] = None,
+        *,
+        node_def: Optional[Dict[str, Any]] = None,
+    ):
+        # Lazy fields can still be passed directly, otherwise they are built from raw node definition
+        self.id = id
+        self.logical_id = logical_id
+        self.name = name
+        self.title = title
+        self.node_def = node_def if node_def is not None else {}
+
+        self._labels = labels
+        self._waits = waits
+        self._statistics_io = statistics_io
+        self._statistics_pruning = statistics_pruning
+
+    @property
+    def labels(self) -> Dict[str, QueryPlanLabel]:
+        if self._labels is None:
+            self._labels = build_query_plan_labels(self.node_def.get("labels", []))
+
+        return self._labels
+
+    @property
+    def waits(self) -> Dict[str, QueryPlanWait]:
+        if self._waits is None:
+            self._waits = build_query_plan_waits(self.node_def.get("waits", []))
+
+        return self._waits
+
+    @property
+    def statistics_io(self) -> Dict[str, QueryPlanStatistics]:
+        if self._statistics_io is None:
+            self._statistics_io = build_query_plan_statistics(self.node_def.get("statistics", {}).get("IO", []))
+
+        return self._statistics_io
+
+    @property
+    def statistics_pruning(self) -> Dict[str, QueryPlanStatistics]:
+        if self._statistics_pruning is None:
+            self._statistics_pruning = build_query_plan_statistics(self.node_def.get("statistics", {}).get("Pruning", []))
+
+        return self._statistics_pruning
+
+
+@slotted_dataclass
 class QueryPlanEdge:
     id: str
     src: int
@@ -122,37 +220,259 @@ class QueryPlanEdge:
     expressions: Any
 
 
-@dataclass
+@slotted_dataclass
+class QueryPlanStepIndex:
+    nodes: Dict[int, QueryPlanNode]
+    upstream_nodes: Dict[int, List[QueryPlanNode]]
+    downstream_nodes: Dict[int, List[QueryPlanNode]]
+    edge_rows: Dict[Tuple[int, int], int]
+    input_rows: Dict[int, int]
+    output_rows: Dict[int, int]
+
+
+@slotted_dataclass
+class QueryPlanStepAnalysis:
+    # Nodes grouped by operator name, e.g. Join, CartesianJoin, UnionAll, in the same order as in the list of nodes
+    nodes_by_name: Dict[str, List[QueryPlanNode]]
+    operator_counts: Dict[str, int]
+
+    # Total input rows, output rows and output / input ratio per node id
+    input_rows: Dict[int, int]
+    output_rows: Dict[int, int]
+    explosion_rates: Dict[int, float]
+
+    local_spilling_bytes: int
+    remote_spilling_bytes: int
+    scan_progress: Optional[float]
+
+
+@slotted_dataclass
 class QueryPlanStep:
     step: int
     description: str
     duration: float
     state: str
-    nodes: List[QueryPlanNode]
-    edges: List[QueryPlanEdge]
-    labels: Dict[str, QueryPlanLabel]
-    waits: Dict[str, QueryPlanWait]
-    statistics_io: Dict[str, QueryPlanStatistics]
-    statistics_pruning: Dict[str, QueryPlanStatistics]
-    statistics_spilling: Dict[str, QueryPlanStatistics]
+
+    # Raw graph data from query plan response
+    graph_data: Dict[str, Any] = internal_field()
+
+    # Nodes, edges, labels, waits and statistics are built from raw graph data on first access
+    # Most conditions only need running step, so other steps are never built
+    LAZY_FIELDS = ("nodes", "edges", "labels", "waits", "statistics_io", "statistics_pruning", "statistics_spilling")
+
+    _nodes: Optional[List[QueryPlanNode]] = internal_field(default=None, init=False)
+    _edges: Optional[List[QueryPlanEdge]] = internal_field(default=None, init=False)
+    _labels: Optional[Dict[str, QueryPlanLabel]] = internal_field(default=None, init=False)
+    _waits: Optional[Dict[str, QueryPlanWait]] = internal_field(default=None, init=False)
+    _statistics_io: Optional[Dict[str, QueryPlanStatistics]] = internal_field(default=None, init=False)
+    _statistics_pruning: Optional[Dict[str, QueryPlanStatistics]] = internal_field(default=None, init=False)
+    _statistics_spilling: Optional[Dict[str, QueryPlanStatistics]] = internal_field(default=None, init=False)
+
+    # Built on first access, makes lookups by node independent of graph size
+    _index: Optional[QueryPlanStepIndex] = internal_field(default=None, init=False)
+    _analysis: Optional[QueryPlanStepAnalysis] = internal_field(default=None, init=False)
+
+    def __init__(
+        self,
+        step: int,
+        description: str,
+        duration: float,
+        state: str,
+        nodes: Optional[List[QueryPlanNode]] = None,
+        edges: Optional[List[QueryPlanEdge]] = None,
+        labels: Optional[Dict[str, QueryPlanLabel]] = None,
+        waits: Optional[Dict[str, QueryPlanWait]] = None,
+        statistics_io: Optional[Dict[str, QueryPlanStatistics]] = None,
+        statistics_pruning: Optional[Dict[str, QueryPlanStatistics]] = None,
+        statistics_spilling: Optional[Dict[str, QueryPlanStatistics]] = None,
+        *,
+        graph_data: Optional[Dict[str, Any]] = None,
+    ):
+        # Lazy fields can still be passed directly, otherwise they are built from raw graph data
+        self.step = step
+        self.description = description
+        self.duration = duration
+        self.state = state
+        self.graph_data = graph_data if graph_data is not None else {}
+
+        self._nodes = nodes
+        self._edges = edges
+        self._labels = labels
+        self._waits = waits
+        self._statistics_io = statistics_io
+        self._statistics_pruning = statistics_pruning
+        self._statistics_spilling = statistics_spilling
+
+        self._index = None
+        self._analysis = None
+
+    @property
+    def nodes(self) -> List[QueryPlanNode]:
+        if self._nodes is None:
+            self._nodes = [build_query_plan_node(item) for item in self.graph_data.get("nodes", [])]
+
+        return self._nodes
+
+    @property
+    def edges(self) -> List[QueryPlanEdge]:
+        if self._edges is None:
+            self._edges = [build_query_plan_edge(item) for item in self.graph_data.get("edges", [])]
+
+        return self._edges
+
+    @property
+    def labels(self) -> Dict[str, QueryPlanLabel]:
+        if self._labels is None:
+            self._labels = build_query_plan_labels(self.graph_data.get("labels", []))
+
+        return self._labels
+
+    @property
+    def waits(self) -> Dict[str, QueryPlanWait]:
+        if self._waits is None:
+            self._waits = build_query_plan_waits(self.graph_data.get("global", {}).get("waits", []))
+
+        return self._waits
+
+    @property
+    def statistics_io(self) -> Dict[str, QueryPlanStatistics]:
+        if self._statistics_io is None:
+            self._statistics_io = build_query_plan_statistics(
+                self.graph_data.get("global", {}).get("statistics", {}).get("IO", [])
+            )
+
+        return self._statistics_io
+
+    @property
+    def statistics_pruning(self) -> Dict[str, QueryPlanStatistics]:
+        if self._statistics_pruning is None:
+            self._statistics_pruning = build_query_plan_statistics(
+                self.graph_data.get("global", {}).get("statistics", {}).get("Pruning", [])
+            )
+
+        return self._statistics_pruning
+
+    @property
+    def statistics_spilling(self) -> Dict[str, QueryPlanStatistics]:
+        if self._statistics_spilling is None:
+            self._statistics_spilling = build_query_plan_statistics(
+                self.graph_data.get("global", {}).get("statistics", {}).get("Spilling", [])
+            )
+
+        return self._statistics_spilling
 
     def get_upstream_nodes(self, node: QueryPlanNode) -> List[QueryPlanNode]:
-        upstream_node_ids = [e.src for e in self.edges if node.id == e.dst]
-        return [n for n in self.nodes if n.id in upstream_node_ids]
+        return self._get_index().upstream_nodes.get(node.id, [])
 
     def get_downstream_nodes(self, node: QueryPlanNode) -> List[QueryPlanNode]:
-        downstream_node_ids = [e.dst for e in self.edges if node.id == e.src]
-        return [n for n in self.nodes if n.id in downstream_node_ids]
+        return self._get_index().downstream_nodes.get(node.id, [])
 
     def get_rows_between_nodes(self, upstream_node: QueryPlanNode, downstream_node: QueryPlanNode) -> Optional[int]:
-        for e in self.edges:
-            if upstream_node.id == e.src and downstream_node.id == e.dst:
-                return e.rows
+        return self._get_index().edge_rows.get((upstream_node.id, downstream_node.id))
 
-        return None
+    def get_input_rows(self, node: QueryPlanNode) -> int:
+        return self._get_index().input_rows.get(node.id, 0)
+
+    def get_output_rows(self, node: QueryPlanNode) -> int:
+        return self._get_index().output_rows.get(node.id, 0)
+
+    def get_analysis(self) -> QueryPlanStepAnalysis:
+        # Single pass over graph, which is shared by all conditions checking this step
+        if self._analysis is None:
+            self._analysis = self._build_analysis()
+
+        return self._analysis
+
+    def _get_index(self) -> QueryPlanStepIndex:
+        if self._index is None:
+            self._index = self._build_index()
+
+        return self._index
+
+    def _build_index(self) -> QueryPlanStepIndex:
+        nodes = {}
+        node_positions = {}
+
+        for position, n in enumerate(self.nodes):
+            if n.id not in nodes:
+                nodes[n.id] = n
+                node_positions[n.id] = position
 
+        upstream_node_ids = {}
+        downstream_node_ids = {}
+        edge_rows = {}
 
-@dataclass
+        for e in self.edges:
+            # Only the first edge between two nodes is taken into account
+            if (e.src, e.dst) in edge_rows:
+                continue
+
+            edge_rows[(e.src, e.dst)] = e.rows
+
+            upstream_node_ids.setdefault(e.dst, []).append(e.src)
+            downstream_node_ids.setdefault(e.src, []).append(e.dst)
+
+        # Adjacent nodes are returned in the same order as in the list of nodes
+        upstream_nodes = {
+            node_id: [nodes[i] for i in sorted(ids, key=node_positions.get) if i in nodes]
+            for node_id, ids in upstream_node_ids.items()
+        }
+
+        downstream_nodes = {
+            node_id: [nodes[i] for i in sorted(ids, key=node_positions.get) if i in nodes]
+            for node_id, ids in downstream_node_ids.items()
+        }
+
+        input_rows = {
+            node_id: sum(edge_rows[(un.id, node_id)] for un in adjacent_nodes)
+            for node_id, adjacent_nodes in upstream_nodes.items()
+        }
+
+        output_rows = {
+            node_id: sum(edge_rows[(node_id, dn.id)] for dn in adjacent_nodes)
+            for node_id, adjacent_nodes in downstream_nodes.items()
+        }
+
+        return QueryPlanStepIndex(
+            nodes=nodes,
+            upstream_nodes=upstream_nodes,
+            downstream_nodes=downstream_nodes,
+            edge_rows=edge_rows,
+            input_rows=input_rows,
+            output_rows=output_rows,
+        )
+
+    def _build_analysis(self) -> QueryPlanStepAnalysis:
+        index = self._get_index()
+
+        nodes_by_name = {}
+        explosion_rates = {}
+
+        for n in index.nodes.values():
+            nodes_by_name.setdefault(n.name, []).append(n)
+
+            input_rows = index.input_rows.get(n.id, 0)
+            output_rows = index.output_rows.get(n.id, 0)
+
+            explosion_rates[n.id] = output_rows / input_rows if input_rows > 0 else 0
+
+        local_spilling = self.statistics_spilling.get("Bytes spilled to local storage")
+        remote_spilling = self.statistics_spilling.get("Bytes spilled to remote storage")
+        scan_progress = self.statistics_io.get("Scan progress")
+
+        return QueryPlanStepAnalysis(
+            nodes_by_name=nodes_by_name,
+            operator_counts={name: len(nodes) for name, nodes in nodes_by_name.items()},
+            input_rows=index.input_rows,
+            output_rows=index.output_rows,
+            explosion_rates=explosion_rates,
+            local_spilling_bytes=local_spilling.value if local_spilling else 0,
+            remote_spilling_bytes=remote_spilling.value if remote_spilling else 0,
+            scan_progress=scan_progress.value if scan_progress else None,
+        )
+
+
+@slotted_dataclass
 class QueryPlan:
     steps: List[QueryPlanStep]
 
@@ -164,6 +484,58 @@ class QueryPlan:
         return None
 
 
+def build_query_plan_node(node_def: dict) -> QueryPlanNode:
+    return QueryPlanNode(
+        id=node_def["id"],
+        logical_id=node_def["logicalId"],
+        name=intern_str(node_def["name"]),
+        title=node_def.get("title"),
+        node_def=node_def,
+    )
+
+
+def build_query_plan_edge(edge_def: dict) -> QueryPlanEdge:
+    return QueryPlanEdge(
+        id=edge_def["id"],
+        src=edge_def["src"],
+        dst=edge_def["dst"],
+        rows=edge_def["rows"],
+        expressions=edge_def["expressions"],
+    )
+
+
+def build_query_plan_labels(items: List[dict]) -> Dict[str, QueryPlanLabel]:
+    return {
+        intern_str(item["name"]): QueryPlanLabel(
+            name=intern_str(item["name"]),
+            value=item["value"],
+        )
+        for item in items
+    }
+
+
+def build_query_plan_waits(items: List[dict]) -> Dict[str, QueryPlanWait]:
+    return {
+        intern_str(item["name"]): QueryPlanWait(
+            name=intern_str(item["name"]),
+            value=item["value"],
+            percentage=item["percentage"],
+        )
+        for item in items
+    }
+
+
+def build_query_plan_statistics(items: List[dict]) -> Dict[str, QueryPlanStatistics]:
+    return {
+        intern_str(item["name"]): QueryPlanStatistics(
+            name=intern_str(item["name"]),
+            value=item["value"],
+            unit=intern_str(item["unit"]),
+        )
+        for item in items
+    }
+
+
 class CheckResultLevel(IntEnum):
     NOTICE = 1
     WARNING = 2
@@ -171,7 +543,7 @@ class CheckResultLevel(IntEnum):
     KILL = 4
 
 
-@dataclass
+@slotted_dataclass
 class CheckResult:
     level: CheckResultLevel
     name: str
@@ -181,6 +553,19 @@ class CheckResult:
     holding_lock: Optional[HoldingLock] = None
     holding_query: Optional[Query] = None
 
+    # Root blocker transaction is aborted instead of query itself
+    kill_root_blocker: bool = False
+    root_blocker_query: Optional[Query] = None
+
+    # Set by MultiAccountCoordinator
+    account_name: Optional[str] = None
+
+
+@slotted_dataclass
+class SkippedQuery:
+    query: Query
+    reason: str
+
 
 def dataclass_to_json_str(val):
     return dumps(dataclass_to_dict_recursive(val), indent=2, default=str)
@@ -197,6 +582,14 @@ def dataclass_to_dict_recursive(val):
         return val.name
 
     if is_dataclass(val):
-        return {f.name: dataclass_to_dict_recursive(getattr(val, f.name)) for f in fields(val)}
+        result = {
+            f.name: dataclass_to_dict_recursive(getattr(val, f.name)) for f in fields(val) if not f.metadata.get("internal")
+        }
+
+        # Lazy fields are built on access and should be serialized as normal fields
+        for name in getattr(val, "LAZY_FIELDS", ()):
+            result[name] = dataclass_to_dict_recursive(getattr(val, name))
+
+        return result
 
     return val
@@ -0,0 +1,472 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from random import Random
+from re import compile as re_compile
+from snowflake.connector.errors import InternalServerError, OperationalError, RequestTimeoutError
+from socket import timeout as SocketTimeout
+from threading import Lock, Thread
+from time import sleep
+from typing import Callable, Dict, List, Optional, Sequence, Union
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, quote, unquote, urlparse
+from urllib.request import Request, urlopen
+
+SHOW_USERS_LIKE_REGEXP = re_compile(r"^SHOW USERS LIKE %\((\w+)\)s$")
+
+
+def uniform_latency(low: float, high: float, seed: Optional[int] = None) -> Callable[[], float]:
+    rng = Random(seed)
+    return lambda: rng.uniform(low, high)
+
+
+def lognormal_latency(median: float, sigma: float, seed: Optional[int] = None) -> Callable[[], float]:
+    # Long tail of slow requests, similar to real REST API
+    rng = Random(seed)
+    return lambda: median * rng.lognormvariate(0, sigma)
+
+
+def generate_session_defs(num_users: int = 1) -> List[dict]:
+    return [
+        {
+            "idAsString": str(i + 1),
+            "clientApplication": "PythonConnector",
+            "clientEnvironment": "{}",
+            "clientNetAddress": "127.0.0.1",
+            "clientSupportInfo": "",
+            "userName": "BENCHMARK" if i == 0 else f"BENCHMARK_{i}",
+        }
+        for i in range(num_users)
+    ]
+
+
+def generate_query_defs(
+    num_running: int,
+    num_queued: int = 0,
+    num_blocked: int = 0,
+    *,
+    num_warehouses: int = 1,
+    num_users: int = 1,
+    max_duration: int = 7200,
+) -> List[dict]:
+    query_defs = []
+    statuses = ["RUNNING"] * num_running + ["QUEUED"] * num_queued + ["BLOCKED"] * num_blocked
+
+    for i, status in enumerate(statuses):
+        # Durations are spread deterministically between 0 and max_duration seconds
+        duration = (i * 7919) % max_duration * 1000 if max_duration else 3600000
+        warehouse_num = i % num_warehouses
+
+        query_defs.append(
+            {
+                "id": f"00000000-0000-0000-0000-{i:012d}",
+                "queryTag": "",
+                "sqlText": f"SELECT {i}",
+                "status": status,
+                "state": "RUNNING" if status == "RUNNING" else status,
+                "sessionIdAsString": str(i % num_users + 1),
+                "clientSendTime": 1700000000000,
+                "startTime": 1700000000000 + i,
+                "endTime": 0,
+                "gsCompileDuration": 100,
+                "gsExecDuration": 100,
+                "xpExecDuration": duration if status == "RUNNING" else 0,
+                "listingExternalFiles": 0,
+                "totalDuration": duration + 200,
+                "warehouseId": warehouse_num + 1,
+                "warehouseName": "BENCHMARK_WH" if warehouse_num == 0 else f"BENCHMARK_WH_{warehouse_num}",
+                "warehouseExternalSize": "X-Small",
+                "warehouseServerType": "STANDARD",
+                "stats": {"queuedLoadTime": duration} if status == "QUEUED" else {},
+                "metaVersion": 1,
+                "majorVersionNumber": 8,
+                "minorVersionNumber": 0,
+                "patchVersionNumber": 0,
+            }
+        )
+
+    return query_defs
+
+
+def generate_query_list_response(num_queries: int):
+    return {
+        "success": True,
+        "data": {
+            "sessionsShort": generate_session_defs(),
+            "queries": generate_query_defs(num_queries, max_duration=0),
+        },
+    }
+
+
+def generate_query_plan_response(num_nodes: int, num_steps: int = 1):
+    return {
+        "success": True,
+        "data": {
+            "steps": [
+                {
+                    "step": step + 1,
+                    "description": "",
+                    "timeInMs": 3600000,
+                    # Only the last step is running, previous steps are complete
+                    "state": "running" if step == num_steps - 1 else "done",
+                    "graphData": {
+                        "nodes": [
+                            {
+                                "id": i,
+                                "logicalId": i,
+                                "name": "Join" if i % 10 == 0 else "TableScan",
+                                "title": None,
+                                "labels": [],
+                                "statistics": {},
+                            }
+                            for i in range(num_nodes)
+                        ],
+                        "edges": [
+                            {"id": f"{i + 1}-{i}", "src": i + 1, "dst": i, "rows": 1000, "expressions": []}
+                            for i in range(num_nodes - 1)
+                        ],
+                        "global": {},
+                    },
+                }
+                for step in range(num_steps)
+            ]
+        },
+    }
+
+
+class _ThreadingHTTPServer(ThreadingHTTPServer):
+    # Default backlog is too small for hundreds of concurrent connections
+    request_queue_size = 1024
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client closed connection after timeout, it is expected
+        pass
+
+
+class FakeMonitoringServer:
+    """
+    Local stand-in for Snowflake monitoring REST API, can be used in benchmarks and tests
+
+    Query list contains num_queries RUNNING queries, num_queued QUEUED queries and num_blocked BLOCKED queries
+    Serves /monitoring/queries with pagination and subsets, /monitoring/query-plan-data, SQL commands and abort of queries
+    Latency is either constant or a function returning random latency of each request, e.g. lognormal_latency()
+    Requests for query plans fail with probability error_rate and hang for timeout_duration with probability timeout_rate
+    Requests for query list fail after query_list_error_after successful requests, if set
+    Requests for query list of subsets in query_list_error_subsets always fail
+
+    Aborted queries are collected in aborted_query_ids and are removed from query list
+    Blocked queries are reported by SHOW LOCKS as waiting for the same holding transaction
+    """
+
+    def __init__(
+        self,
+        *,
+        num_queries: int = 100,
+        num_queued: int = 0,
+        num_blocked: int = 0,
+        num_warehouses: int = 1,
+        num_users: int = 1,
+        num_steps: int = 1,
+        num_nodes: int = 50,
+        latency: Union[float, Callable[[], float]] = 0.1,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_duration: float = 60,
+        query_list_error_after: Optional[int] = None,
+        query_list_error_subsets: Sequence[str] = (),
+        seed: Optional[int] = None,
+    ):
+        self.session_defs = generate_session_defs(num_users)
+        self.query_defs = generate_query_defs(
+            num_queries, num_queued, num_blocked, num_warehouses=num_warehouses, num_users=num_users
+        )
+        self.query_plan_response = dumps(generate_query_plan_response(num_nodes, num_steps)).encode()
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_duration = timeout_duration
+        self.query_list_error_after = query_list_error_after
+        self.query_list_error_subsets = set(query_list_error_subsets)
+
+        self.aborted_query_ids: List[str] = []
+        self.aborted_transaction_ids: List[str] = []
+        self.executed_commands: List[str] = []
+        self.request_counts: Dict[str, int] = {}
+
+        self._rng = Random(seed)
+        self._lock = Lock()
+
+        self.server = _ThreadingHTTPServer(("127.0.0.1", 0), self._build_handler_class())
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_connection(self):
+        return FakeServerConnection(self.base_url)
+
+    def _get_latency(self):
+        return self.latency() if callable(self.latency) else self.latency
+
+    def _get_outcome(self):
+        # Random outcome of query plan request: "error", "timeout" or None
+        with self._lock:
+            val = self._rng.random()
+
+        if val < self.error_rate:
+            return "error"
+
+        if val < self.error_rate + self.timeout_rate:
+            return "timeout"
+
+        return None
+
+    def _is_query_list_error(self, url_params: Dict[str, str]):
+        if url_params.get("subset") in self.query_list_error_subsets:
+            return True
+
+        if self.query_list_error_after is None:
+            return False
+
+        with self._lock:
+            return self.request_counts["query_list"] > self.query_list_error_after
+
+    def _count_request(self, name):
+        with self._lock:
+            self.request_counts[name] = self.request_counts.get(name, 0) + 1
+
+    def _get_query_list_response(self, url_params: Dict[str, str]):
+        with self._lock:
+            aborted_query_ids = set(self.aborted_query_ids)
+
+        query_defs = [q for q in self.query_defs if q["id"] not in aborted_query_ids]
+
+        if "subset" in url_params:
+            query_defs = [q for q in query_defs if q["status"] == url_params["subset"]]
+
+        if "uuid" in url_params:
+            query_defs = [q for q in query_defs if q["id"] == url_params["uuid"]]
+
+        if "end" in url_params:
+            query_defs = [q for q in query_defs if q["startTime"] < int(url_params["end"])]
+
+        # Newest queries first, same as real REST API
+        query_defs = sorted(query_defs, key=lambda q: q["startTime"], reverse=True)[: int(url_params.get("max", 1000))]
+        session_ids = {q["sessionIdAsString"] for q in query_defs}
+
+        return {
+            "success": True,
+            "data": {
+                "sessionsShort": [s for s in self.session_defs if s["idAsString"] in session_ids],
+                "queries": query_defs,
+            },
+        }
+
+    def _execute_sql(self, command: str, params: Optional[dict]):
+        with self._lock:
+            self.executed_commands.append(command)
+
+        if command == "SHOW USERS" or command.startswith("SHOW USERS LIKE"):
+            # Multi-statement request with one SHOW USERS LIKE per user, results of all statements are returned together
+            user_names = None
+
+            if command != "SHOW USERS":
+                user_names = {params[SHOW_USERS_LIKE_REGEXP.match(c).group(1)] for c in command.split("; ")}
+
+            return [
+                {
+                    "name": s["userName"],
+                    "login_name": s["userName"],
+                    "display_name": s["userName"],
+                    "first_name": "",
+                    "last_name": "",
+                    "email": "",
+                    "comment": "",
+                    "default_warehouse": "",
+                    "default_role": "",
+                    "owner": "",
+                }
+                for s in self.session_defs
+                if user_names is None or s["userName"] in user_names
+            ]
+
+        if command == "SHOW LOCKS IN ACCOUNT":
+            rows = [
+                {
+                    "resource": "BENCHMARK_DB.PUBLIC.BENCHMARK_TABLE",
+                    "type": "PARTITIONS",
+                    "transaction": "1",
+                    "query_id": "00000000-0000-0000-0000-999999999999",
+                    "session": "1",
+                    "status": "HOLDING",
+                }
+            ]
+
+            for q in self.query_defs:
+                if q["status"] == "BLOCKED" and q["id"] not in self.aborted_query_ids:
+                    rows.append(
+                        {
+                            "resource": "BENCHMARK_DB.PUBLIC.BENCHMARK_TABLE",
+                            "type": "PARTITIONS",
+                            "transaction": str(int(q["id"].split("-")[-1]) + 2),
+                            "query_id": q["id"],
+                            "session": q["sessionIdAsString"],
+                            "status": "WAITING",
+                        }
+                    )
+
+            return rows
+
+        if command.startswith("SELECT SYSTEM$ABORT_TRANSACTION"):
+            with self._lock:
+                self.aborted_transaction_ids.append(str(params["transaction_id"]))
+
+        return []
+
+    def _build_handler_class(self):
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                sleep(fake_server._get_latency())
+
+                parsed_url = urlparse(self.path)
+
+                if parsed_url.path.startswith("/monitoring/query-plan-data/"):
+                    fake_server._count_request("query_plan")
+                    outcome = fake_server._get_outcome()
+
+                    if outcome == "error":
+                        self.send_error(500)
+                        return
+
+                    if outcome == "timeout":
+                        sleep(fake_server.timeout_duration)
+
+                    self._send_body(fake_server.query_plan_response)
+                elif parsed_url.path == "/monitoring/queries":
+                    fake_server._count_request("query_list")
+                    url_params = {k: v[0] for k, v in parse_qs(parsed_url.query).items()}
+
+                    if fake_server._is_query_list_error(url_params):
+                        self.send_error(500)
+                        return
+
+                    self._send_body(dumps(fake_server._get_query_list_response(url_params)).encode())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                sleep(fake_server._get_latency())
+
+                parsed_url = urlparse(self.path)
+                request_body = loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+                if parsed_url.path.startswith("/fake/abort-query/"):
+                    fake_server._count_request("abort_query")
+
+                    with fake_server._lock:
+                        fake_server.aborted_query_ids.append(unquote(parsed_url.path[len("/fake/abort-query/") :]))
+
+                    self._send_body(dumps({"success": True}).encode())
+                elif parsed_url.path == "/fake/sql":
+                    fake_server._count_request("sql")
+                    rows = fake_server._execute_sql(request_body["command"], request_body["params"])
+
+                    self._send_body(dumps({"success": True, "rows": rows}).encode())
+                else:
+                    self.send_error(404)
+
+            def _send_body(self, body: bytes):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeServerRestful:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+        # Same as SnowflakeRestful, used by AsyncRestClient
+        self.server_url = base_url
+        self.token = None
+
+    def request(self, url, method="get", client="rest", timeout=None, _no_retry=False, **kwargs):
+        return _send_request(f"{self.base_url}{url}", timeout=timeout)
+
+
+class FakeServerCursor:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.rows = []
+
+    def execute(self, command, params=None, num_statements=None):
+        response = _send_request(f"{self.base_url}/fake/sql", body={"command": command, "params": params})
+        self.rows = response["rows"]
+
+        return self
+
+    def nextset(self):
+        return None
+
+    def abort_query(self, query_id):
+        _send_request(f"{self.base_url}/fake/abort-query/{quote(query_id)}", body={})
+        return True
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeServerConnection:
+    """
+    Mimics parts of SnowflakeConnection used by SnowKillEngine and sends blocking HTTP requests to FakeMonitoringServer
+
+    Errors are raised as the same exceptions as in Snowflake connector, so engine handles them the same way
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.rest = FakeServerRestful(base_url)
+
+    def cursor(self, cursor_class=None):
+        return FakeServerCursor(self.base_url)
+
+    def close(self):
+        pass
+
+
+def _send_request(url, body=None, timeout=None):
+    request = Request(url, data=dumps(body).encode() if body is not None else None)
+
+    if body is not None:
+        request.add_header("Content-Type", "application/json")
+
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            return loads(response.read())
+    except HTTPError as e:
+        raise InternalServerError(msg=f"HTTP error [{e.code}]")
+    except (SocketTimeout, TimeoutError):
+        raise RequestTimeoutError(msg=f"Request timed out after [{timeout}] seconds")
+    except URLError as e:
+        if isinstance(e.reason, (SocketTimeout, TimeoutError)):
+            raise RequestTimeoutError(msg=f"Request timed out after [{timeout}] seconds")
+
+        raise OperationalError(msg=f"Connection error [{e.reason}]")
@@ -0,0 +1,291 @@
+from random import Random
+from typing import Dict, List, Optional
+
+from snowkill.engine import SnowKillEngine
+from snowkill.struct import CheckResult, CheckResultLevel, HoldingLock, Query, QueryPlan
+from snowkill.testing.fake_server import FakeServerConnection, generate_query_defs, generate_session_defs
+
+
+# Operator name -> relative frequency and max number of inputs
+OPERATORS = {
+    "TableScan": (30, 0),
+    "Filter": (20, 1),
+    "Join": (15, 2),
+    "CartesianJoin": (2, 2),
+    "Aggregate": (10, 1),
+    "Sort": (5, 1),
+    "UnionAll": (3, 4),
+    "Projection": (10, 1),
+    "WindowFunction": (3, 1),
+    "WithReference": (2, 1),
+}
+
+
+class SyntheticWorkload:
+    """
+    Deterministic synthetic workload for benchmarks of conditions, query plan parsing and formatters
+
+    Query plans have num_steps steps with num_nodes nodes each, the last step is running
+    Nodes form a tree of realistic operators with labels and statistics, rows of edges follow Pareto distribution
+    Lower row_skew produces heavier tail, e.g. occasional joins with explosion rate above 100x
+    """
+
+    def __init__(
+        self,
+        *,
+        num_queries: int = 100,
+        num_steps: int = 3,
+        num_nodes: int = 100,
+        row_skew: float = 1.5,
+        num_warehouses: int = 5,
+        num_users: int = 20,
+        seed: int = 0,
+    ):
+        self.num_queries = num_queries
+        self.num_steps = num_steps
+        self.num_nodes = num_nodes
+        self.row_skew = row_skew
+        self.num_warehouses = num_warehouses
+        self.num_users = num_users
+        self.seed = seed
+
+        # Engine is used only to build structures from responses, it never sends requests
+        self.engine = SnowKillEngine(FakeServerConnection(""), max_workers=1)
+
+    def get_query_list_response(self):
+        query_defs = generate_query_defs(
+            self.num_queries - self.num_queries // 5,
+            self.num_queries // 10,
+            self.num_queries // 10,
+            num_warehouses=self.num_warehouses,
+            num_users=self.num_users,
+        )
+
+        rng = Random(self.seed)
+
+        for q in query_defs:
+            q["queryTag"] = rng.choice(["", "dbt:daily", "dbt:hourly", "looker", "airflow:etl"])
+            q["sqlText"] = f"SELECT * FROM table_{rng.randrange(1000)} WHERE id > {rng.randrange(1000000)} -- {q['id']}"
+
+        return {
+            "success": True,
+            "data": {
+                "sessionsShort": generate_session_defs(self.num_users),
+                "queries": query_defs,
+            },
+        }
+
+    def get_query_plan_response(self, seed: Optional[int] = None):
+        rng = Random(self.seed if seed is None else seed)
+
+        return {
+            "success": True,
+            "data": {
+                "steps": [
+                    self._generate_step_def(step + 1, "running" if step == self.num_steps - 1 else "done", rng)
+                    for step in range(self.num_steps)
+                ]
+            },
+        }
+
+    def build_queries(self) -> List[Query]:
+        response = self.get_query_list_response()
+        sessions = {s["idAsString"]: self.engine._build_session(s) for s in response["data"]["sessionsShort"]}
+
+        return [self.engine._build_query(q, sessions[q["sessionIdAsString"]]) for q in response["data"]["queries"]]
+
+    def build_query_plan(self, response: Optional[dict] = None) -> QueryPlan:
+        if response is None:
+            response = self.get_query_plan_response()
+
+        return QueryPlan(steps=[self.engine._build_query_plan_step(s) for s in response["data"]["steps"]])
+
+    def build_check_results(self, queries: List[Query], query_plan: QueryPlan) -> List[CheckResult]:
+        check_results = []
+
+        for i, q in enumerate(queries):
+            holding_lock = None
+
+            if q.status == "BLOCKED":
+                holding_lock = HoldingLock(
+                    waiting_query_id=q.query_id,
+                    waiting_session_id=q.session.session_id,
+                    waiting_transaction_id=str(i + 2),
+                    holding_query_id=queries[0].query_id,
+                    holding_session_id=queries[0].session.session_id,
+                    holding_transaction_id="1",
+                    resource="BENCHMARK_DB.PUBLIC.BENCHMARK_TABLE",
+                    type="PARTITIONS",
+                    root_query_id=queries[0].query_id,
+                    root_session_id=queries[0].session.session_id,
+                    root_transaction_id="1",
+                    chain_depth=2,
+                    root_blocked_count=2,
+                )
+
+            check_results.append(
+                CheckResult(
+                    level=list(CheckResultLevel)[i % len(CheckResultLevel)],
+                    name="SyntheticCondition",
+                    description=f"Synthetic check result [{i}]",
+                    query=q,
+                    query_plan=query_plan if q.status == "RUNNING" else None,
+                    holding_lock=holding_lock,
+                    holding_query=queries[0] if holding_lock else None,
+                )
+            )
+
+        return check_results
+
+    def _generate_step_def(self, step: int, state: str, rng: Random):
+        names = self._generate_node_names(rng)
+        parents = self._generate_node_parents(names, rng)
+
+        children: Dict[int, List[int]] = {}
+
+        for node_id, parent_id in parents.items():
+            children.setdefault(parent_id, []).append(node_id)
+
+        # Rows are calculated from leaves to root, children always have higher ids than parents
+        output_rows: Dict[int, int] = {}
+
+        for node_id in reversed(range(len(names))):
+            input_rows = sum(output_rows[c] for c in children.get(node_id, []))
+            output_rows[node_id] = self._generate_output_rows(names[node_id], input_rows, rng)
+
+        nodes = [self._generate_node_def(node_id, name, names, children, rng) for node_id, name in enumerate(names)]
+        edges = [
+            {"id": f"{node_id}-{parent_id}", "src": node_id, "dst": parent_id, "rows": output_rows[node_id], "expressions": []}
+            for node_id, parent_id in parents.items()
+        ]
+
+        return {
+            "step": step,
+            "description": "",
+            "timeInMs": rng.randrange(1000, 3600000),
+            "state": state,
+            "graphData": {
+                "nodes": nodes,
+                "edges": edges,
+                "global": {
+                    "statistics": {
+                        "IO": [{"name": "Scan progress", "value": round(rng.random(), 4), "unit": "percent"}],
+                        "Spilling": [
+                            {
+                                "name": "Bytes spilled to local storage",
+                                "value": int(rng.paretovariate(1) * 2**30),
+                                "unit": "bytes",
+                            },
+                            {
+                                "name": "Bytes spilled to remote storage",
+                                "value": int(rng.paretovariate(2) * 2**20),
+                                "unit": "bytes",
+                            },
+                        ],
+                    },
+                    "waits": [
+                        {"name": "Processing", "value": rng.randrange(100000), "percentage": 0.8},
+                        {"name": "Network communication", "value": rng.randrange(10000), "percentage": 0.2},
+                    ],
+                },
+            },
+        }
+
+    def _generate_node_names(self, rng: Random) -> List[str]:
+        names = ["Result"]
+        open_inputs = 1
+
+        operator_names = list(OPERATORS)
+        operator_weights = [w for w, _ in OPERATORS.values()]
+
+        for i in range(1, self.num_nodes):
+            remaining = self.num_nodes - i
+
+            while True:
+                name = rng.choices(operator_names, operator_weights)[0]
+                max_inputs = OPERATORS[name][1]
+
+                # Tree must not be closed by table scan while more nodes remain, and must not grow beyond remaining nodes
+                if max_inputs == 0 and open_inputs == 1 and remaining > 1:
+                    continue
+
+                if max_inputs > 0 and open_inputs - 1 + max_inputs > remaining - 1:
+                    name = "TableScan" if open_inputs >= remaining else "Filter"
+
+                break
+
+            names.append(name)
+            open_inputs += OPERATORS[name][1] - 1
+
+        return names
+
+    def _generate_node_parents(self, names: List[str], rng: Random) -> Dict[int, int]:
+        parents = {}
+        open_slots = [0]
+
+        for node_id in range(1, len(names)):
+            if not open_slots:
+                break
+
+            # Depth-first most of the time, so plans have long pipelines similar to real ones
+            slot = len(open_slots) - 1 if rng.random() < 0.7 else rng.randrange(len(open_slots))
+            parents[node_id] = open_slots.pop(slot)
+
+            open_slots.extend([node_id] * OPERATORS[names[node_id]][1])
+
+        return parents
+
+    def _generate_output_rows(self, name: str, input_rows: int, rng: Random):
+        if name == "TableScan":
+            return int(rng.paretovariate(self.row_skew) * 100000)
+
+        if name in ("Join", "CartesianJoin"):
+            return int(input_rows * rng.paretovariate(self.row_skew) / 2)
+
+        if name == "Filter":
+            return int(input_rows * rng.random())
+
+        if name == "Aggregate":
+            return max(1, input_rows // 100)
+
+        return input_rows
+
+    def _generate_node_def(self, node_id: int, name: str, names: List[str], children: Dict[int, List[int]], rng: Random):
+        labels = []
+        statistics = {}
+
+        if name == "TableScan":
+            labels.append({"name": "Full Object Name", "value": f"BENCHMARK_DB.PUBLIC.TABLE_{rng.randrange(1000)}"})
+            labels.append({"name": "Columns", "value": ["ID", "NAME", "CREATED_AT"]})
+
+            statistics["IO"] = [{"name": "Scan progress", "value": round(rng.random(), 4), "unit": "percent"}]
+            statistics["Pruning"] = [
+                {"name": "Partitions scanned", "value": rng.randrange(1, 1000), "unit": None},
+                {"name": "Partitions total", "value": 1000, "unit": None},
+            ]
+        elif name == "Join":
+            labels.append({"name": "Join Type", "value": "INNER"})
+            labels.append({"name": "Equality Join Condition", "value": f"(A.ID = B.ID_{node_id})"})
+        elif name == "CartesianJoin":
+            labels.append({"name": "Join Type", "value": "INNER"})
+            labels.append({"name": "Additional Join Condition", "value": f"(A.ID > B.ID_{node_id})"})
+        elif name == "Aggregate":
+            child_names = [names[c] for c in children.get(node_id, [])]
+
+            # UNION without ALL is compiled into UnionAll followed by Aggregate without functions
+            if child_names == ["UnionAll"]:
+                labels.append({"name": "Grouping Keys", "value": ["UNION_ALL(A.ID, B.ID)"]})
+                labels.append({"name": "Aggregate Functions", "value": []})
+            else:
+                labels.append({"name": "Grouping Keys", "value": ["A.ID"]})
+                labels.append({"name": "Aggregate Functions", "value": ["SUM(A.AMOUNT)"]})
+
+        return {
+            "id": node_id,
+            "logicalId": node_id,
+            "name": name,
+            "title": None,
+            "labels": labels,
+            "statistics": statistics,
+            "waits": [{"name": "Processing", "value": rng.randrange(1000), "percentage": 1.0}],
+        }
@@ -0,0 +1,185 @@
+from json import dump as json_dump, load as json_load
+from logging import getLogger, NullHandler
+from os import replace
+from snowflake.connector import DictCursor, SnowflakeConnection
+from threading import Lock
+from time import time
+from typing import Dict, Iterable, List, Optional
+
+from snowkill.struct import User, intern_str, slotted_dataclass
+
+
+logger = getLogger(__name__)
+logger.addHandler(NullHandler())
+
+
+@slotted_dataclass
+class UserDirectoryEntry:
+    user: User
+    found: bool
+    load_time: float
+
+
+class UserDirectory:
+    """
+    Lazy directory of users, only users seen in pending sessions are loaded
+
+    Missing or expired users are loaded with SHOW USERS LIKE, all of them in a single multi-statement request
+    If many users are missing at once, e.g. on the first check, all users are loaded with single SHOW USERS instead
+    Users which were not found are remembered until ttl, same as users which were found
+
+    If path is set, directory is loaded from local JSON file on init and saved after each update, so restarts are warm
+    """
+
+    def __init__(
+        self,
+        connection: SnowflakeConnection,
+        *,
+        ttl: int = 3600,
+        full_reload_threshold: int = 20,
+        path: Optional[str] = None,
+    ):
+        self.connection = connection
+
+        self.ttl = ttl
+        self.full_reload_threshold = full_reload_threshold
+        self.path = path
+
+        self._entries: Dict[str, UserDirectoryEntry] = {}
+        self._lock = Lock()
+
+        if self.path:
+            self._load_file()
+
+    def get_user(self, user_name: str) -> User:
+        entry = self._entries.get(user_name)
+
+        # User was not prefetched, or user with this name was not returned from SHOW USERS
+        if entry is None:
+            return self._build_placeholder_user(user_name)
+
+        return entry.user
+
+    def prefetch(self, user_names: Iterable[str]):
+        # Lock prevents concurrent subsets of query list from loading the same users twice
+        with self._lock:
+            now = time()
+            missing_names = {n for n in user_names if n is not None and self._is_missing_or_expired(n, now)}
+
+            if not missing_names:
+                return
+
+            if len(missing_names) >= self.full_reload_threshold:
+                loaded_users = self._show_users()
+            else:
+                loaded_users = self._show_users(sorted(missing_names))
+
+            for user in loaded_users.values():
+                self._entries[user.name] = UserDirectoryEntry(user=user, found=True, load_time=now)
+
+            for user_name in missing_names.difference(loaded_users):
+                self._entries[user_name] = UserDirectoryEntry(
+                    user=self._build_placeholder_user(user_name), found=False, load_time=now
+                )
+
+            if self.path:
+                self._save_file()
+
+    def _is_missing_or_expired(self, user_name: str, now: float):
+        entry = self._entries.get(user_name)
+
+        return entry is None or now - entry.load_time > self.ttl
+
+    def _show_users(self, user_names: Optional[List[str]] = None) -> Dict[str, User]:
+        cursor = self.connection.cursor(DictCursor)
+
+        if user_names is None:
+            cursor.execute("SHOW USERS")
+        else:
+            # SHOW USERS LIKE accepts only one pattern, so one statement per user is sent in a single request
+            # Names are bound and escaped by connector, "_" and "%" wildcards are filtered by exact name below
+            params = {f"user_name_{i}": n for i, n in enumerate(user_names)}
+            command = "; ".join(f"SHOW USERS LIKE %({p})s" for p in params)
+
+            cursor.execute(command, params, num_statements=len(params))
+
+        users = {}
+
+        while cursor is not None:
+            for r in cursor:
+                if user_names is not None and r["name"] not in user_names:
+                    continue
+
+                users[r["name"]] = self._build_user(r)
+
+            cursor = cursor.nextset()
+
+        return users
+
+    def _build_user(self, r: dict) -> User:
+        return User(
+            name=intern_str(r["name"]),
+            login_name=r["login_name"],
+            display_name=r["display_name"],
+            first_name=r["first_name"] if r["first_name"] else None,
+            last_name=r["last_name"] if r["last_name"] else None,
+            email=r["email"] if r["email"] else None,
+            comment=r["comment"] if r["comment"] else None,
+            default_warehouse=r["default_warehouse"] if r["default_warehouse"] else None,
+            default_role=r["default_role"] if r["default_role"] else None,
+            owner=r["owner"] if r["owner"] else None,
+        )
+
+    def _build_placeholder_user(self, user_name: str):
+        return User(
+            name=user_name,
+            login_name=None,
+            display_name=None,
+            first_name=None,
+            last_name=None,
+            email=None,
+            comment=None,
+            default_warehouse=None,
+            default_role=None,
+            owner=None,
+        )
+
+    def _load_file(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json_load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load user directory from file [{self.path}] due to [{e.__class__.__name__}]")
+            return
+
+        for e in data.get("entries", []):
+            self._entries[e["user"]["name"]] = UserDirectoryEntry(
+                user=User(**e["user"]),
+                found=e["found"],
+                load_time=e["load_time"],
+            )
+
+    def _save_file(self):
+        data = {
+            "entries": [
+                {
+                    "user": {f: getattr(e.user, f) for f in User.__dataclass_fields__},
+                    "found": e.found,
+                    "load_time": e.load_time,
+                }
+                for e in self._entries.values()
+            ]
+        }
+
+        # File is replaced atomically, so partially written file is never loaded after restart
+        tmp_path = f"{self.path}.tmp"
+
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json_dump(data, f)
+
+            replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save user directory to file [{self.path}] due to [{e.__class__.__name__}]")
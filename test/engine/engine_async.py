@@ -0,0 +1,58 @@
+from asyncio import run
+from threading import enumerate as enumerate_threads
+
+from snowkill import *
+from snowkill.async_engine import AsyncSnowKillEngine
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def _get_conditions():
+    return [
+        JoinExplosionCondition(min_output_rows=0, min_explosion_rate=0, warning_duration=60),
+        ExecuteDurationCondition(notice_duration=600),
+    ]
+
+
+def _get_summary(check_results):
+    return sorted((r.query.query_id, r.name, r.level) for r in check_results)
+
+
+def test_async_engine():
+    with FakeMonitoringServer(num_queries=200, latency=0.02) as server:
+        with SnowKillEngine(server.get_connection()) as engine:
+            expected = engine.check_and_kill_pending_queries(_get_conditions())
+
+        async def _check_async():
+            async with AsyncSnowKillEngine(server.get_connection(), max_concurrency=100, max_workers=2) as engine:
+                check_results = await engine.check_and_kill_pending_queries(_get_conditions())
+                threads = [t for t in enumerate_threads() if t.name.startswith("SnowKillEngine")]
+
+                return check_results, threads, engine.last_cycle_report
+
+        actual, threads, cycle_report = run(_check_async())
+        num_requests = server.request_counts["query_plan"]
+
+    assert _get_summary(actual) == _get_summary(expected)
+    assert any(r.query_plan is not None for r in actual)
+
+    # Query plans are requested by event loop, only blocking driver calls use threads
+    assert len(threads) <= 2
+    assert len(cycle_report.query_plan_fetches) == num_requests / 2 > 0
+    assert cycle_report.num_query_plan_failures == cycle_report.num_query_plan_timeouts == 0
+
+
+def test_async_engine_query_plan_errors():
+    with FakeMonitoringServer(num_queries=50, latency=0, error_rate=0.3, timeout_rate=0.3, timeout_duration=3, seed=1) as server:
+
+        async def _check_async():
+            async with AsyncSnowKillEngine(server.get_connection()) as engine:
+                engine.engine.REST_ENDPOINT_QUERY_PLAN_TIMEOUT = 1
+                await engine.check_and_kill_pending_queries(_get_conditions())
+
+                return engine.last_cycle_report
+
+        cycle_report = run(_check_async())
+
+    assert len(cycle_report.query_plan_fetches) == server.request_counts["query_plan"]
+    assert cycle_report.num_query_plan_failures > 0
+    assert cycle_report.num_query_plan_timeouts > 0
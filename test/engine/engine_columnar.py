@@ -0,0 +1,69 @@
+from pytest import importorskip
+
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+from snowkill.testing.workload import SyntheticWorkload
+
+
+importorskip("numpy")
+
+from snowkill.columnar import ColumnarConditionSet  # noqa: E402
+
+
+class LongQueryTextCondition(ExecuteDurationCondition):
+    def check_min_duration(self, query):
+        return len(query.sql_text) % 2 == 0 and super().check_min_duration(query)
+
+
+def _get_conditions():
+    return [
+        ExecuteDurationCondition(notice_duration=600, kill_duration=3600, enable_kill=True),
+        ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(include_warehouse_name=["BENCHMARK_WH_1"])),
+        ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(exclude_user_name=["BENCHMARK_1*"])),
+        ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(include_sql_text=["SELECT *7"])),
+        ExecuteDurationCondition(notice_duration=60, query_filter=QueryFilter(include_user_name=["BENCHMARK_1"])),
+        LongQueryTextCondition(notice_duration=60, query_filter=QueryFilter(exclude_warehouse_name=["BENCHMARK_WH_2"])),
+        EstimatedScanDurationCondition(min_estimated_scan_duration=60, warning_duration=1800),
+        QueuedDurationCondition(notice_duration=30),
+        BlockedDurationCondition(warning_duration=300),
+    ]
+
+
+def test_columnar_condition_set():
+    queries = SyntheticWorkload(num_queries=1000).build_queries()
+    conditions = _get_conditions()
+
+    expected = ConditionSet(conditions).get_matching_conditions_for_page(queries)
+    actual = ColumnarConditionSet(conditions).get_matching_conditions_for_page(queries)
+
+    assert actual == expected
+    assert {c.__class__.__name__ for m in actual for c in m} == {c.__class__.__name__ for c in conditions}
+
+
+def test_duration_only_checked_in_place():
+    conditions = [c for c in _get_conditions() if c.DURATION_ONLY]
+
+    with FakeMonitoringServer(num_queries=100, num_queued=20, num_blocked=10, latency=0) as server:
+        with SnowKillEngine(server.get_connection()) as engine:
+            expected = engine.check_and_kill_pending_queries(conditions)
+
+    with FakeMonitoringServer(num_queries=100, num_queued=20, num_blocked=10, latency=0) as server:
+        with SnowKillEngine(server.get_connection(), condition_set_class=ColumnarConditionSet) as engine:
+            submitted = []
+            submit = engine.executor.submit
+
+            def _submit(fn, *args):
+                submitted.append(fn.__name__)
+                return submit(fn, *args)
+
+            engine.executor.submit = _submit
+            actual = engine.check_and_kill_pending_queries(conditions)
+
+        # Only blocked queries are checked by thread pool, kills are still aborted
+        assert submitted.count("_thread_inner_fn") == len([r for r in actual if r.query.status == "BLOCKED"]) > 0
+        assert len(server.aborted_query_ids) == len([r for r in actual if r.level == CheckResultLevel.KILL]) > 0
+
+        # Subsets of query list are loaded concurrently, so order of check results may differ
+        assert sorted((r.query.query_id, r.name, r.level.name) for r in actual) == sorted(
+            (r.query.query_id, r.name, r.level.name) for r in expected
+        )
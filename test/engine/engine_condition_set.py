@@ -0,0 +1,102 @@
+from snowkill import *
+from snowkill.condition.abc_condition import (
+    AbstractBlockedQueryCondition,
+    AbstractQueuedQueryCondition,
+    AbstractRunningQueryCondition,
+)
+from snowkill.testing.workload import SyntheticWorkload
+
+
+class WarehouseSizeDurationCondition(AbstractRunningQueryCondition):
+    REQUIRES_QUERY_PLAN = False
+
+    def check_custom_logic(self, query, query_plan):
+        return CheckResultLevel.NOTICE, "Query is running for too long on small warehouse"
+
+    def check_min_duration(self, query):
+        # Durations are specified for Medium warehouse, queries on smaller warehouses reach them sooner
+        return query.execute_duration * 4 >= self._calculate_min_duration()
+
+
+def _get_conditions():
+    return [
+        ExecuteDurationCondition(notice_duration=600, kill_duration=3600),
+        ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(include_warehouse_name=["BENCHMARK_WH_1"])),
+        ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(include_user_name=["BENCHMARK_2", "BENCHMARK_3"])),
+        ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(include_user_name=["BENCHMARK_1*"])),
+        ExecuteDurationCondition(warning_duration=60, query_filter=QueryFilter(exclude_warehouse_name=["BENCHMARK_WH"])),
+        EstimatedScanDurationCondition(min_estimated_scan_duration=60, warning_duration=1800),
+        QueuedDurationCondition(notice_duration=30, query_filter=QueryFilter(include_warehouse_name=["BENCHMARK_WH_2"])),
+        QueuedDurationCondition(warning_duration=1200),
+        BlockedDurationCondition(warning_duration=300),
+        WarehouseSizeDurationCondition(notice_duration=7200),
+    ]
+
+
+def _get_expected_conditions(query, conditions):
+    status_classes = {
+        "RUNNING": AbstractRunningQueryCondition,
+        "QUEUED": AbstractQueuedQueryCondition,
+        "BLOCKED": AbstractBlockedQueryCondition,
+    }
+
+    return [
+        c
+        for c in conditions
+        if isinstance(c, status_classes[query.status]) and c.check_min_duration(query) and c.check_query_filter(query)
+    ]
+
+
+def test_condition_set_matches_conditions():
+    queries = SyntheticWorkload(num_queries=1000).build_queries()
+    conditions = _get_conditions()
+    condition_set = ConditionSet(conditions)
+
+    matching = condition_set.get_matching_conditions_for_page(queries)
+
+    for query, matching_conditions in zip(queries, matching):
+        assert matching_conditions == _get_expected_conditions(query, conditions)
+
+    # Sanity check, every condition matches at least one query
+    assert {id(c) for m in matching for c in m} == {id(c) for c in conditions}
+
+
+def test_condition_set_custom_min_duration():
+    queries = [q for q in SyntheticWorkload(num_queries=1000).build_queries() if q.status == "RUNNING"]
+    condition = WarehouseSizeDurationCondition(notice_duration=7200)
+
+    matching = ConditionSet([condition]).get_matching_conditions_for_page(queries)
+
+    # Standard check of min duration would discard all queries, since none of them is running for 7200 seconds
+    assert any(m for m in matching)
+    assert all(bool(m) == (q.execute_duration >= 1800) for q, m in zip(queries, matching))
+
+
+class CountingExecuteDurationCondition(ExecuteDurationCondition):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.checked_warehouse_names = set()
+
+    def check_query_filter(self, query):
+        self.checked_warehouse_names.add(query.warehouse_name)
+        return super().check_query_filter(query)
+
+
+def test_condition_set_routing():
+    queries = SyntheticWorkload(num_queries=1000).build_queries()
+
+    routed = CountingExecuteDurationCondition(
+        warning_duration=60, query_filter=QueryFilter(include_warehouse_name=["BENCHMARK_WH_1"])
+    )
+    glob = CountingExecuteDurationCondition(
+        warning_duration=60, query_filter=QueryFilter(include_warehouse_name=["BENCHMARK_WH_1*"])
+    )
+
+    matching = ConditionSet([routed, glob]).get_matching_conditions_for_page(queries)
+
+    # Condition with literal warehouse name is evaluated only for queries on this warehouse
+    assert routed.checked_warehouse_names == {"BENCHMARK_WH_1"}
+    assert len(glob.checked_warehouse_names) > 1
+
+    assert [routed in m for m in matching] == [glob in m for m in matching]
+    assert any(routed in m for m in matching)
@@ -0,0 +1,84 @@
+from threading import Thread
+from time import sleep
+
+from pytest import raises
+from snowflake.connector import Error as SnowflakeError
+
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def _get_conditions():
+    return [
+        ExecuteDurationCondition(warning_duration=60, kill_duration=3600, enable_kill=True),
+        JoinExplosionCondition(min_output_rows=10_000_000, min_explosion_rate=10, warning_duration=600),
+        QueuedDurationCondition(notice_duration=60),
+    ]
+
+
+def test_cycle_report():
+    reports = []
+
+    with FakeMonitoringServer(num_queries=50, num_queued=10, latency=0.01, error_rate=0.2, seed=0) as server:
+        with SnowKillEngine(server.get_connection(), on_cycle_report=reports.append) as engine:
+            check_results = engine.check_and_kill_pending_queries(_get_conditions())
+            report = engine.last_cycle_report
+
+            assert reports == [report]
+            assert not report.is_failed
+            assert report.num_check_results == len(check_results)
+
+            assert report.query_counts == {"RUNNING": 50, "QUEUED": 10}
+            assert 0 < report.matched_query_counts["RUNNING"] < 50
+
+            # JoinExplosionCondition is not called for queries, which query plan could not be loaded
+            assert len(report.query_plan_fetches) == server.request_counts["query_plan"]
+            assert report.num_query_plan_failures > 0
+            assert (
+                report.condition_calls["JoinExplosionCondition"]
+                == len(report.query_plan_fetches) - report.num_query_plan_failures
+            )
+
+            assert len(report.kills) == len(server.aborted_query_ids) > 0
+            assert report.duration >= report.list_duration > 0
+            assert report.match_duration > 0
+
+            summary = report.get_summary()
+
+            assert summary["num_kills"] == len(report.kills)
+            assert summary["is_failed"] is False
+
+
+def test_cycle_report_failed_check():
+    reports = []
+
+    with FakeMonitoringServer(num_queries=250, latency=0, query_list_error_after=1) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=100, on_cycle_report=reports.append) as engine:
+            with raises(SnowflakeError):
+                engine.check_and_kill_pending_queries(_get_conditions())
+
+            assert reports == [engine.last_cycle_report]
+            assert engine.last_cycle_report.is_failed
+            assert engine.last_cycle_report.duration is not None
+
+            # Next check is allowed after failed check
+            server.query_list_error_after = None
+            engine.check_and_kill_pending_queries(_get_conditions())
+
+            assert not engine.last_cycle_report.is_failed
+
+
+def test_cycle_report_concurrent_checks():
+    with FakeMonitoringServer(num_queries=10, latency=0.5) as server:
+        with SnowKillEngine(server.get_connection()) as engine:
+            thread = Thread(target=engine.check_and_kill_pending_queries, args=(_get_conditions(),))
+            thread.start()
+            sleep(0.1)
+
+            # Engine keeps state of current check, so checks of the same engine cannot overlap
+            with raises(ValueError):
+                engine.check_and_kill_pending_queries(_get_conditions())
+
+            thread.join()
+
+            assert engine.last_cycle_report.query_counts == {"RUNNING": 10}
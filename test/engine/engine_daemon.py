@@ -0,0 +1,82 @@
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer, FakeServerConnection
+
+
+def _get_conditions():
+    return [
+        ExecuteDurationCondition(notice_duration=60),
+    ]
+
+
+class ClosingConnection(FakeServerConnection):
+    def __init__(self, base_url):
+        super().__init__(base_url)
+        self.is_closed = False
+
+    def close(self):
+        self.is_closed = True
+
+
+def test_daemon_reconnect():
+    with FakeMonitoringServer(num_queries=10, latency=0) as server:
+        connections = []
+
+        def _connection_factory():
+            connections.append(ClosingConnection(server.base_url))
+            return connections[-1]
+
+        connection = ClosingConnection(server.base_url)
+
+        with SnowKillEngine(connection) as engine:
+            daemon = SnowKillDaemon(engine, _get_conditions(), interval=0, connection_factory=_connection_factory)
+
+            # Query plan cache and time budget are not enabled implicitly
+            assert engine.query_plan_cache is None
+            assert daemon.time_budget is None
+
+            # Every request for query list fails, until connection is replaced
+            server.query_list_error_after = 0
+
+            for _ in range(5):
+                assert daemon.run_check() == []
+
+            assert daemon.num_failed_checks == 5
+            assert daemon.num_reconnects == 1
+            assert engine.connection is connections[0]
+            assert engine.user_directory.connection is connections[0]
+
+            # Connection passed by caller may be shared with storage, so it is not closed
+            assert not connection.is_closed
+
+            for _ in range(3):
+                assert daemon.run_check() == []
+
+            # Connection created by daemon is closed once it is replaced
+            assert daemon.num_reconnects == 2
+            assert engine.connection is connections[1]
+            assert connections[0].is_closed
+            assert not connections[1].is_closed
+
+            server.query_list_error_after = None
+
+            assert daemon.run_check()
+            assert daemon.num_consecutive_failures == 0
+
+
+class BrokenCondition(ExecuteDurationCondition):
+    def check_query_filter(self, query):
+        raise ValueError("Broken condition")
+
+
+def test_daemon_unexpected_error(caplog):
+    with FakeMonitoringServer(num_queries=10, latency=0) as server:
+        with SnowKillEngine(server.get_connection()) as engine:
+            conditions = [BrokenCondition(notice_duration=60)]
+            daemon = SnowKillDaemon(engine, conditions, interval=0, connection_factory=server.get_connection)
+
+            for _ in range(5):
+                assert daemon.run_check() == []
+
+            # Errors which are not caused by Snowflake are logged with traceback and do not cause reconnects
+            assert daemon.num_reconnects == 0
+            assert any(r.exc_info for r in caplog.records)
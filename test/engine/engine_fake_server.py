@@ -0,0 +1,46 @@
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def test_engine_fake_server():
+    conditions = [
+        ExecuteDurationCondition(
+            warning_duration=60,
+            kill_duration=3600,
+            enable_kill=True,
+        ),
+        QueuedDurationCondition(
+            warning_duration=60,
+        ),
+        BlockedDurationCondition(
+            warning_duration=60,
+        ),
+        JoinExplosionCondition(
+            min_output_rows=10_000_000,
+            min_explosion_rate=10,
+            warning_duration=60,
+        ),
+    ]
+
+    with FakeMonitoringServer(num_queries=50, num_queued=10, num_blocked=5, latency=0.01, error_rate=0.2, seed=0) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=20) as engine:
+            check_results = engine.check_and_kill_pending_queries(conditions)
+
+            queries = {q["id"]: q for q in server.query_defs}
+            kill_results = [r for r in check_results if r.level == CheckResultLevel.KILL]
+
+            # Errors of query plan requests must not affect conditions which do not require query plan
+            assert len([r for r in check_results if r.name == "ExecuteDurationCondition"]) == len(
+                [q for q in queries.values() if q["status"] == "RUNNING" and q["xpExecDuration"] + 100 >= 60_000]
+            )
+
+            assert len([r for r in check_results if r.name == "QueuedDurationCondition"]) > 0
+            assert len([r for r in check_results if r.name == "BlockedDurationCondition"]) > 0
+
+            assert len(kill_results) > 0
+            assert sorted(server.aborted_query_ids) == sorted(r.query.query_id for r in kill_results)
+
+            # Aborted queries are removed from query list
+            check_results = engine.check_and_kill_pending_queries(conditions)
+
+            assert len([r for r in check_results if r.level == CheckResultLevel.KILL]) == 0
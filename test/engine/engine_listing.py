@@ -0,0 +1,141 @@
+from asyncio import run
+from pytest import raises
+from snowflake.connector import Error as SnowflakeError
+
+from snowkill import *
+from snowkill.async_engine import AsyncSnowKillEngine
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def test_paginated_listing():
+    with FakeMonitoringServer(num_queries=250, latency=0) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=100) as engine:
+            query_ids = [q.query_id for q in engine._iter_pending_queries(blocked=False, queued=False)]
+
+            # Pages overlap by 1 millisecond, but each query is returned exactly once
+            assert len(query_ids) == len(set(query_ids)) == 250
+            assert set(query_ids) == {q["id"] for q in server.query_defs}
+            assert server.request_counts["query_list"] == 3
+
+
+def test_paginated_listing_truncated():
+    with FakeMonitoringServer(num_queries=250, latency=0) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=100, list_max_pages=2) as engine:
+            # Second page starts with the oldest query of the first page
+            assert len(engine.get_pending_queries(blocked=False, queued=False)) == 199
+
+        with SnowKillEngine(server.get_connection(), list_page_size=100, list_max_queries=150) as engine:
+            assert len(engine.get_pending_queries(blocked=False, queued=False)) == 150
+
+            # Truncation is reported in cycle report of check
+            engine.check_and_kill_pending_queries([ExecuteDurationCondition(notice_duration=60)])
+
+            assert [t.subset for t in engine.last_cycle_report.list_truncations] == ["RUNNING"]
+
+
+def test_paginated_listing_same_start_time():
+    with FakeMonitoringServer(num_queries=100, latency=0) as server:
+        # 30 queries started in the same millisecond do not fit into a single page
+        for q in server.query_defs[40:70]:
+            q["startTime"] = server.query_defs[40]["startTime"]
+
+        with SnowKillEngine(server.get_connection(), list_page_size=20, list_max_pages=20) as engine:
+            query_ids = set(engine.get_pending_queries(blocked=False, queued=False))
+
+            engine.check_and_kill_pending_queries([ExecuteDurationCondition(notice_duration=60)])
+            cycle_report = engine.last_cycle_report
+
+        # Remaining queries of this millisecond are skipped and reported, but older queries are still loaded
+        assert {q["id"] for q in server.query_defs[:40] + server.query_defs[70:]}.issubset(query_ids)
+        assert len(query_ids) < 100
+
+        assert len(cycle_report.list_truncations) == 1
+        assert "started at" in cycle_report.list_truncations[0].reason
+
+
+def test_listing_error_discards_kills():
+    conditions = [
+        ExecuteDurationCondition(
+            warning_duration=60,
+            kill_duration=60,
+            enable_kill=True,
+        ),
+    ]
+
+    # First page is checked while second page is loading, then second page fails
+    with FakeMonitoringServer(num_queries=100, latency=0.05, query_list_error_after=1) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=20) as engine:
+            with raises(SnowflakeError):
+                engine.check_and_kill_pending_queries(conditions)
+
+            assert server.aborted_query_ids == []
+
+        async def _check_async():
+            async with AsyncSnowKillEngine(server.get_connection(), list_page_size=20) as engine:
+                with raises(SnowflakeError):
+                    await engine.check_and_kill_pending_queries(conditions)
+
+        run(_check_async())
+
+        assert server.aborted_query_ids == []
+
+    # Without listing errors the same queries are killed and reported
+    with FakeMonitoringServer(num_queries=100, latency=0.05) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=20) as engine:
+            check_results = engine.check_and_kill_pending_queries(conditions)
+            kill_results = [r for r in check_results if r.level == CheckResultLevel.KILL]
+
+            assert len(kill_results) > 0
+            assert sorted(server.aborted_query_ids) == sorted(r.query.query_id for r in kill_results)
+
+
+def test_concurrent_subsets():
+    with FakeMonitoringServer(num_queries=30, num_queued=20, num_blocked=10, latency=0) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=10) as engine:
+            queries = engine.get_pending_queries()
+
+            assert len(queries) == 60
+            assert {s: sum(1 for q in queries.values() if q.status == s) for s in ("BLOCKED", "QUEUED", "RUNNING")} == {
+                "BLOCKED": 10,
+                "QUEUED": 20,
+                "RUNNING": 30,
+            }
+
+            # Only subsets required by conditions are loaded
+            request_count = server.request_counts["query_list"]
+            engine.get_pending_queries(blocked=False, queued=False)
+
+            assert server.request_counts["query_list"] - request_count == 4
+
+
+def test_concurrent_subset_error():
+    conditions = [
+        ExecuteDurationCondition(
+            warning_duration=60,
+            kill_duration=60,
+            enable_kill=True,
+        ),
+        BlockedDurationCondition(
+            warning_duration=60,
+        ),
+    ]
+
+    # Subset of blocked queries fails immediately, while running queries are still loading page by page
+    with FakeMonitoringServer(num_queries=200, num_blocked=10, latency=0.05, query_list_error_subsets=["BLOCKED"]) as server:
+        with SnowKillEngine(server.get_connection(), list_page_size=10) as engine:
+            with raises(SnowflakeError):
+                engine.check_and_kill_pending_queries(conditions)
+
+            # Error is raised without waiting for remaining pages of other subsets
+            assert server.request_counts["query_list"] < 10
+            assert server.aborted_query_ids == []
+
+        async def _check_async():
+            async with AsyncSnowKillEngine(server.get_connection(), list_page_size=10) as engine:
+                with raises(SnowflakeError):
+                    await engine.check_and_kill_pending_queries(conditions)
+
+        run(_check_async())
+
+        assert server.request_counts["query_list"] < 20
+        assert server.aborted_query_ids == []
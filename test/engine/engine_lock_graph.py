@@ -0,0 +1,171 @@
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+ROOT_QUERY_ID = "00000000-0000-0000-0000-999999999999"
+
+
+def _lock_row(transaction, query_id, status, resource="T1"):
+    return {
+        "resource": resource,
+        "type": "PARTITIONS",
+        "transaction": transaction,
+        "query_id": query_id,
+        "session": transaction,
+        "status": status,
+    }
+
+
+def test_lock_graph_root_blocker():
+    lock_graph = LockGraph(
+        [
+            # Chain: 3 -> 2 -> 1
+            _lock_row("1", "q1", "HOLDING", "T1"),
+            _lock_row("2", "q2", "HOLDING", "T2"),
+            _lock_row("2", "q2w", "WAITING", "T1"),
+            _lock_row("3", "q3", "WAITING", "T2"),
+            # Deadlock: 4 -> 5 -> 4
+            _lock_row("4", "q4", "HOLDING", "T4"),
+            _lock_row("5", "q5", "HOLDING", "T5"),
+            _lock_row("4", "q4w", "WAITING", "T5"),
+            _lock_row("5", "q5w", "WAITING", "T4"),
+        ]
+    )
+
+    hl = lock_graph.holding_locks["q3"]
+
+    assert hl.holding_transaction_id == "2"
+    assert hl.root_transaction_id == "1"
+    assert hl.root_query_id == "q1"
+    assert hl.chain_depth == 2
+    assert hl.root_blocked_count == 2
+    assert not hl.is_deadlock
+
+    assert lock_graph.holding_locks["q2w"].root_transaction_id == "1"
+    assert lock_graph.holding_locks["q2w"].chain_depth == 1
+
+    assert lock_graph.get_blocked_transaction_ids("1") == {"2", "3"}
+    assert lock_graph.get_deadlock_transaction_ids() == {"4", "5"}
+    assert "1" in lock_graph.get_root_transaction_ids()
+
+    # Root of transaction is resolved by query of HOLDING row, not by query of the latest WAITING row
+    assert lock_graph.transaction_query_ids["2"] == "q2"
+
+    # Both transactions of deadlock resolve to the same single victim, so only one transaction is aborted
+    assert lock_graph.holding_locks["q4w"].is_deadlock
+    assert lock_graph.holding_locks["q4w"].root_transaction_id == "5"
+    assert lock_graph.holding_locks["q4w"].root_query_id == "q5"
+    assert lock_graph.holding_locks["q5w"].root_transaction_id == "5"
+    assert lock_graph.get_root_transaction_ids() == ["1", "5"]
+
+
+def test_lock_graph_multiple_holders():
+    lock_graph = LockGraph(
+        [
+            # Transaction 3 waits for both holders of T1, transaction 2 waits for transaction 1 on T2
+            _lock_row("1", "q1", "HOLDING", "T2"),
+            _lock_row("1", "q1", "HOLDING", "T1"),
+            _lock_row("2", "q2", "HOLDING", "T1"),
+            _lock_row("2", "q2w", "WAITING", "T2"),
+            _lock_row("3", "q3", "WAITING", "T1"),
+            _lock_row("4", "q4", "WAITING", "T2"),
+        ]
+    )
+
+    hl = lock_graph.holding_locks["q3"]
+
+    # Direct holder is still the last HOLDING row, but root is resolved across all holders
+    assert hl.holding_transaction_id == "2"
+    assert lock_graph.waits_for["3"] == {"1", "2"}
+    assert hl.root_transaction_id == "1"
+    assert hl.root_query_id == "q1"
+    assert hl.chain_depth == 1
+    assert hl.root_blocked_count == 3
+    assert not hl.is_deadlock
+
+    assert lock_graph.get_root_transaction_ids() == ["1"]
+
+
+def _add_root_query(server: FakeMonitoringServer):
+    # Holding transaction of fake server is executed by running query with known query text
+    root_query_def = dict(server.query_defs[0], id=ROOT_QUERY_ID, sqlText="UPDATE BENCHMARK_TABLE SET id = id")
+    server.query_defs.append(root_query_def)
+
+
+def test_kill_root_blocker():
+    conditions = [
+        BlockedDurationCondition(
+            kill_duration=60,
+            enable_kill=True,
+            kill_root_blocker=True,
+            enable_kill_query_filter=QueryFilter(include_sql_text=["UPDATE *"]),
+        ),
+    ]
+
+    with FakeMonitoringServer(num_queries=10, num_blocked=10, latency=0) as server:
+        _add_root_query(server)
+
+        with SnowKillEngine(server.get_connection()) as engine:
+            results = engine.check_and_kill_pending_queries(conditions)
+
+        kill_results = [r for r in results if r.level == CheckResultLevel.KILL]
+
+        # Kill query filter is checked for blocked query first, root blocker query passes it, but blocked queries do not
+        assert not kill_results
+
+    conditions[0].enable_kill_query_filter = None
+
+    with FakeMonitoringServer(num_queries=10, num_blocked=10, latency=0) as server:
+        _add_root_query(server)
+
+        with SnowKillEngine(server.get_connection()) as engine:
+            results = engine.check_and_kill_pending_queries(conditions)
+
+        kill_results = [r for r in results if r.level == CheckResultLevel.KILL]
+
+        assert kill_results
+        assert all(r.kill_root_blocker and r.root_blocker_query.query_id == ROOT_QUERY_ID for r in kill_results)
+
+        # Root blocker transaction is aborted once, blocked queries are not aborted
+        assert server.aborted_transaction_ids == ["1"]
+        assert server.aborted_query_ids == []
+
+
+def test_kill_root_blocker_query_filter():
+    conditions = [
+        BlockedDurationCondition(
+            kill_duration=60,
+            enable_kill=True,
+            kill_root_blocker=True,
+            enable_kill_query_filter=QueryFilter(exclude_sql_text=["UPDATE *"]),
+        ),
+    ]
+
+    with FakeMonitoringServer(num_queries=10, num_blocked=10, latency=0) as server:
+        _add_root_query(server)
+
+        with SnowKillEngine(server.get_connection()) as engine:
+            results = engine.check_and_kill_pending_queries(conditions)
+
+        kill_results = [r for r in results if r.level == CheckResultLevel.KILL]
+
+        # Root blocker does not pass kill query filter, so blocked queries are killed instead
+        assert kill_results
+        assert not any(r.kill_root_blocker or r.root_blocker_query for r in kill_results)
+
+        assert server.aborted_transaction_ids == []
+        assert sorted(server.aborted_query_ids) == sorted(r.query.query_id for r in kill_results)
+
+
+def test_kill_root_blocker_unknown_root_query():
+    conditions = [
+        BlockedDurationCondition(kill_duration=60, enable_kill=True, kill_root_blocker=True),
+    ]
+
+    # Root blocker query is not found, blocked queries are killed instead
+    with FakeMonitoringServer(num_queries=10, num_blocked=10, latency=0) as server:
+        with SnowKillEngine(server.get_connection()) as engine:
+            results = engine.check_and_kill_pending_queries(conditions)
+
+        assert any(r.level == CheckResultLevel.KILL for r in results)
+        assert server.aborted_transaction_ids == []
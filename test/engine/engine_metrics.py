@@ -0,0 +1,111 @@
+from pytest import raises
+
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def test_engine_metrics():
+    conditions = [
+        ExecuteDurationCondition(
+            warning_duration=60,
+            kill_duration=3600,
+            enable_kill=True,
+        ),
+        JoinExplosionCondition(
+            min_output_rows=10_000_000,
+            min_explosion_rate=10,
+            warning_duration=60,
+        ),
+    ]
+
+    metrics = SnowKillMetrics()
+
+    with FakeMonitoringServer(num_queries=50, latency=0.01, error_rate=0.2, seed=0) as server:
+        with SnowKillEngine(server.get_connection(), on_cycle_report=metrics.observe_cycle_report) as engine:
+            check_results = engine.check_and_kill_pending_queries(conditions)
+
+            report = engine.last_cycle_report
+
+            assert metrics.checks.get() == 1
+            assert metrics.pending_queries.get(status="RUNNING") == 50
+            assert metrics.query_plan_fetches.get(outcome="failed") == report.num_query_plan_failures > 0
+            assert metrics.query_plan_fetch_duration.get_count(warehouse="BENCHMARK_WH") == len(report.query_plan_fetches)
+            assert metrics.kills.get(target="query") == len(server.aborted_query_ids) > 0
+
+            for r in check_results:
+                assert metrics.check_results.get(condition=r.name, level=r.level.name) == len(
+                    [x for x in check_results if x.name == r.name and x.level == r.level]
+                )
+
+            text = metrics.registry.render()
+
+            assert 'snowkill_query_plan_fetch_duration_seconds_bucket{warehouse="BENCHMARK_WH",le="+Inf"}' in text
+            assert text.endswith("# EOF\n")
+
+
+def test_daemon_metrics():
+    conditions = [
+        ExecuteDurationCondition(warning_duration=60),
+    ]
+
+    with FakeMonitoringServer(num_queries=20, latency=0) as server:
+        with SnowKillEngine(server.get_connection()) as engine:
+            daemon = SnowKillDaemon(engine, conditions, interval=0.01, metrics=SnowKillMetrics(), metrics_port=0)
+            daemon.run(max_checks=2)
+
+            # Engine metrics are observed once per check by hook installed by daemon
+            assert engine.on_cycle_report == daemon.metrics.observe_cycle_report
+            assert daemon.metrics.checks.get() == 2
+            assert daemon.metrics.check_results.get(condition="ExecuteDurationCondition", level="WARNING") == 2 * len(
+                [q for q in server.query_defs if q["xpExecDuration"] >= 60000]
+            )
+
+            # Failed check is observed by hook as well, but is not counted as complete check
+            server.query_list_error_after = 0
+            daemon.run_check()
+
+            assert daemon.metrics.checks.get() == 2
+            assert daemon.metrics.failed_checks.get() == 1
+            assert daemon.metrics.check_duration.get_count() == 3
+
+
+def test_engine_metrics_failed_check():
+    metrics = SnowKillMetrics()
+
+    with FakeMonitoringServer(num_queries=20, latency=0, query_list_error_after=0) as server:
+        with SnowKillEngine(server.get_connection(), on_cycle_report=metrics.observe_cycle_report) as engine:
+            with raises(Exception):
+                engine.check_and_kill_pending_queries([ExecuteDurationCondition(warning_duration=60)])
+
+            # Failed checks are counted by hook without daemon
+            assert metrics.checks.get() == 0
+            assert metrics.failed_checks.get() == 1
+
+
+def test_daemon_metrics_other_hook():
+    reports = []
+
+    with FakeMonitoringServer(num_queries=20, latency=0) as server:
+        with SnowKillEngine(server.get_connection(), on_cycle_report=reports.append) as engine:
+            daemon = SnowKillDaemon(
+                engine, [ExecuteDurationCondition(warning_duration=60)], interval=0.01, metrics=SnowKillMetrics()
+            )
+            daemon.run_check()
+
+            server.query_list_error_after = 0
+            daemon.run_check()
+
+            # Engine keeps its own hook, reports of complete and failed checks are observed by daemon once
+            assert engine.on_cycle_report == reports.append
+            assert len(reports) == 2
+            assert daemon.metrics.checks.get() == 1
+            assert daemon.metrics.failed_checks.get() == 1
+            assert daemon.metrics.check_duration.get_count() == 2
+
+
+def test_metrics_server_defaults():
+    with MetricsServer(MetricsRegistry(), port=0) as metrics_server:
+        # Metrics are not exposed to other hosts by default
+        assert metrics_server.server.server_address[0] == "127.0.0.1"
+
+    assert MetricsServer.DEFAULT_PORT != 9090
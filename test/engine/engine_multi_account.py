@@ -0,0 +1,66 @@
+from time import sleep
+
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer, FakeServerConnection
+
+
+def _get_conditions():
+    return [
+        ExecuteDurationCondition(notice_duration=60),
+    ]
+
+
+def _get_account(server: FakeMonitoringServer, account_name: str):
+    return AccountConfig(
+        account_name=account_name,
+        connection_params={"base_url": server.base_url},
+        connection_factory=FakeServerConnection,
+        query_plan_cache_params={"max_size": 100},
+    )
+
+
+def test_multi_account():
+    with FakeMonitoringServer(num_queries=10, latency=0) as server:
+        accounts = [_get_account(server, "first"), _get_account(server, "second")]
+
+        with MultiAccountCoordinator(accounts, _get_conditions()) as coordinator:
+            check_results = coordinator.check_and_kill_pending_queries()
+
+        assert coordinator.last_account_errors == {}
+        assert {r.account_name for r in check_results} == {"first", "second"}
+        assert len(check_results) == 2 * len([q for q in server.query_defs if q["xpExecDuration"] >= 60000])
+
+
+def test_multi_account_timeout():
+    with FakeMonitoringServer(num_queries=10, latency=0.5) as server:
+        accounts = [_get_account(server, "slow")]
+
+        with MultiAccountCoordinator(accounts, _get_conditions(), timeout=0.2) as coordinator:
+            assert coordinator.check_and_kill_pending_queries() == []
+            assert coordinator.last_account_errors == {"slow": "Timeout"}
+
+            # Account is skipped while previous check is still running
+            assert coordinator.check_and_kill_pending_queries() == []
+            assert coordinator.last_account_errors == {"slow": "Previous check is still running"}
+
+            sleep(3)
+            server.latency = 0
+
+            # Results of previous check are returned together with results of new check
+            check_results = coordinator.check_and_kill_pending_queries()
+
+            assert coordinator.last_account_errors == {}
+            assert len(check_results) == 2 * len([q for q in server.query_defs if q["xpExecDuration"] >= 60000]) > 0
+
+
+def test_multi_account_pinned_process():
+    with FakeMonitoringServer(num_queries=10, latency=0) as server:
+        accounts = [_get_account(server, "first"), _get_account(server, "second")]
+
+        with MultiAccountCoordinator(accounts, _get_conditions()) as coordinator:
+            for _ in range(3):
+                coordinator.check_and_kill_pending_queries()
+
+            # Each account keeps its own process, so engine and its connection are created once per account
+            assert len({p for e in coordinator.executors.values() for p in e._processes}) == 2
+            assert len([c for c in server.executed_commands if c.startswith("SHOW USERS")]) == 2
@@ -0,0 +1,30 @@
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+class RecordingCondition(ExecuteDurationCondition):
+    DURATION_ONLY = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked_queries = []
+
+    def check_custom_logic(self, query, query_plan):
+        self.checked_queries.append(query)
+        return super().check_custom_logic(query, query_plan)
+
+
+def test_priority_across_pages():
+    condition = RecordingCondition(notice_duration=60)
+
+    # Pages arrive from the newest queries to the oldest, but queries of all pages are checked in order of priority
+    with FakeMonitoringServer(num_queries=100, latency=0.01) as server:
+        with SnowKillEngine(server.get_connection(), max_workers=1, list_page_size=20) as engine:
+            engine.check_and_kill_pending_queries([condition])
+
+        assert server.request_counts["query_list"] > 5
+
+    durations = [q.execute_duration for q in condition.checked_queries]
+
+    assert len(durations) == len([q for q in server.query_defs if q["xpExecDuration"] >= 60000])
+    assert durations == sorted(durations, reverse=True)
@@ -0,0 +1,101 @@
+from fnmatch import fnmatchcase
+from itertools import combinations
+from pickle import dumps, loads
+from re import compile as re_compile
+
+from snowkill import *
+from snowkill.condition.abc_condition import CompiledPatterns
+from snowkill.testing.workload import SyntheticWorkload
+
+
+PATTERNS = [
+    "BENCHMARK",
+    "BENCHMARK_1",
+    "*WH_2*",
+    "*_1*",
+    "BENCH*",
+    "*_[23]",
+    "BENCHMARK_?",
+    "SELECT *",
+    "*",
+    "**",
+    "[*]",
+    re_compile(r"BENCHMARK_\d{2}"),
+    re_compile(r"SELECT"),
+]
+
+VALUES = [
+    None,
+    "",
+    "BENCHMARK",
+    "BENCHMARK_1",
+    "BENCHMARK_12",
+    "BENCHMARK_WH_2",
+    "BENCHMARK_WH_20",
+    "benchmark_1",
+    "*",
+    "SELECT 1",
+    "SELECT\n1",
+    "WITH t AS (SELECT 1) SELECT * FROM t",
+]
+
+
+def _match_pattern(val, pattern):
+    # Matching semantics of individual patterns before compilation
+    if val is None:
+        return False
+
+    if not isinstance(pattern, str):
+        return bool(pattern.fullmatch(val))
+
+    return fnmatchcase(val, pattern)
+
+
+def test_compiled_patterns():
+    for num_patterns in (1, 2, 3):
+        for patterns in combinations(PATTERNS, num_patterns):
+            compiled = CompiledPatterns(list(patterns))
+
+            for val in VALUES:
+                assert compiled.match(val) == any(_match_pattern(val, p) for p in patterns), (patterns, val)
+
+
+def test_query_filter_field_verdicts():
+    queries = SyntheticWorkload(num_queries=500, num_warehouses=5, num_users=20).build_queries()
+
+    query_filter = QueryFilter(
+        include_user_name=["BENCHMARK_1*"],
+        exclude_warehouse_name=["*_3"],
+        include_sql_text=["SELECT *1"],
+    )
+
+    for _ in range(2):
+        for query in queries:
+            expected = (
+                _match_pattern(query.session.user_name, "BENCHMARK_1*")
+                and not _match_pattern(query.warehouse_name, "*_3")
+                and _match_pattern(query.sql_text, "SELECT *1")
+            )
+
+            assert query_filter.check_query(query) == expected
+
+    # Verdicts of fields are cached per distinct combination of values, sql_text is always checked
+    assert 0 < len(query_filter._field_verdicts) < len(queries)
+    assert any(query_filter.check_query(q) for q in queries)
+
+    # Cached verdicts are not passed to worker processes
+    restored_filter = loads(dumps(query_filter))
+
+    assert restored_filter._field_verdicts == {}
+    assert [restored_filter.check_query(q) for q in queries] == [query_filter.check_query(q) for q in queries]
+
+
+def test_query_filter_field_verdicts_max_size():
+    queries = SyntheticWorkload(num_queries=500, num_warehouses=5, num_users=20).build_queries()
+
+    query_filter = QueryFilter(include_user_name=["BENCHMARK_1*"])
+    query_filter.FIELD_VERDICTS_MAX_SIZE = 10
+
+    for query in queries:
+        assert query_filter.check_query(query) == _match_pattern(query.session.user_name, "BENCHMARK_1*")
+        assert len(query_filter._field_verdicts) <= 10
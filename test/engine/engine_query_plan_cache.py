@@ -0,0 +1,123 @@
+from dataclasses import replace
+
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+from snowkill.testing.workload import SyntheticWorkload
+
+import snowkill.query_plan_cache
+
+
+def _get_queries_and_plan(num_nodes=10):
+    workload = SyntheticWorkload(num_queries=20, num_steps=1, num_nodes=num_nodes)
+    queries = [q for q in workload.build_queries() if q.status == "RUNNING"]
+
+    return queries, workload.build_query_plan()
+
+
+def test_query_plan_cache_ttl_and_max_age(monkeypatch):
+    queries, query_plan = _get_queries_and_plan()
+    now = [1000.0]
+
+    monkeypatch.setattr(snowkill.query_plan_cache, "monotonic", lambda: now[0])
+
+    cache = QueryPlanCache(ttl=60)
+    cache.put(queries[0], query_plan)
+
+    assert cache.get(queries[0]) is query_plan
+    assert cache.get(queries[1]) is None
+
+    now[0] += 30
+
+    # Condition may require fresher query plan than cache ttl
+    assert cache.get(queries[0], max_age=10) is None
+    assert cache.get(queries[0]) is query_plan
+
+    now[0] += 31
+
+    assert cache.get(queries[0]) is None
+    assert len(cache) == 0
+    assert cache.memory == 0
+
+
+def test_query_plan_cache_change_detection():
+    queries, query_plan = _get_queries_and_plan()
+    query = replace(queries[0], execute_duration=100, stats={"a": 1})
+
+    cache = QueryPlanCache(refresh_ratio=0.1)
+    cache.put(query, query_plan)
+
+    # No progress in stats
+    assert cache.get(replace(query, execute_duration=1000)) is query_plan
+
+    # Stats changed, but execute duration increased by less than refresh ratio
+    assert cache.get(replace(query, execute_duration=105, stats={"a": 2})) is query_plan
+
+    # Stats changed and execute duration increased by more than refresh ratio
+    assert cache.get(replace(query, execute_duration=120, stats={"a": 2})) is None
+
+
+def test_query_plan_cache_lru_and_retain():
+    queries, query_plan = _get_queries_and_plan()
+    cache = QueryPlanCache(max_size=3)
+
+    for q in queries[:3]:
+        cache.put(q, query_plan)
+
+    # First query becomes the most recently used one
+    assert cache.get(queries[0]) is query_plan
+
+    cache.put(queries[3], query_plan)
+
+    assert len(cache) == 3
+    assert cache.get(queries[1]) is None
+    assert all(cache.get(q) is query_plan for q in (queries[0], queries[2], queries[3]))
+
+    cache.retain([queries[0].query_id])
+
+    assert len(cache) == 1
+    assert cache.get(queries[0]) is query_plan
+    assert cache.memory == cache.APPROXIMATE_NODE_SIZE * 10
+
+
+def test_query_plan_cache_max_memory():
+    queries, query_plan = _get_queries_and_plan(num_nodes=100)
+    size = QueryPlanCache.APPROXIMATE_NODE_SIZE * 100
+
+    cache = QueryPlanCache(max_memory=size * 2)
+
+    for q in queries[:3]:
+        cache.put(q, query_plan)
+
+    assert len(cache) == 2
+    assert cache.memory == size * 2
+    assert cache.get(queries[0]) is None
+
+    # Query plan which does not fit into cache is not stored at all
+    cache = QueryPlanCache(max_memory=size - 1)
+    cache.put(queries[0], query_plan)
+
+    assert len(cache) == 0
+    assert cache.memory == 0
+
+
+def test_query_plan_cache_between_checks():
+    conditions = [
+        JoinExplosionCondition(
+            min_output_rows=10_000_000,
+            min_explosion_rate=10,
+            warning_duration=60,
+        ),
+    ]
+
+    with FakeMonitoringServer(num_queries=20, latency=0) as server:
+        with SnowKillEngine(server.get_connection(), query_plan_cache=QueryPlanCache()) as engine:
+            engine.check_and_kill_pending_queries(conditions)
+            num_query_plans = server.request_counts["query_plan"]
+
+            assert num_query_plans > 0
+
+            # Fake server returns the same stats, so query plans of the second check are taken from cache
+            engine.check_and_kill_pending_queries(conditions)
+
+            assert server.request_counts["query_plan"] == num_query_plans
+            assert engine.last_cycle_report.query_plan_cache_hits == num_query_plans
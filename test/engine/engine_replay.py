@@ -0,0 +1,51 @@
+from snowkill import *
+from snowkill.replay import RecordingConnection, ReplayConnection
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def _get_conditions():
+    return [
+        ExecuteDurationCondition(warning_duration=3600, kill_duration=5400, enable_kill=True),
+        # Joins of fake query plan do not explode, low thresholds make sure replayed query plans are matched
+        JoinExplosionCondition(min_output_rows=100, min_explosion_rate=0.5, warning_duration=60),
+        QueuedDurationCondition(notice_duration=30),
+        BlockedDurationCondition(warning_duration=60),
+    ]
+
+
+def _get_result_keys(check_results):
+    return sorted(
+        (
+            r.query.query_id,
+            r.name,
+            r.level.name,
+            r.description,
+            r.query.user.login_name if r.query.user else None,
+            r.holding_lock.holding_query_id if r.holding_lock else None,
+        )
+        for r in check_results
+    )
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "snapshot.jsonl.gz")
+
+    with FakeMonitoringServer(num_queries=50, num_queued=10, num_blocked=5, latency=0, error_rate=0.2, seed=0) as server:
+        with RecordingConnection(server.get_connection(), path) as recording_connection:
+            with SnowKillEngine(recording_connection) as engine:
+                live_results = engine.check_and_kill_pending_queries(_get_conditions())
+
+        live_aborted_query_ids = sorted(server.aborted_query_ids)
+
+    # Fake server is stopped, so replay runs without any requests to it
+    replay_connection = ReplayConnection(path)
+
+    with SnowKillEngine(replay_connection) as engine:
+        replay_results = engine.check_and_kill_pending_queries(_get_conditions())
+
+    assert {r.name for r in live_results} == {c.__class__.__name__ for c in _get_conditions()}
+
+    # Failed query plan requests are recorded as well, so the same queries are matched
+    assert _get_result_keys(replay_results) == _get_result_keys(live_results)
+    assert sorted(replay_connection.aborted_query_ids) == live_aborted_query_ids
+    assert len(live_aborted_query_ids) > 0
@@ -0,0 +1,40 @@
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def _get_conditions():
+    return [
+        EstimatedScanDurationCondition(
+            min_estimated_scan_duration=60,
+            warning_duration=60,
+        ),
+    ]
+
+
+def test_time_budget_capped_timeout():
+    # Every query plan request hangs longer than remaining time budget
+    with FakeMonitoringServer(num_queries=5, latency=0, timeout_rate=1.0, timeout_duration=3) as server:
+        with SnowKillEngine(server.get_connection(), max_workers=5) as engine:
+            engine.check_and_kill_pending_queries(_get_conditions(), time_budget=1.5)
+
+            # Each query plan request is reported as skipped exactly once
+            assert len(engine.last_skipped_queries) == server.request_counts["query_plan"] > 0
+            assert all("capped by time budget" in s.reason for s in engine.last_skipped_queries)
+
+
+def test_time_budget_exhausted():
+    # Single worker exhausts time budget on the first slow query plan request
+    with FakeMonitoringServer(num_queries=5, latency=1.5) as server:
+        with SnowKillEngine(server.get_connection(), max_workers=1) as engine:
+            engine.check_and_kill_pending_queries(_get_conditions(), time_budget=1)
+
+            assert engine.last_skipped_queries
+            assert any("exhausted" in s.reason for s in engine.last_skipped_queries)
+
+
+def test_no_time_budget():
+    with FakeMonitoringServer(num_queries=5, latency=0, timeout_rate=1.0, timeout_duration=2) as server:
+        with SnowKillEngine(server.get_connection(), max_workers=5) as engine:
+            engine.check_and_kill_pending_queries(_get_conditions())
+
+            assert engine.last_skipped_queries == []
@@ -0,0 +1,84 @@
+from snowkill import *
+from snowkill.testing.fake_server import FakeMonitoringServer
+
+
+def _get_user_commands(server: FakeMonitoringServer):
+    return [c for c in server.executed_commands if c.startswith("SHOW USERS")]
+
+
+def test_user_directory_prefetch():
+    with FakeMonitoringServer(num_users=30, latency=0) as server:
+        user_directory = UserDirectory(server.get_connection(), full_reload_threshold=5)
+
+        # Few missing users are loaded with single multi-statement request
+        user_directory.prefetch(["BENCHMARK", "BENCHMARK_1", "UNKNOWN"])
+
+        assert _get_user_commands(server) == [
+            "SHOW USERS LIKE %(user_name_0)s; SHOW USERS LIKE %(user_name_1)s; SHOW USERS LIKE %(user_name_2)s",
+        ]
+
+        assert user_directory.get_user("BENCHMARK_1").login_name is not None
+        assert user_directory.get_user("UNKNOWN").login_name is None
+        assert user_directory.get_user("NOT_PREFETCHED").name == "NOT_PREFETCHED"
+
+        # Users which were not found are remembered as well
+        user_directory.prefetch(["BENCHMARK", "UNKNOWN"])
+        assert len(_get_user_commands(server)) == 1
+
+        # Many missing users are loaded with single SHOW USERS
+        user_directory.prefetch([f"BENCHMARK_{i}" for i in range(1, 30)])
+
+        assert _get_user_commands(server)[1:] == ["SHOW USERS"]
+        assert all(user_directory.get_user(f"BENCHMARK_{i}").login_name is not None for i in range(1, 30))
+
+
+def test_user_directory_ttl(monkeypatch):
+    now = 1000000.0
+    monkeypatch.setattr("snowkill.user_directory.time", lambda: now)
+
+    with FakeMonitoringServer(num_users=2, latency=0) as server:
+        user_directory = UserDirectory(server.get_connection(), ttl=60)
+
+        user_directory.prefetch(["BENCHMARK"])
+        now += 30
+        user_directory.prefetch(["BENCHMARK"])
+
+        assert len(_get_user_commands(server)) == 1
+
+        now += 60
+        user_directory.prefetch(["BENCHMARK"])
+
+        assert len(_get_user_commands(server)) == 2
+
+
+def test_user_directory_file(tmp_path):
+    path = str(tmp_path / "users.json")
+
+    with FakeMonitoringServer(num_users=2, latency=0) as server:
+        user_directory = UserDirectory(server.get_connection(), path=path)
+        user_directory.prefetch(["BENCHMARK", "UNKNOWN"])
+
+        # Restarted directory is warm, no users are loaded again
+        restored_directory = UserDirectory(server.get_connection(), path=path)
+        restored_directory.prefetch(["BENCHMARK", "UNKNOWN"])
+
+        assert len(_get_user_commands(server)) == 1
+        assert restored_directory.get_user("BENCHMARK") == user_directory.get_user("BENCHMARK")
+
+    # Broken file is ignored
+    with open(path, "w") as f:
+        f.write("{")
+
+    assert UserDirectory(server.get_connection(), path=path)._entries == {}
+
+
+def test_user_directory_shared_sessions():
+    with FakeMonitoringServer(num_queries=10, num_users=3, latency=0) as server:
+        engine = SnowKillEngine(server.get_connection())
+
+        # Sessions were already parsed by another subset, but users of this subset are still loaded before queries are built
+        sessions = {s["idAsString"]: engine._build_session(s) for s in server.session_defs}
+        queries = [q for page in engine._iter_query_pages(sessions=sessions) for q in page]
+
+        assert len(queries) == 10
+        assert all(q.user.login_name == q.session.user_name for q in queries)